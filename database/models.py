@@ -1,10 +1,12 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Text, Boolean, JSON, ForeignKey
+from sqlalchemy import create_engine, inspect, text, Column, String, DateTime, Text, Boolean, JSON, ForeignKey, Integer, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship, sessionmaker, deferred
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from datetime import datetime
 import uuid
 
+from config import config
+
 Base = declarative_base()
 
 class Document(Base):
@@ -14,11 +16,14 @@ class Document(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     file_name = Column(String, nullable=False)
     file_path = Column(String)  # Path to stored file
-    file_data_url = Column(Text)  # Store the data URL for the image
+    file_data_url = deferred(Column(Text))  # Legacy inline image; moved to preview renditions by scripts/migrate_previews.py
+    thumbnail_path = Column(String)  # Stored preview renditions (config.PREVIEW_SIZES)
+    preview_path = Column(String)
     document_type = Column(String, nullable=False)  # passport, driver_license, ead_card
     upload_date = Column(DateTime, default=datetime.utcnow)
     last_modified = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = Column(String, default="pending")  # pending, extracted, verified, error
+    page_number = Column(Integer)  # Source page when the document was found in a multi-page PDF
     
     # Relationships
     fields = relationship("ExtractedField", back_populates="document", cascade="all, delete-orphan")
@@ -71,17 +76,71 @@ class ExtractionHistory(Base):
     status = Column(String)  # success, failed
     error_message = Column(Text)
     extracted_data = Column(JSON)  # Store raw extraction result
+    model_tier = Column(String)  # Model that produced the accepted answer (cascade tier)
     
     # Relationships
     document = relationship("Document")
 
 
+class Job(Base):
+    """Durable queue of asynchronous extraction jobs"""
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String, default="queued", nullable=False)  # queued, running, succeeded, failed
+    file_name = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)  # Path to stored upload
+    content_type = Column(String, nullable=False)
+    document_id = Column(String, ForeignKey("documents.id"))  # Set once the result is persisted
+    result = Column(JSON)  # document_type and document_content
+    error_message = Column(Text)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    lease_owner = Column(String)  # Worker currently holding the job
+    lease_expires_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_jobs_status_created_at", "status", "created_at"),
+    )
+
+
+class StoredFile(Base):
+    """Reference count of a content-addressed stored file (see utils.storage)"""
+    __tablename__ = "stored_files"
+    
+    content_hash = Column(String, primary_key=True)  # SHA-256 hex digest
+    size = Column(Integer)
+    content_type = Column(String)
+    ref_count = Column(Integer, default=0, nullable=False)  # Documents, jobs and in-flight requests using it
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UploadSession(Base):
+    """Resumable upload in progress; the bytes received so far are stored in file_path"""
+    __tablename__ = "upload_sessions"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    file_name = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)  # Partial file, upload_offset bytes long
+    upload_length = Column(Integer, nullable=False)  # Declared total size
+    upload_offset = Column(Integer, default=0, nullable=False)  # Bytes received
+    locked_until = Column(DateTime)  # Set while a chunk is being appended or the upload finalized
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_upload_sessions_expires_at", "expires_at"),
+    )
+
+
 # Create async engine
-def get_async_engine(database_url: str = "sqlite+aiosqlite:///./document_processing.db"):
+def get_async_engine(database_url: str = config.DATABASE_URL):
     return create_async_engine(database_url, echo=False)
 
 # Create sync engine for migrations
-def get_sync_engine(database_url: str = "sqlite:///./document_processing.db"):
+def get_sync_engine(database_url: str = config.SYNC_DATABASE_URL):
     return create_engine(database_url, echo=False)
 
 # Create tables
@@ -89,8 +148,23 @@ def init_db():
     """Initialize database tables"""
     engine = get_sync_engine()
     Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
     print("Database tables created successfully")
 
+def add_missing_columns(engine):
+    """Add nullable columns introduced after a table was first created"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    print(f"Added column {table.name}.{column.name}")
+
 # Async session factory - create only when needed to avoid initialization issues
 _async_engine = None
 _AsyncSessionLocal = None
@@ -1,11 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, delete, or_, and_
 from sqlalchemy.orm import selectinload
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Dict, Any
+from datetime import datetime, timedelta
 import json
 
-from database.models import Document, ExtractedField, FieldCorrection, ExtractionHistory
+from sqlalchemy.exc import IntegrityError
+from database.models import Document, ExtractedField, FieldCorrection, ExtractionHistory, Job, StoredFile, UploadSession
+from utils.storage import key_hash
+from utils.previews import preview_url
 
 class DocumentRepository:
     """Repository for document operations"""
@@ -13,13 +16,23 @@ class DocumentRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
     
-    async def create_document(self, file_name: str, document_type: str, file_path: Optional[str] = None, file_data_url: Optional[str] = None) -> Document:
+    async def create_document(
+        self,
+        file_name: str,
+        document_type: str,
+        file_path: Optional[str] = None,
+        previews: Optional[Dict[str, str]] = None,
+        page_number: Optional[int] = None
+    ) -> Document:
         """Create a new document record"""
+        previews = previews or {}
         document = Document(
             file_name=file_name,
             file_path=file_path,
-            file_data_url=file_data_url,
+            thumbnail_path=previews.get("thumbnail"),
+            preview_path=previews.get("preview"),
             document_type=document_type,
+            page_number=page_number,
             status="pending"
         )
         self.session.add(document)
@@ -65,6 +78,29 @@ class DocumentRepository:
             await self.session.commit()
             return True
         return False
+    
+    async def get_data_urls(self, after: str = "", limit: int = 20) -> List[tuple]:
+        """Get (id, file_data_url) of documents still holding an inline image, by id after the given one"""
+        result = await self.session.execute(
+            select(Document.id, Document.file_data_url)
+            .where(Document.file_data_url.is_not(None), Document.id > after)
+            .order_by(Document.id)
+            .limit(limit)
+        )
+        return result.all()
+    
+    async def set_previews(self, document_id: str, previews: Dict[str, str]):
+        """Point a document at its stored preview renditions, dropping its inline image"""
+        await self.session.execute(
+            update(Document)
+            .where(Document.id == document_id)
+            .values(
+                thumbnail_path=previews.get("thumbnail"),
+                preview_path=previews.get("preview"),
+                file_data_url=None
+            )
+        )
+        await self.session.commit()
 
 
 class FieldRepository:
@@ -150,14 +186,16 @@ class ExtractionHistoryRepository:
         document_id: str, 
         status: str, 
         extracted_data: Optional[Dict] = None,
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        model_tier: Optional[str] = None
     ) -> ExtractionHistory:
         """Create extraction history record"""
         record = ExtractionHistory(
             document_id=document_id,
             status=status,
             extracted_data=extracted_data,
-            error_message=error_message
+            error_message=error_message,
+            model_tier=model_tier
         )
         self.session.add(record)
         await self.session.commit()
@@ -174,6 +212,302 @@ class ExtractionHistoryRepository:
         return result.scalars().all()
 
 
+class JobRepository:
+    """Repository for asynchronous job queue operations"""
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def create_job(self, file_name: str, file_path: str, content_type: str, max_attempts: int = 3) -> Job:
+        """Enqueue a new extraction job"""
+        job = Job(
+            file_name=file_name,
+            file_path=file_path,
+            content_type=content_type,
+            max_attempts=max_attempts,
+            status="queued"
+        )
+        self.session.add(job)
+        await self.session.commit()
+        await self.session.refresh(job)
+        return job
+    
+    async def get_job(self, job_id: str) -> Optional[Job]:
+        """Get job by ID"""
+        result = await self.session.execute(
+            select(Job).where(Job.id == job_id)
+        )
+        return result.scalar_one_or_none()
+    
+    async def claim_job(self, worker_id: str, lease_seconds: int) -> Optional[Job]:
+        """
+        Claim the oldest available job with a lease
+        
+        Queued jobs and running jobs whose lease has expired are claimable.
+        On PostgreSQL the candidate row is locked with SKIP LOCKED; on SQLite
+        the claim is a compare-and-swap UPDATE guarded by the same predicate.
+        """
+        now = datetime.utcnow()
+        claimable = and_(
+            Job.attempts < Job.max_attempts,
+            or_(
+                Job.status == "queued",
+                and_(Job.status == "running", Job.lease_expires_at < now)
+            )
+        )
+        
+        query = select(Job.id).where(claimable).order_by(Job.created_at).limit(1)
+        if self.session.bind.dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+        
+        job_id = (await self.session.execute(query)).scalar_one_or_none()
+        if job_id is None:
+            await self.session.commit()
+            return None
+        
+        result = await self.session.execute(
+            update(Job)
+            .where(Job.id == job_id, claimable)
+            .values(
+                status="running",
+                lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                attempts=Job.attempts + 1,
+                updated_at=now
+            )
+        )
+        await self.session.commit()
+        
+        if result.rowcount != 1:
+            # Another worker won the race
+            return None
+        
+        return await self.get_job(job_id)
+    
+    async def fail_expired_jobs(self, release_file: Callable[[str], Awaitable[None]]) -> int:
+        """
+        Fail running jobs whose worker died on their final attempt
+        
+        They will never be claimed again, so their stored upload is released
+        too. Each job is failed and released in one transaction, and only by
+        the worker whose UPDATE matched, so a file is never released twice.
+        
+        Args:
+            release_file: Drops one reference to a stored upload, committing the session
+            
+        Returns:
+            Number of jobs failed
+        """
+        now = datetime.utcnow()
+        expired = and_(Job.status == "running", Job.lease_expires_at < now, Job.attempts >= Job.max_attempts)
+        candidates = (await self.session.execute(select(Job.id, Job.file_path).where(expired))).all()
+        
+        failed = 0
+        for job_id, file_path in candidates:
+            result = await self.session.execute(
+                update(Job)
+                .where(Job.id == job_id, expired)
+                .values(status="failed", error_message="Lease expired on final attempt", lease_owner=None, updated_at=now)
+            )
+            if result.rowcount == 1:
+                await release_file(file_path)
+                failed += 1
+            await self.session.commit()
+        return failed
+    
+    async def renew_lease(self, job_id: str, worker_id: str, lease_seconds: int) -> bool:
+        """Extend the lease on a running job held by this worker"""
+        result = await self.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.lease_owner == worker_id, Job.status == "running")
+            .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        )
+        await self.session.commit()
+        return result.rowcount == 1
+    
+    async def complete_job(self, job_id: str, worker_id: str, document_id: str, result: Dict[str, Any]) -> bool:
+        """Mark a job as succeeded"""
+        update_result = await self.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.lease_owner == worker_id)
+            .values(
+                status="succeeded",
+                document_id=document_id,
+                result=result,
+                error_message=None,
+                lease_owner=None,
+                lease_expires_at=None,
+                updated_at=datetime.utcnow()
+            )
+        )
+        await self.session.commit()
+        return update_result.rowcount == 1
+    
+    async def fail_job(self, job_id: str, worker_id: str, error_message: str) -> bool:
+        """Record a failed attempt, requeueing the job if attempts remain"""
+        job = await self.get_job(job_id)
+        if not job or job.lease_owner != worker_id:
+            return False
+        
+        job.status = "failed" if job.attempts >= job.max_attempts else "queued"
+        job.error_message = error_message
+        job.lease_owner = None
+        job.lease_expires_at = None
+        await self.session.commit()
+        return True
+
+
+class StoredFileRepository:
+    """Repository for stored file reference counts"""
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def add_reference(self, content_hash: str, size: Optional[int] = None, content_type: Optional[str] = None):
+        """Count one more user of a stored file, registering it on first use"""
+        increment = (
+            update(StoredFile)
+            .where(StoredFile.content_hash == content_hash)
+            .values(ref_count=StoredFile.ref_count + 1)
+        )
+        if (await self.session.execute(increment)).rowcount == 1:
+            await self.session.commit()
+            return
+        
+        self.session.add(StoredFile(content_hash=content_hash, size=size, content_type=content_type, ref_count=1))
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            # Registered concurrently by another request
+            await self.session.rollback()
+            await self.session.execute(increment)
+            await self.session.commit()
+    
+    async def release_reference(self, content_hash: str, delete_file: Callable[[str], Awaitable[None]]) -> bool:
+        """
+        Drop one user of a stored file, deleting the file with the last one
+        
+        The file is deleted before the transaction commits, while the row is
+        still write-locked, so a concurrent add_reference waits and then stores
+        the file again instead of counting on one that is about to disappear.
+        If the delete fails the release is rolled back.
+        
+        Args:
+            content_hash: SHA-256 hex digest of the file
+            delete_file: Deletes the stored file, given its digest
+            
+        Returns:
+            True if this was the last reference and the file was deleted
+        """
+        await self.session.execute(
+            update(StoredFile)
+            .where(StoredFile.content_hash == content_hash, StoredFile.ref_count > 0)
+            .values(ref_count=StoredFile.ref_count - 1)
+        )
+        result = await self.session.execute(
+            delete(StoredFile).where(StoredFile.content_hash == content_hash, StoredFile.ref_count <= 0)
+        )
+        if result.rowcount == 1:
+            try:
+                await delete_file(content_hash)
+            except BaseException:
+                await self.session.rollback()
+                raise
+        await self.session.commit()
+        return result.rowcount == 1
+    
+    async def get_stored_file(self, content_hash: str) -> Optional[StoredFile]:
+        """Get a stored file's size, type and reference count"""
+        result = await self.session.execute(
+            select(StoredFile).where(StoredFile.content_hash == content_hash)
+        )
+        return result.scalar_one_or_none()
+
+
+class UploadSessionRepository:
+    """Repository for resumable upload sessions"""
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    async def create_upload(self, file_name: str, file_path: str, upload_length: int, expires_at: datetime) -> UploadSession:
+        """Start a resumable upload"""
+        upload = UploadSession(
+            file_name=file_name,
+            file_path=file_path,
+            upload_length=upload_length,
+            upload_offset=0,
+            expires_at=expires_at
+        )
+        self.session.add(upload)
+        await self.session.commit()
+        await self.session.refresh(upload)
+        return upload
+    
+    async def get_upload(self, upload_id: str) -> Optional[UploadSession]:
+        """Get an unexpired upload by ID"""
+        result = await self.session.execute(
+            select(UploadSession)
+            .where(UploadSession.id == upload_id, UploadSession.expires_at > datetime.utcnow())
+        )
+        return result.scalar_one_or_none()
+    
+    async def lock_upload(self, upload_id: str, offset: int, lock_seconds: int) -> bool:
+        """
+        Lock an upload for appending at offset (or finalizing)
+        
+        A compare-and-swap UPDATE: fails if the offset doesn't match the bytes
+        received, the upload expired or another request holds the lock.
+        """
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            update(UploadSession)
+            .where(
+                UploadSession.id == upload_id,
+                UploadSession.upload_offset == offset,
+                UploadSession.expires_at > now,
+                or_(UploadSession.locked_until.is_(None), UploadSession.locked_until < now)
+            )
+            .values(locked_until=now + timedelta(seconds=lock_seconds))
+        )
+        await self.session.commit()
+        return result.rowcount == 1
+    
+    async def unlock_upload(self, upload_id: str, offset: int, expires_at: datetime):
+        """Record the bytes received, extend the expiry and release the lock"""
+        await self.session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == upload_id)
+            .values(upload_offset=offset, expires_at=expires_at, locked_until=None)
+        )
+        await self.session.commit()
+    
+    async def set_upload_file(self, upload_id: str, file_path: str):
+        """Point a completed upload at its stored file (kept until finalize succeeds)"""
+        await self.session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == upload_id)
+            .values(file_path=file_path)
+        )
+        await self.session.commit()
+    
+    async def delete_upload(self, upload_id: str):
+        """Forget an upload (its file is removed or released by the caller)"""
+        await self.session.execute(delete(UploadSession).where(UploadSession.id == upload_id))
+        await self.session.commit()
+    
+    async def delete_expired_uploads(self) -> List[str]:
+        """Forget expired uploads, returning their file paths for removal"""
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            select(UploadSession.file_path).where(UploadSession.expires_at <= now)
+        )
+        paths = list(result.scalars().all())
+        await self.session.execute(delete(UploadSession).where(UploadSession.expires_at <= now))
+        await self.session.commit()
+        return paths
+
+
 class DatabaseService:
     """Main database service combining all repositories"""
     
@@ -182,6 +516,9 @@ class DatabaseService:
         self.documents = DocumentRepository(session)
         self.fields = FieldRepository(session)
         self.history = ExtractionHistoryRepository(session)
+        self.jobs = JobRepository(session)
+        self.uploads = UploadSessionRepository(session)
+        self.files = StoredFileRepository(session)
     
     async def process_extraction_result(
         self, 
@@ -189,7 +526,9 @@ class DatabaseService:
         document_type: str,
         extracted_fields: Dict[str, Any],
         file_path: Optional[str] = None,
-        file_data_url: Optional[str] = None
+        previews: Optional[Dict[str, str]] = None,
+        model_tier: Optional[str] = None,
+        page_number: Optional[int] = None
     ) -> Document:
         """Process extraction result and save to database"""
         # Create document
@@ -197,8 +536,13 @@ class DatabaseService:
             file_name=file_name,
             document_type=document_type,
             file_path=file_path,
-            file_data_url=file_data_url
+            previews=previews,
+            page_number=page_number
         )
+        # The document keeps its stored file and previews alive until it is deleted
+        for stored_path in [file_path, document.thumbnail_path, document.preview_path]:
+            if key_hash(stored_path) is not None:
+                await self.files.add_reference(key_hash(stored_path))
         
         try:
             # Create extracted fields
@@ -211,7 +555,8 @@ class DatabaseService:
             await self.history.create_extraction_record(
                 document_id=document.id,
                 status="success",
-                extracted_data=extracted_fields
+                extracted_data=extracted_fields,
+                model_tier=model_tier
             )
             
             # Get complete document with fields
@@ -253,11 +598,13 @@ class DatabaseService:
         return {
             "id": document.id,
             "file_name": document.file_name,
-            "file_data_url": document.file_data_url,
+            "thumbnail_url": preview_url(document.id, "thumbnail", document.thumbnail_path),
+            "preview_url": preview_url(document.id, "preview", document.preview_path),
             "document_type": document.document_type,
             "upload_date": document.upload_date.isoformat(),
             "last_modified": document.last_modified.isoformat(),
             "status": document.status,
+            "page_number": document.page_number,
             "fields": {
                 field.field_name: {
                     "id": field.id,
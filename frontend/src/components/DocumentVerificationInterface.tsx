@@ -16,6 +16,8 @@ interface DocumentData {
   upload_date: string;
   last_modified: string;
   status: 'pending' | 'extracted' | 'verified' | 'error';
+  thumbnail_url?: string | null;
+  preview_url?: string | null;
   fields?: Record<string, any>;
 }
 
@@ -27,6 +29,7 @@ const DocumentVerificationInterface: React.FC = () => {
   const [editingField, setEditingField] = useState<string | null>(null);
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [documentImage, setDocumentImage] = useState<string | null>(null);
+  const [extractionStage, setExtractionStage] = useState<string | null>(null);
 
   // API endpoints - using proxy through Vite
   const API_BASE_URL = '/api';
@@ -65,9 +68,9 @@ const DocumentVerificationInterface: React.FC = () => {
         }));
         setExtractedFields(fieldsArray);
         
-        // Load document image from data URL
-        if (data.file_data_url) {
-          setDocumentImage(data.file_data_url);
+        // Load the stored preview rendition
+        if (data.preview_url) {
+          setDocumentImage(`${API_BASE_URL}${data.preview_url}`);
         } else {
           setDocumentImage(null);
         }
@@ -105,35 +108,90 @@ const DocumentVerificationInterface: React.FC = () => {
     if (!selectedFile) return;
 
     setIsLoading(true);
+    setExtractionStage('Uploading...');
+    setCurrentDocument(null);
+    setExtractedFields([]);
     try {
       const formData = new FormData();
       formData.append('file', selectedFile);
 
-      const response = await fetch(`${API_BASE_URL}/extract`, {
+      // Stream progress as Server-Sent Events so fields show up as they are parsed
+      const response = await fetch(`${API_BASE_URL}/extract/stream`, {
         method: 'POST',
         body: formData
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errorText = await response.text();
         console.error('Server error:', errorText);
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const result = await response.json();
-      console.log('Extraction result:', result);
-      
+      let documentId: string | null = null;
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop() || '';
+
+        for (const message of messages) {
+          const eventLine = message.split('\n').find(line => line.startsWith('event: '));
+          const dataLine = message.split('\n').find(line => line.startsWith('data: '));
+          if (!eventLine || !dataLine) continue;
+
+          const event = eventLine.slice('event: '.length);
+          const data = JSON.parse(dataLine.slice('data: '.length));
+
+          switch (event) {
+            case 'uploaded':
+              setExtractionStage('Processing...');
+              break;
+            case 'page_rendered':
+              setExtractionStage('Classifying...');
+              break;
+            case 'classified':
+              setExtractionStage(`Extracting ${data.document_type.replace('_', ' ')}...`);
+              break;
+            case 'field':
+              // Show provisional values until the stored document is loaded
+              setExtractedFields(fields => [
+                ...fields.filter(f => f.field_name !== data.name),
+                {
+                  id: `pending-${data.name}`,
+                  field_name: data.name,
+                  original_value: data.value,
+                  current_value: data.value,
+                  is_corrected: false
+                }
+              ]);
+              break;
+            case 'escalated':
+              // The fast model's answer was rejected; drop its provisional values
+              setExtractionStage('Re-checking with a stronger model...');
+              setExtractedFields(fields => fields.filter(f => !f.id.startsWith('pending-')));
+              break;
+            case 'extracted':
+              setExtractionStage('Saving...');
+              break;
+            case 'persisted':
+              documentId = data.document_id;
+              break;
+            case 'error':
+              throw new Error(data.detail);
+          }
+        }
+      }
+
       // Reload documents to get the newly created one
       await loadDocuments();
-      
-      // Load the most recent document (which should be the one just created)
-      // In a real app, the API would return the document ID
-      const documentsResponse = await fetch(`${API_BASE_URL}/documents?limit=1`);
-      if (documentsResponse.ok) {
-        const data = await documentsResponse.json();
-        if (data.documents && data.documents.length > 0) {
-          await loadDocument(data.documents[0].id);
-        }
+      if (documentId) {
+        await loadDocument(documentId);
       }
       
       // Clear the selected file
@@ -148,6 +206,7 @@ const DocumentVerificationInterface: React.FC = () => {
       }
     } finally {
       setIsLoading(false);
+      setExtractionStage(null);
     }
   };
 
@@ -281,7 +340,7 @@ const DocumentVerificationInterface: React.FC = () => {
                 disabled={!selectedFile || isLoading}
                 className="mt-4 w-full bg-blue-600 text-white py-2 px-4 rounded-lg hover:bg-blue-700 disabled:bg-gray-400 disabled:cursor-not-allowed transition-colors"
               >
-                {isLoading ? 'Extracting...' : 'Extract Fields'}
+                {isLoading ? (extractionStage || 'Extracting...') : 'Extract Fields'}
               </button>
             </div>
 
@@ -306,6 +365,14 @@ const DocumentVerificationInterface: React.FC = () => {
                         className="cursor-pointer"
                         onClick={() => loadDocument(doc.id)}
                       >
+                        {doc.thumbnail_url && (
+                          <img
+                            src={`${API_BASE_URL}${doc.thumbnail_url}`}
+                            alt=""
+                            loading="lazy"
+                            className="w-full h-20 object-cover rounded mb-2"
+                          />
+                        )}
                         <div className="flex items-center justify-between">
                           <span className="font-medium text-sm">
                             {doc.document_type.replace('_', ' ').toUpperCase()}
@@ -1,30 +1,50 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse, Response
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.requests import ClientDisconnect
 from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import asyncio
 import base64
-import io
-from PIL import Image
-from typing import Dict, Any
+import json
 import os
+from typing import Dict, Any, List, Optional
 import shutil
 from pathlib import Path
 
-from models import ClassificationResponse, FieldExtractionResponse, DocumentType, DOCUMENT_FIELDS
-from processors import DocumentClassifier, FieldExtractor
-from utils import process_pdf_to_images, image_to_base64
+from models import ClassificationResponse, FieldExtractionResponse, PageExtraction, DocumentType, DOCUMENT_FIELDS
+from processors import DocumentClassifier, FieldExtractor, DocumentPipeline, PDF_PAGE_MODES, llm_client, result_cache, cascade_stats, prompt_registry
+from utils import (
+    UploadBuffer, SpooledUpload, RequestSizeLimitMiddleware, ingest_upload, append_chunks, spool_partial, executor_stats, render_executor,
+    thread_executor, storage, key_hash, read_stored, store_upload, release_file, preview_url,
+    file_response, not_modified, IMMUTABLE_CACHE_CONTROL
+)
 from config import config
-from database.models import init_db, get_db
+from database.models import init_db, get_db, get_async_session
 from database.operations import DatabaseService
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Initialize processors
 classifier = DocumentClassifier()
 extractor = FieldExtractor()
+pipeline = DocumentPipeline(classifier, extractor, cache=result_cache)
 
 # Create upload directory
 UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
+PARTIAL_UPLOAD_DIR = UPLOAD_DIR / "partial"  # Resumable uploads still being received
+PARTIAL_UPLOAD_DIR.mkdir(exist_ok=True)
+TUS_VERSION = "1.0.0"
+
+async def receive_upload(file: UploadFile) -> SpooledUpload:
+    """Spool an upload to the storage staging area, checking its type and size while reading"""
+    return await ingest_upload(file, storage.staging_dir)
+
+def max_request_size(path: str) -> int:
+    """Largest request body an endpoint accepts"""
+    files = config.BATCH_MAX_FILES if path == "/extract/batch" else 1
+    return files * (config.MAX_FILE_SIZE + config.MULTIPART_OVERHEAD)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -38,11 +58,19 @@ async def lifespan(app: FastAPI):
         print("Configuration validated successfully")
     print(f"Starting {config.API_TITLE} v{config.API_VERSION}")
     print(f"Using OpenAI model: {config.OPENAI_MODEL}")
+    print(f"Prompt version: {prompt_registry.version}")
+    
+    # Open the shared LLM connection pool
+    await llm_client.start()
     
     yield
     
     # Shutdown
     print("Shutting down application...")
+    await llm_client.aclose()
+    result_cache.close()
+    render_executor.shutdown()
+    thread_executor.shutdown()
 
 # Create FastAPI app with lifespan
 app = FastAPI(
@@ -51,6 +79,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Reject oversized POST bodies, declared or chunked, before the form parser spools them
+app.add_middleware(RequestSizeLimitMiddleware, max_size=max_request_size)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -58,6 +89,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Upload-Expires", "Tus-Resumable", "ETag", "Content-Range", "Accept-Ranges"],
 )
 
 # Step 1: Classification endpoint
@@ -72,37 +104,18 @@ async def classify_document(file: UploadFile = File(...)):
     Returns:
         Document classification result
     """
-    # Validate file type
-    if file.content_type not in config.SUPPORTED_FILE_TYPES:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type. Supported types: {config.SUPPORTED_FILE_TYPES}"
-        )
-    
-    # Read file content
-    content = await file.read()
-    
-    # Validate file size
-    if len(content) > config.MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {config.MAX_FILE_SIZE} bytes"
-        )
+    # Check type and size while spooling; the upload is only kept until classified
+    spooled = await receive_upload(file)
     
     try:
-        # Process PDF or image
-        if file.content_type == "application/pdf":
-            images = process_pdf_to_images(content)
-            if not images:
-                raise HTTPException(status_code=400, detail="Could not extract images from PDF")
-            image = images[0]  # Use first page
-            image_base64 = image_to_base64(image)
-        else:
-            image = Image.open(io.BytesIO(content))
-            image_base64 = base64.b64encode(content).decode()
+        # Render the first PDF page or downscale the image to the token budget, off the event loop
+        upload = UploadBuffer(await spooled.read(), spooled.content_type, spooled.content_hash)
+        # The local classifier reads the full-resolution image, not the downscaled one
+        image_base64 = await upload.prepare(source=config.LOCAL_CLASSIFIER_ENABLED)
+        source_base64 = await upload.prepare_source() if config.LOCAL_CLASSIFIER_ENABLED else None
         
         # Classify document
-        document_type = await classifier.classify(image_base64)
+        document_type = await pipeline.classify(upload.content_hash, image_base64, source_base64)
         
         return ClassificationResponse(document_type=document_type)
         
@@ -113,11 +126,14 @@ async def classify_document(file: UploadFile = File(...)):
             status_code=500,
             detail=f"Error processing document: {str(e)}"
         )
+    finally:
+        spooled.discard()
 
 # Step 2: Field extraction endpoint with database persistence
 @app.post("/extract", response_model=FieldExtractionResponse)
 async def extract_fields(
     file: UploadFile = File(...),
+    pdf_mode: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -125,70 +141,88 @@ async def extract_fields(
     
     Args:
         file: Uploaded file (image or PDF)
+        pdf_mode: Multi-page PDF handling, "first", "best" or "all" (default config.PDF_PAGE_MODE)
         db: Database session
         
     Returns:
-        Document type and extracted fields
+        Document type and extracted fields; for scanned PDFs also the source page
+        and every document found
     """
-    # Validate file type
-    if file.content_type not in config.SUPPORTED_FILE_TYPES:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type. Supported types: {config.SUPPORTED_FILE_TYPES}"
-        )
+    pdf_mode = validate_pdf_mode(pdf_mode)
     
-    # Read file content
-    content = await file.read()
+    # Save uploaded file, checking type and size while reading
+    spooled = await receive_upload(file)
     
-    # Validate file size
-    if len(content) > config.MAX_FILE_SIZE:
+    return await extract_spooled(spooled, pdf_mode, DatabaseService(db))
+
+def validate_pdf_mode(pdf_mode: Optional[str]) -> str:
+    """Resolve the multi-page PDF mode, rejecting unknown ones"""
+    pdf_mode = pdf_mode or config.PDF_PAGE_MODE
+    if pdf_mode not in PDF_PAGE_MODES:
         raise HTTPException(
             status_code=400,
-            detail=f"File too large. Maximum size: {config.MAX_FILE_SIZE} bytes"
+            detail=f"Invalid pdf_mode. Supported modes: {list(PDF_PAGE_MODES)}"
         )
-    
-    # Save uploaded file
-    file_path = UPLOAD_DIR / f"{os.urandom(16).hex()}_{file.filename}"
-    with open(file_path, "wb") as f:
-        f.write(content)
+    return pdf_mode
+
+async def extract_spooled(spooled: SpooledUpload, pdf_mode: str, db_service: DatabaseService) -> FieldExtractionResponse:
+    """Classify, extract and persist a spooled upload"""
+    content = await spooled.read()
+    # Identical uploads share one stored file; documents created below keep it alive
+    file_path = await store_upload(spooled, db_service)
     
     try:
-        # Process PDF or image
-        image_base64 = None
-        file_data_url = None
-        
-        if file.content_type == "application/pdf":
-            images = process_pdf_to_images(content)
-            if not images:
-                raise HTTPException(status_code=400, detail="Could not extract images from PDF")
-            image = images[0]  # Use first page
-            image_base64 = image_to_base64(image)
-            # Create data URL for PDF preview
-            buffered = io.BytesIO()
-            image.save(buffered, format="PNG")
-            file_data_url = f"data:image/png;base64,{base64.b64encode(buffered.getvalue()).decode()}"
-        else:
-            image = Image.open(io.BytesIO(content))
-            image_base64 = base64.b64encode(content).decode()
-            # Create data URL for image
-            file_data_url = f"data:{file.content_type};base64,{image_base64}"
-        
-        # Classify document
-        document_type = await classifier.classify(image_base64)
-        
-        # Extract fields
-        fields = {}
-        if document_type != DocumentType.UNKNOWN:
-            fields = await extractor.extract(image_base64, document_type)
+        return await extract_stored(
+            file_path, spooled.file_name, spooled.content_type, spooled.content_hash, content, pdf_mode, db_service
+        )
+    finally:
+        # The stored file is deleted here unless a document references it
+        await release_file(file_path, db_service)
+
+async def extract_stored(
+    file_path: str,
+    file_name: str,
+    content_type: str,
+    content_hash: str,
+    content: bytes,
+    pdf_mode: str,
+    db_service: DatabaseService
+) -> FieldExtractionResponse:
+    """Classify, extract and persist a stored upload (shared by /extract and resumable uploads)"""
+    try:
+        if content_type == "application/pdf" and pdf_mode != "first":
+            pages = await pipeline.process_pdf_pages(
+                file_name=file_name,
+                content=content,
+                db_service=db_service,
+                file_path=file_path,
+                mode=pdf_mode,
+                content_hash=content_hash
+            )
+            page_number, document_type, fields, _ = pages[0]
+            return FieldExtractionResponse(
+                document_type=document_type,
+                document_content=fields,
+                page_number=page_number,
+                documents=[
+                    PageExtraction(
+                        page_number=number,
+                        document_type=page_type,
+                        document_content=page_fields,
+                        document_id=document.id
+                    )
+                    for number, page_type, page_fields, document in pages
+                ]
+            )
         
-        # Save to database with data URL
-        db_service = DatabaseService(db)
-        document = await db_service.process_extraction_result(
-            file_name=file.filename,
-            document_type=document_type.value,
-            extracted_fields=fields,
-            file_path=str(file_path),
-            file_data_url=file_data_url
+        document_type, fields, _ = await pipeline.process_upload(
+            file_name=file_name,
+            content_type=content_type,
+            content=content,
+            db_service=db_service,
+            file_path=file_path,
+            pdf_mode=pdf_mode,
+            content_hash=content_hash
         )
         
         return FieldExtractionResponse(
@@ -199,14 +233,422 @@ async def extract_fields(
     except HTTPException:
         raise
     except Exception as e:
-        # Clean up file on error
-        if file_path.exists():
-            file_path.unlink()
         raise HTTPException(
             status_code=500,
             detail=f"Error processing document: {str(e)}"
         )
 
+# Resumable upload endpoints (tus-style: create, append chunks by offset, finalize)
+def upload_headers(upload) -> Dict[str, str]:
+    """tus headers describing an upload's progress"""
+    return {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(upload.upload_offset),
+        "Upload-Length": str(upload.upload_length),
+        "Upload-Expires": format_datetime(upload.expires_at.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "no-store"
+    }
+
+def parse_upload_metadata(header: Optional[str]) -> Dict[str, str]:
+    """Decode a tus Upload-Metadata header ("key base64value,key base64value")"""
+    metadata = {}
+    for pair in (header or "").split(","):
+        parts = pair.strip().split(" ")
+        if parts[0]:
+            try:
+                metadata[parts[0]] = base64.b64decode(parts[1]).decode() if len(parts) > 1 else ""
+            except (ValueError, UnicodeDecodeError):
+                raise HTTPException(status_code=400, detail=f"Invalid Upload-Metadata value for {parts[0]}")
+    return metadata
+
+async def purge_expired_uploads(db_service: DatabaseService):
+    """Delete expired uploads and their partial (or stored, if finalize failed) files"""
+    for path in await db_service.uploads.delete_expired_uploads():
+        await release_file(path, db_service)
+
+def processing_size_limit(content_type: str) -> int:
+    """
+    Largest completed resumable upload that is extracted
+    
+    The pipeline holds the whole file in memory. PDFs may use the full
+    resumable size since pages are rendered one at a time; images are decoded
+    whole, so they keep the /extract limit.
+    """
+    if content_type == "application/pdf":
+        return config.RESUMABLE_UPLOAD_MAX_SIZE
+    return config.MAX_FILE_SIZE
+
+@app.post("/uploads", status_code=201)
+async def create_resumable_upload(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Start a resumable upload
+    
+    Headers:
+        Upload-Length: Total size in bytes
+        Upload-Metadata: Optional tus metadata; "filename" names the file
+        
+    Returns:
+        Upload id, offset and expiry; the Location header is the upload URL
+    """
+    length = request.headers.get("upload-length", "")
+    if not length.isdigit():
+        raise HTTPException(status_code=400, detail="Upload-Length header required")
+    if int(length) > config.RESUMABLE_UPLOAD_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Upload too large. Maximum size: {config.RESUMABLE_UPLOAD_MAX_SIZE} bytes"
+        )
+    file_name = parse_upload_metadata(request.headers.get("upload-metadata")).get("filename") or "upload"
+    
+    db_service = DatabaseService(db)
+    await purge_expired_uploads(db_service)
+    
+    partial_path = PARTIAL_UPLOAD_DIR / f"{os.urandom(16).hex()}.part"
+    partial_path.touch()
+    upload = await db_service.uploads.create_upload(
+        file_name=Path(file_name).name,
+        file_path=str(partial_path),
+        upload_length=int(length),
+        expires_at=datetime.utcnow() + timedelta(seconds=config.RESUMABLE_UPLOAD_EXPIRY_SECONDS)
+    )
+    
+    return JSONResponse(
+        status_code=201,
+        content={
+            "upload_id": upload.id,
+            "offset": upload.upload_offset,
+            "length": upload.upload_length,
+            "expires_at": upload.expires_at.isoformat()
+        },
+        headers={**upload_headers(upload), "Location": f"/uploads/{upload.id}"}
+    )
+
+@app.head("/uploads/{upload_id}")
+async def get_resumable_upload_offset(upload_id: str, db: AsyncSession = Depends(get_db)):
+    """Get the offset to resume an upload from (Upload-Offset header)"""
+    upload = await DatabaseService(db).uploads.get_upload(upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return Response(status_code=200, headers=upload_headers(upload))
+
+@app.patch("/uploads/{upload_id}")
+async def append_resumable_upload(upload_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Append a chunk to an upload at Upload-Offset
+    
+    The body (Content-Type: application/offset+octet-stream) is written as it
+    arrives; if the connection drops, the bytes received are kept and HEAD
+    reports where to resume.
+    
+    Returns:
+        204 with the new Upload-Offset
+    """
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        raise HTTPException(status_code=415, detail="Content-Type must be application/offset+octet-stream")
+    offset = request.headers.get("upload-offset", "")
+    if not offset.isdigit():
+        raise HTTPException(status_code=400, detail="Upload-Offset header required")
+    
+    uploads = DatabaseService(db).uploads
+    upload = await uploads.get_upload(upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if key_hash(upload.file_path) is not None:
+        raise HTTPException(status_code=409, detail="Upload is complete; finalize it to retry extraction")
+    if not await uploads.lock_upload(upload_id, int(offset), config.RESUMABLE_UPLOAD_LOCK_SECONDS):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload-Offset {offset} does not match the {upload.upload_offset} bytes received, or another chunk is being appended"
+        )
+    
+    partial_path = Path(upload.file_path)
+    try:
+        await append_chunks(partial_path, int(offset), request.stream(), upload.upload_length)
+    except ClientDisconnect:
+        pass
+    finally:
+        # Whatever reached the disk counts, even if the request failed part-way
+        await uploads.unlock_upload(
+            upload_id,
+            partial_path.stat().st_size,
+            datetime.utcnow() + timedelta(seconds=config.RESUMABLE_UPLOAD_EXPIRY_SECONDS)
+        )
+    
+    await db.refresh(upload)
+    return Response(status_code=204, headers=upload_headers(upload))
+
+@app.post("/uploads/{upload_id}/finalize", response_model=FieldExtractionResponse)
+async def finalize_resumable_upload(
+    upload_id: str,
+    pdf_mode: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Extract fields from a completed upload, as /extract does for a form upload
+    
+    Args:
+        upload_id: Upload id
+        pdf_mode: Multi-page PDF handling, "first", "best" or "all" (default config.PDF_PAGE_MODE)
+        db: Database session
+        
+    Returns:
+        Document type and extracted fields, as returned by /extract
+    """
+    pdf_mode = validate_pdf_mode(pdf_mode)
+    db_service = DatabaseService(db)
+    upload = await db_service.uploads.get_upload(upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    # Locking at the full length fails while bytes are missing or a chunk is still being written
+    if not await db_service.uploads.lock_upload(upload_id, upload.upload_length, config.RESUMABLE_UPLOAD_LOCK_SECONDS):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload incomplete: {upload.upload_offset} of {upload.upload_length} bytes received"
+        )
+    
+    file_path = upload.file_path
+    try:
+        if key_hash(file_path) is None:
+            # Move the received bytes into storage; the upload holds the reference
+            # until extraction succeeds, so a failed finalize can be retried
+            spooled = await spool_partial(Path(file_path), storage.staging_dir, upload.file_name)
+            file_path = await store_upload(spooled, db_service)
+            await db_service.uploads.set_upload_file(upload_id, file_path)
+        stored = await db_service.files.get_stored_file(key_hash(file_path))
+        limit = processing_size_limit(stored.content_type)
+        if stored.size > limit:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large to process. Maximum size for {stored.content_type}: {limit} bytes"
+            )
+    except HTTPException:
+        # Unsupported or too large: finalizing again can't succeed
+        await release_file(file_path, db_service)
+        await db_service.uploads.delete_upload(upload_id)
+        raise
+    
+    try:
+        response = await extract_stored(
+            file_path, upload.file_name, stored.content_type, key_hash(file_path),
+            await read_stored(file_path), pdf_mode, db_service
+        )
+    except BaseException:
+        # Keep the upload, complete and unlocked, so finalize can be retried without re-sending it
+        await db_service.uploads.unlock_upload(
+            upload_id,
+            upload.upload_length,
+            datetime.utcnow() + timedelta(seconds=config.RESUMABLE_UPLOAD_EXPIRY_SECONDS)
+        )
+        raise
+    
+    await db_service.uploads.delete_upload(upload_id)
+    await release_file(file_path, db_service)
+    return response
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+async def delete_resumable_upload(upload_id: str, db: AsyncSession = Depends(get_db)):
+    """Abandon an upload and delete the bytes received"""
+    db_service = DatabaseService(db)
+    upload = await db_service.uploads.get_upload(upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    await db_service.uploads.delete_upload(upload_id)
+    await release_file(upload.file_path, db_service)
+    return Response(status_code=204, headers={"Tus-Resumable": TUS_VERSION})
+
+# Streaming field extraction endpoint
+@app.post("/extract/stream")
+async def extract_fields_stream(file: UploadFile = File(...)):
+    """
+    Classify and extract fields, streaming progress as Server-Sent Events
+    
+    Args:
+        file: Uploaded file (image or PDF)
+        
+    Returns:
+        text/event-stream of uploaded, page_rendered, classified, field,
+        extracted and persisted events (or a final error event)
+    """
+    # Save uploaded file, checking type and size while reading
+    spooled = await receive_upload(file)
+    
+    async def event_stream():
+        yield format_sse("uploaded", {"file_name": spooled.file_name, "size": spooled.size})
+        
+        AsyncSessionLocal = get_async_session()
+        async with AsyncSessionLocal() as session:
+            db_service = DatabaseService(session)
+            file_path = None
+            try:
+                content = await spooled.read()
+                file_path = await store_upload(spooled, db_service)
+                async for event in pipeline.process_upload_stream(
+                    file_name=spooled.file_name,
+                    content_type=spooled.content_type,
+                    content=content,
+                    db_service=db_service,
+                    file_path=file_path,
+                    content_hash=spooled.content_hash
+                ):
+                    yield format_sse(event.pop("event"), event)
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else f"Error processing document: {str(e)}"
+                yield format_sse("error", {"detail": detail})
+            finally:
+                spooled.discard()
+                await release_file(file_path, db_service)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Batch field extraction endpoint
+@app.post("/extract/batch")
+async def extract_fields_batch(
+    files: List[UploadFile] = File(...),
+    stream: bool = False
+):
+    """
+    Classify and extract fields from many documents concurrently
+    
+    Args:
+        files: Uploaded files (images or PDFs)
+        stream: Stream one NDJSON line per file as each finishes
+        
+    Returns:
+        Per-file results and errors
+    """
+    if len(files) > config.BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Maximum per batch: {config.BATCH_MAX_FILES}"
+        )
+    
+    semaphore = asyncio.Semaphore(config.BATCH_MAX_PARALLELISM)
+    
+    async def process(index: int, file: UploadFile) -> Dict[str, Any]:
+        async with semaphore:
+            return await process_batch_file(index, file)
+    
+    tasks = [asyncio.ensure_future(process(index, file)) for index, file in enumerate(files)]
+    
+    if stream:
+        async def stream_results():
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    
+    results = await asyncio.gather(*tasks)
+    succeeded = sum(1 for result in results if result["status"] == "success")
+    
+    return {
+        "results": results,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    }
+
+async def process_batch_file(index: int, file: UploadFile) -> Dict[str, Any]:
+    """Process one file of a batch in its own database session"""
+    result = {"index": index, "file_name": file.filename}
+    spooled = None
+    
+    AsyncSessionLocal = get_async_session()
+    async with AsyncSessionLocal() as session:
+        db_service = DatabaseService(session)
+        file_path = None
+        try:
+            spooled = await receive_upload(file)
+            content = await spooled.read()
+            file_path = await store_upload(spooled, db_service)
+            
+            document_type, fields, _ = await pipeline.process_upload(
+                file_name=spooled.file_name,
+                content_type=spooled.content_type,
+                content=content,
+                db_service=db_service,
+                file_path=file_path,
+                content_hash=spooled.content_hash
+            )
+            
+            result.update({
+                "status": "success",
+                "document_type": document_type.value,
+                "document_content": fields
+            })
+        except Exception as e:
+            result.update({
+                "status": "error",
+                "error": e.detail if isinstance(e, HTTPException) else f"Error processing document: {str(e)}"
+            })
+        finally:
+            if spooled is not None:
+                spooled.discard()
+            await release_file(file_path, db_service)
+    
+    return result
+
+# Asynchronous job endpoints
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Queue a document for extraction by a worker process
+    
+    Args:
+        file: Uploaded file (image or PDF)
+        db: Database session
+        
+    Returns:
+        Job id and initial status
+    """
+    # Store uploaded file for the worker, checking type and size while reading;
+    # the job holds a reference to it until it finishes
+    spooled = await receive_upload(file)
+    
+    db_service = DatabaseService(db)
+    job = await db_service.jobs.create_job(
+        file_name=spooled.file_name,
+        file_path=await store_upload(spooled, db_service),
+        content_type=spooled.content_type,
+        max_attempts=config.JOB_MAX_ATTEMPTS
+    )
+    
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get job status and, once finished, its result"""
+    db_service = DatabaseService(db)
+    job = await db_service.jobs.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "file_name": job.file_name,
+        "attempts": job.attempts,
+        "document_id": job.document_id,
+        "result": job.result,
+        "error_message": job.error_message,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat()
+    }
+
 # Utility endpoints
 @app.get("/")
 async def root():
@@ -217,8 +659,15 @@ async def root():
         "endpoints": {
             "classify": "/classify",
             "extract": "/extract",
+            "extract-stream": "/extract/stream",
+            "extract-batch": "/extract/batch",
+            "jobs": "/jobs",
+            "uploads": "/uploads",
             "health": "/health",
-            "document-types": "/document-types"
+            "document-types": "/document-types",
+            "cache-stats": "/cache/stats",
+            "llm-stats": "/llm/stats",
+            "executor-stats": "/executor/stats"
         }
     }
 
@@ -231,6 +680,29 @@ async def health_check():
         "model": config.OPENAI_MODEL
     }
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get result cache hit/miss and request coalescing counters"""
+    return {
+        "result_cache": result_cache.stats(),
+        "single_flight": pipeline.flights.stats()
+    }
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    """Get upstream rate limiter, concurrency, resilience, model cascade and prompt state"""
+    return {
+        "rate_limiter": llm_client.limiter.stats(),
+        "resilience": llm_client.resilience.stats(),
+        "cascade": cascade_stats.stats(),
+        "prompts": prompt_registry.stats()
+    }
+
+@app.get("/executor/stats")
+async def get_executor_stats():
+    """Get queue depth and wait/run times of the image rendering and thread executors"""
+    return executor_stats()
+
 @app.get("/document-types")
 async def get_document_types():
     """
@@ -264,7 +736,8 @@ async def get_documents(
                 "document_type": doc.document_type,
                 "upload_date": doc.upload_date.isoformat(),
                 "status": doc.status,
-                "file_data_url": doc.file_data_url  # Include the data URL
+                "page_number": doc.page_number,
+                "thumbnail_url": preview_url(doc.id, "thumbnail", doc.thumbnail_path)
             }
             for doc in documents
         ],
@@ -326,11 +799,9 @@ async def delete_document(
     # Delete from database
     deleted = await db_service.documents.delete_document(document_id)
     
-    # Delete the file if it exists
-    if document.file_path:
-        file_path = Path(document.file_path)
-        if file_path.exists():
-            file_path.unlink()
+    # Delete the file and previews unless other documents share them
+    for file_path in [document.file_path, document.thumbnail_path, document.preview_path]:
+        await release_file(file_path, db_service)
     
     return {"message": "Document deleted successfully"}
 
@@ -350,7 +821,8 @@ async def get_document_history(
                 "extraction_date": record.extraction_date.isoformat(),
                 "status": record.status,
                 "error_message": record.error_message,
-                "extracted_data": record.extracted_data
+                "extracted_data": record.extracted_data,
+                "model_tier": record.model_tier
             }
             for record in history
         ]
@@ -384,34 +856,75 @@ async def get_document_corrections(
     
     return {"corrections": corrections}
 
+async def serve_stored_file(request: Request, file_path: str, db_service: DatabaseService) -> Response:
+    """
+    Serve a stored file with a strong ETag, immutable caching and Range support
+    
+    A matching If-None-Match is answered with 304 before storage is touched.
+    Files on local disk are streamed (or sent with sendfile) rather than read
+    into memory.
+    
+    Args:
+        request: Incoming request
+        file_path: Stored file reference, or a path written before content-addressed storage
+        db_service: Database service holding the stored file's type
+        
+    Returns:
+        200, 206 or 304 response
+    """
+    content_hash = key_hash(file_path)
+    try:
+        if content_hash is None:
+            # Legacy files have no digest to derive a validator from, so they aren't cached
+            return await file_response(request, path=Path(file_path))
+        
+        headers = {"ETag": f'"{content_hash}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        cached = not_modified(request, headers["ETag"], headers)
+        if cached is not None:
+            return cached
+        
+        stored = await db_service.files.get_stored_file(content_hash)
+        media_type = stored.content_type if stored else None
+        local_path = storage.local_path(content_hash)
+        if local_path is not None:
+            return await file_response(request, path=local_path, media_type=media_type, headers=headers)
+        return await file_response(request, content=await storage.get(content_hash), media_type=media_type, headers=headers)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+
 @app.get("/documents/{document_id}/image")
 async def get_document_image(
     document_id: str,
+    request: Request,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get the image file for a document"""
+    """Get the uploaded file for a document"""
     db_service = DatabaseService(db)
     document = await db_service.documents.get_document(document_id)
     
     if not document or not document.file_path:
         raise HTTPException(status_code=404, detail="Document or image not found")
     
-    file_path = Path(document.file_path)
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Image file not found")
-    
-    # Determine content type based on file extension
-    content_type = "image/jpeg"  # Default
-    if file_path.suffix.lower() == ".png":
-        content_type = "image/png"
-    elif file_path.suffix.lower() == ".pdf":
-        content_type = "application/pdf"
+    return await serve_stored_file(request, document.file_path, db_service)
+
+@app.get("/documents/{document_id}/previews/{name}")
+async def get_document_preview(
+    document_id: str,
+    name: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get a preview rendition of a document ("thumbnail" or "preview")"""
+    if name not in config.PREVIEW_SIZES:
+        raise HTTPException(status_code=404, detail="Unknown preview size")
     
-    # Read and return the file
-    with open(file_path, "rb") as f:
-        content = f.read()
+    db_service = DatabaseService(db)
+    document = await db_service.documents.get_document(document_id)
+    file_path = getattr(document, f"{name}_path", None) if document else None
+    if not file_path:
+        raise HTTPException(status_code=404, detail="Document or preview not found")
     
-    return Response(content=content, media_type=content_type)
+    return await serve_stored_file(request, file_path, db_service)
 
 if __name__ == "__main__":
     import uvicorn
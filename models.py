@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 
 # Document types enumeration
@@ -43,13 +43,29 @@ DOCUMENT_FIELDS = {
     }
 }
 
+# Fields a result must contain before a cheap-model answer is accepted
+# (name fields are filled from each other in post-processing, so full_name covers all three)
+REQUIRED_FIELDS = {
+    DocumentType.PASSPORT: ["full_name", "date_of_birth", "passport_number", "expiration_date"],
+    DocumentType.DRIVER_LICENSE: ["full_name", "date_of_birth", "license_number", "expiration_date"],
+    DocumentType.EAD_CARD: ["full_name", "date_of_birth", "card_number", "category", "card_expires_date"]
+}
+
 # Response models
 class ClassificationResponse(BaseModel):
     document_type: DocumentType
 
+class PageExtraction(BaseModel):
+    page_number: int
+    document_type: DocumentType
+    document_content: Dict[str, Any]
+    document_id: str
+
 class FieldExtractionResponse(BaseModel):
     document_type: DocumentType
     document_content: Dict[str, Any]
+    page_number: Optional[int] = None  # Source page of a multi-page PDF
+    documents: Optional[List[PageExtraction]] = None  # Every document found in the PDF
     confidence_scores: Optional[Dict[str, float]] = None
 
 # Request models
@@ -1,6 +1,35 @@
 """Document processing package"""
 
 from .classifier import DocumentClassifier
+from .local_classifier import LocalClassifier
+from .decoder import DocumentDecoder
 from .extractor import FieldExtractor
+from .rate_limiter import AdaptiveRateLimiter
+from .resilience import ResilientCaller, CircuitOpenError
+from .llm_client import LLMClient, llm_client
+from .cache import ResultCache, result_cache
+from .singleflight import SingleFlight
+from .cascade import ModelCascade, cascade_stats
+from .prompts import PromptRegistry, prompt_registry
+from .pipeline import DocumentPipeline, PDF_PAGE_MODES
 
-__all__ = ['DocumentClassifier', 'FieldExtractor']
\ No newline at end of file
+__all__ = [
+    'DocumentClassifier',
+    'LocalClassifier',
+    'DocumentDecoder',
+    'FieldExtractor',
+    'AdaptiveRateLimiter',
+    'ResilientCaller',
+    'CircuitOpenError',
+    'LLMClient',
+    'llm_client',
+    'ResultCache',
+    'result_cache',
+    'SingleFlight',
+    'ModelCascade',
+    'cascade_stats',
+    'PromptRegistry',
+    'prompt_registry',
+    'DocumentPipeline',
+    'PDF_PAGE_MODES'
+]
\ No newline at end of file
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from config import config
+from processors.cascade import model_tiers
+from processors.prompts import prompt_registry
+from utils.executors import thread_executor
+
+class ResultCache:
+    """Two-tier (in-memory LRU + SQLite) cache for LLM processing results"""
+
+    # Prune the persistent tier once every N writes
+    PRUNE_INTERVAL = 100
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_memory_entries: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        ttl: Optional[int] = None
+    ):
+        self.db_path = db_path or config.RESULT_CACHE_DB_PATH
+        self.max_memory_entries = max_memory_entries or config.RESULT_CACHE_MEMORY_ENTRIES
+        self.max_rows = max_rows or config.RESULT_CACHE_MAX_ROWS
+        self.ttl = ttl or config.RESULT_CACHE_TTL
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0
+        }
+
+    @staticmethod
+    def make_key(content_hash: str, operation: str, *parts: str) -> str:
+        """
+        Build a cache key for a processing result
+
+        Args:
+            content_hash: SHA-256 hex digest of the uploaded bytes
+            operation: Operation name (classify, extract)
+            parts: Extra discriminators (e.g. document type)
+
+        Returns:
+            Cache key string
+        """
+        return ":".join([
+            content_hash,
+            operation,
+            "+".join(model_tiers()),
+            prompt_registry.version,
+            *parts
+        ])
+
+    @staticmethod
+    def hash_content(content: bytes) -> str:
+        """Compute the SHA-256 hex digest of uploaded bytes"""
+        return hashlib.sha256(content).hexdigest()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached result
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Cached value or None on miss
+        """
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return value
+            del self._memory[key]
+
+        try:
+            row = await thread_executor.run(self._db_get, key, now)
+        except sqlite3.Error as e:
+            print(f"Result cache read error: {str(e)}")
+            row = None
+
+        if row is None:
+            self.counters["misses"] += 1
+            return None
+
+        expires_at, value = row
+        self._remember(key, value, expires_at)
+        self.counters["disk_hits"] += 1
+        return value
+
+    async def set(self, key: str, value: Any):
+        """
+        Store a result in both tiers
+
+        Args:
+            key: Cache key from make_key
+            value: JSON-serializable result
+        """
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        self.counters["writes"] += 1
+
+        try:
+            await thread_executor.run(self._db_set, key, value, expires_at)
+        except sqlite3.Error as e:
+            print(f"Result cache write error: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters"""
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        return {
+            **self.counters,
+            "memory_entries": len(self._memory),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self):
+        """Close the persistent tier"""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        """Insert into the in-memory LRU, evicting the least recently used entries"""
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the SQLite connection and create the cache table on first use"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS result_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_result_cache_last_access ON result_cache (last_access)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _db_get(self, key: str, now: float) -> Optional[tuple]:
+        """Read a non-expired row from the persistent tier"""
+        with self._db_lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, expires_at FROM result_cache WHERE cache_key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE result_cache SET last_access = ? WHERE cache_key = ?",
+                (now, key)
+            )
+            conn.commit()
+            return row[1], json.loads(row[0])
+
+    def _db_set(self, key: str, value: Any, expires_at: float):
+        """Write a row to the persistent tier and prune periodically"""
+        with self._db_lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache (cache_key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_INTERVAL == 0:
+                self._prune(conn)
+            conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Drop expired rows and trim the table to max_rows by last access"""
+        cursor = conn.execute("DELETE FROM result_cache WHERE expires_at <= ?", (time.time(),))
+        evicted = cursor.rowcount
+        cursor = conn.execute(
+            """
+            DELETE FROM result_cache WHERE cache_key IN (
+                SELECT cache_key FROM result_cache
+                ORDER BY last_access DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_rows,)
+        )
+        evicted += cursor.rowcount
+        self.counters["evictions"] += max(evicted, 0)
+
+# Application-scoped result cache
+result_cache = ResultCache()
@@ -0,0 +1,176 @@
+import re
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from models import DocumentType, DOCUMENT_FIELDS, REQUIRED_FIELDS
+from config import config
+
+DATE_FORMAT = "%m/%d/%Y"
+MAX_AGE_YEARS = 120
+EAD_CATEGORY_PATTERN = re.compile(r"^[A-C]\d{1,2}[A-Z]?$")
+IDENTIFIER_PATTERN = re.compile(r"^[A-Z0-9][A-Z0-9 \-]{3,}$", re.IGNORECASE)
+IDENTIFIER_FIELDS = ["passport_number", "license_number", "card_number"]
+
+
+def model_tiers() -> List[str]:
+    """Models to try in order: the cheap model first when the cascade is enabled"""
+    if config.LLM_CASCADE_ENABLED and config.OPENAI_CHEAP_MODEL != config.OPENAI_MODEL:
+        return [config.OPENAI_CHEAP_MODEL, config.OPENAI_MODEL]
+    return [config.OPENAI_MODEL]
+
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.strptime(str(value), DATE_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def check_schema(fields: Any) -> List[str]:
+    """
+    Check that a parsed LLM response is a flat JSON object of scalar values
+
+    Args:
+        fields: Parsed response
+
+    Returns:
+        List of problems (empty when the response is well-formed)
+    """
+    if not isinstance(fields, dict) or not fields:
+        return ["schema:not_an_object"]
+    for field, value in fields.items():
+        if value is not None and not isinstance(value, (str, int, float)):
+            return [f"schema:{field}"]
+    return []
+
+
+def check_fields(fields: Dict[str, Any], document_type: DocumentType) -> List[str]:
+    """
+    Validate post-processed fields for completeness and cross-field sanity
+
+    Args:
+        fields: Post-processed fields (dates standardized to MM/DD/YYYY)
+        document_type: Type of document
+
+    Returns:
+        List of problems (empty when the result can be accepted)
+    """
+    if document_type not in DOCUMENT_FIELDS:
+        return ["document_type:unknown"]
+
+    problems = [
+        f"missing:{field}"
+        for field in REQUIRED_FIELDS.get(document_type, [])
+        if not fields.get(field)
+    ]
+
+    # Every present date must have survived standardization
+    dates = {}
+    for field, value in fields.items():
+        if value and any(date_keyword in field for date_keyword in ["date", "expires"]):
+            parsed = _parse_date(value)
+            if parsed is None:
+                problems.append(f"sanity:{field}_format")
+            else:
+                dates[field] = parsed
+
+    birth = dates.get("date_of_birth")
+    issued = dates.get("issue_date")
+    expires = dates.get("expiration_date") or dates.get("card_expires_date")
+    today = datetime.utcnow()
+
+    if birth and (birth > today or today.year - birth.year > MAX_AGE_YEARS):
+        problems.append("sanity:date_of_birth_range")
+    if birth and issued and issued < birth:
+        problems.append("sanity:issued_before_birth")
+    if issued and expires and expires <= issued:
+        problems.append("sanity:expires_before_issued")
+
+    for field in IDENTIFIER_FIELDS:
+        if fields.get(field) and not IDENTIFIER_PATTERN.match(str(fields[field])):
+            problems.append(f"sanity:{field}_format")
+
+    category = fields.get("category")
+    if category and not EAD_CATEGORY_PATTERN.match(re.sub(r"[\s()]", "", str(category)).upper()):
+        problems.append("sanity:category_format")
+
+    if fields.get("full_name") and not re.search(r"[^\W\d_]", str(fields["full_name"])):
+        problems.append("sanity:full_name_format")
+
+    return problems
+
+
+class CascadeStats:
+    """Counters of which model tier answered each operation and why calls escalated"""
+
+    def __init__(self):
+        self.answered: Dict[str, Dict[str, int]] = {}
+        self.escalations: Dict[str, Dict[str, int]] = {}
+        self.unvalidated: Dict[str, int] = {}
+
+    def record_answer(self, operation: str, model: str, validated: bool = True):
+        answered = self.answered.setdefault(operation, {})
+        answered[model] = answered.get(model, 0) + 1
+        if not validated:
+            self.unvalidated[operation] = self.unvalidated.get(operation, 0) + 1
+
+    def record_escalation(self, operation: str, model: str, problems: List[str]):
+        print(f"Escalating {operation} from {model}: {', '.join(problems)}")
+        escalations = self.escalations.setdefault(operation, {})
+        # Count by category (missing, sanity, schema, ...) so the counters stay bounded
+        for category in sorted({problem.split(":")[0] for problem in problems}):
+            escalations[category] = escalations.get(category, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get per-operation tier and escalation counters"""
+        return {
+            "tiers": model_tiers(),
+            "answered": self.answered,
+            "escalations": self.escalations,
+            "unvalidated": self.unvalidated
+        }
+
+
+cascade_stats = CascadeStats()
+
+
+class ModelCascade:
+    """Run an LLM operation on successively stronger models until the answer validates"""
+
+    def __init__(self, operation: str, stats: Optional[CascadeStats] = None):
+        self.operation = operation
+        self.stats = stats or cascade_stats
+
+    async def run(
+        self,
+        attempt: Callable[[str], Awaitable[Tuple[Any, List[str]]]]
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        Call attempt(model) for each tier until one returns no problems
+
+        Args:
+            attempt: Coroutine taking a model name and returning (result, problems);
+                result is None when the call produced nothing usable
+
+        Returns:
+            Tuple of (result, model that answered). When no tier validates, the
+            last usable result is returned; (None, None) if there is none.
+        """
+        models = model_tiers()
+        fallback: Tuple[Any, Optional[str]] = (None, None)
+
+        for index, model in enumerate(models):
+            result, problems = await attempt(model)
+
+            if not problems:
+                self.stats.record_answer(self.operation, model)
+                return result, model
+
+            if result is not None:
+                fallback = (result, model)
+
+            if index < len(models) - 1:
+                self.stats.record_escalation(self.operation, model, problems)
+
+        if fallback[1] is not None:
+            self.stats.record_answer(self.operation, fallback[1], validated=False)
+        return fallback
@@ -1,88 +1,113 @@
-import httpx
-from typing import Optional
+from typing import List, Optional, Tuple
 from models import DocumentType
 from config import config
+from processors.llm_client import LLMClient, llm_client as shared_llm_client
+from processors.cascade import ModelCascade
+from processors.prompts import prompt_registry
+from processors.local_classifier import LocalClassifier
+from utils.executors import thread_executor
+
+LOCAL_TIER = "local"
 
 class DocumentClassifier:
     """Document classification using vision LLM"""
     
-    def __init__(self):
-        self.api_key = config.OPENAI_API_KEY
-        self.base_url = config.OPENAI_BASE_URL
+    def __init__(self, llm_client: Optional[LLMClient] = None, local_classifier: Optional[LocalClassifier] = None):
+        self.llm = llm_client or shared_llm_client
         self.model = config.OPENAI_MODEL
-        self.timeout = config.OPENAI_TIMEOUT
+        self.cascade = ModelCascade("classify")
+        self.local = local_classifier or LocalClassifier()
     
-    async def classify(self, image_base64: str) -> DocumentType:
+    async def classify(self, image_base64: str, source_base64: Optional[str] = None) -> DocumentType:
         """
         Classify document type from image
         
         Args:
             image_base64: Base64 encoded image
+            source_base64: Full-resolution image for the local classifier (default image_base64)
             
         Returns:
             DocumentType enum value
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        document_type, _ = await self.classify_with_tier(image_base64, source_base64)
+        return document_type
+    
+    async def classify_with_tier(
+        self,
+        image_base64: str,
+        source_base64: Optional[str] = None
+    ) -> Tuple[DocumentType, Optional[str]]:
+        """
+        Classify document type, escalating from the cheap model when its answer is unusable
         
-        prompt = """
-        Please analyze this image and determine what type of immigration document it is.
-        Classify it as one of the following:
-        - passport: International travel document
-        - driver_license: State-issued driver's license
-        - ead_card: Employment Authorization Document (EAD) card
+        Args:
+            image_base64: Base64 encoded image sent to the LLM
+            source_base64: Full-resolution image for the local classifier (default image_base64)
+            
+        Returns:
+            Tuple of (DocumentType, model that answered or None if every call failed)
+        """
+        document_type = await self.classify_local(source_base64 or image_base64)
+        if document_type is not None:
+            return document_type, LOCAL_TIER
         
-        Only respond with one of these exact words: passport, driver_license, ead_card, or unknown
+        document_type, model = await self.cascade.run(
+            lambda model: self._classify_with_model(image_base64, model)
+        )
+        return document_type or DocumentType.UNKNOWN, model
+    
+    async def classify_local(self, image_base64: str) -> Optional[DocumentType]:
         """
+        Classify from local image features without calling the LLM
         
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            "max_tokens": 50,
-            "temperature": 0
-        }
+        Args:
+            image_base64: Base64 encoded image
+            
+        Returns:
+            DocumentType when the local classifier is confident, otherwise None
+        """
+        if not config.LOCAL_CLASSIFIER_ENABLED:
+            return None
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    self.base_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=self.timeout
-                )
-                
-                if response.status_code != 200:
-                    print(f"Classification error: {response.status_code} - {response.text}")
-                    return DocumentType.UNKNOWN
-                
-                result = response.json()
+        try:
+            document_type, confidence = await thread_executor.run(self.local.classify_base64, image_base64)
+        except Exception as e:
+            print(f"Local classification failed: {str(e)}")
+            return None
+        
+        if document_type == DocumentType.UNKNOWN or confidence < config.LOCAL_CLASSIFIER_MIN_CONFIDENCE:
+            self.cascade.stats.record_escalation("classify", LOCAL_TIER, [f"local:{document_type.value}@{confidence:.2f}"])
+            return None
+        
+        self.cascade.stats.record_answer("classify", LOCAL_TIER)
+        return document_type
+    
+    async def _classify_with_model(self, image_base64: str, model: str) -> Tuple[Optional[DocumentType], List[str]]:
+        """Classify with one model, returning (type or None, problems)"""
+        payload = prompt_registry.classify.payload(
+            image_base64, model, max_tokens=50, temperature=0, detail=config.LLM_IMAGE_DETAIL["classify"]
+        )
+        
+        try:
+            response = await self.llm.post(payload, operation="classify")
+            
+            if response.status_code != 200:
+                print(f"Classification error: {response.status_code} - {response.text}")
+                return None, ["error"]
+            
+            result = response.json()
+            
+            if "choices" in result and len(result["choices"]) > 0:
+                classification = result["choices"][0]["message"]["content"].strip().lower()
                 
-                if "choices" in result and len(result["choices"]) > 0:
-                    classification = result["choices"][0]["message"]["content"].strip().lower()
-                    
-                    if classification in [doc_type.value for doc_type in DocumentType]:
-                        return DocumentType(classification)
+                if classification == DocumentType.UNKNOWN.value:
+                    # Only trust "unknown" from the strongest model
+                    return DocumentType.UNKNOWN, ["document_type:unknown"]
+                if classification in [doc_type.value for doc_type in DocumentType]:
+                    return DocumentType(classification), []
+            
+            return None, ["schema:label"]
                 
-                return DocumentType.UNKNOWN
-                    
-            except Exception as e:
-                print(f"Error during classification: {str(e)}")
-                return DocumentType.UNKNOWN
\ No newline at end of file
+        except Exception as e:
+            print(f"Error during classification: {str(e)}")
+            return None, ["error"]
@@ -0,0 +1,315 @@
+import base64
+import io
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from PIL import Image
+from models import DocumentType
+from utils.executors import thread_executor
+
+DECODER_TIER = "decoder"
+
+# AAMVA element IDs mapped to our field names
+AAMVA_FIELDS = {
+    "DAQ": "license_number",
+    "DCS": "last_name",
+    "DAC": "first_name",
+    "DBB": "date_of_birth",
+    "DBD": "issue_date",
+    "DBA": "expiration_date"
+}
+AAMVA_ELEMENT = re.compile(r"^(?:DL|ID)?(D[A-Z]{2})(.*)$")
+
+MRZ_LINE = re.compile(r"^[A-Z0-9<]{30,44}$")
+MRZ_WEIGHTS = (7, 3, 1)
+
+
+def mrz_check_digit(value: str) -> str:
+    """ICAO 9303 check digit (weights 7, 3, 1; '<' counts as 0)"""
+    total = 0
+    for index, char in enumerate(value):
+        if char.isdigit():
+            number = int(char)
+        elif char.isalpha():
+            number = ord(char) - ord("A") + 10
+        else:
+            number = 0
+        total += number * MRZ_WEIGHTS[index % 3]
+    return str(total % 10)
+
+
+def _mrz_date(value: str, future: bool) -> Optional[str]:
+    """YYMMDD to MM/DD/YYYY; birth dates resolve to the past, expiry dates to the future"""
+    try:
+        parsed = datetime.strptime(value, "%y%m%d")
+    except ValueError:
+        return None
+    current_year = datetime.utcnow().year
+    year = 2000 + parsed.year % 100
+    if not future and year > current_year:
+        year -= 100
+    if future and year < current_year - 50:
+        year += 100
+    return f"{parsed.month:02d}/{parsed.day:02d}/{year}"
+
+
+def _mrz_names(value: str) -> Dict[str, Optional[str]]:
+    """Split the MRZ name field ("SURNAME<<GIVEN<NAMES") into name fields"""
+    surname, _, given = value.strip("<").partition("<<")
+    last_name = surname.replace("<", " ").strip() or None
+    first_name = given.replace("<", " ").strip() or None
+    full_name = " ".join(part for part in [first_name, last_name] if part) or None
+    return {"full_name": full_name, "first_name": first_name, "last_name": last_name}
+
+
+def _country_name(code: str) -> Optional[str]:
+    """Country name for an ICAO/ISO 3166 alpha-3 code, when pycountry is installed"""
+    try:
+        import pycountry
+    except ImportError:
+        return None
+    country = pycountry.countries.get(alpha_3=code.replace("<", "")) if code.strip("<") else None
+    return country.name if country else None
+
+
+def parse_mrz(lines: List[str]) -> Optional[Tuple[DocumentType, Dict[str, Any]]]:
+    """
+    Parse a TD3 (passport) or TD1 (card) machine readable zone
+
+    Fields are only returned when their check digits validate, so OCR errors
+    leave a field missing rather than wrong.
+
+    Args:
+        lines: MRZ lines (2 x 44 characters or 3 x 30 characters)
+
+    Returns:
+        Tuple of (DocumentType, raw fields) or None if the MRZ is not valid
+    """
+    lines = [line.strip().replace(" ", "") for line in lines]
+
+    if len(lines) == 2 and all(len(line) == 44 for line in lines) and lines[0].startswith("P"):
+        first, second = lines
+        number, number_check = second[0:9], second[9]
+        birth, birth_check = second[13:19], second[19]
+        expiry, expiry_check = second[21:27], second[27]
+        composite = second[0:10] + second[13:20] + second[21:43]
+        if mrz_check_digit(composite) != second[43]:
+            return None
+
+        fields = _mrz_names(first[5:44])
+        fields["country"] = _country_name(first[2:5])
+        if mrz_check_digit(number) == number_check:
+            fields["passport_number"] = number.replace("<", "")
+        if mrz_check_digit(birth) == birth_check:
+            fields["date_of_birth"] = _mrz_date(birth, future=False)
+        if mrz_check_digit(expiry) == expiry_check:
+            fields["expiration_date"] = _mrz_date(expiry, future=True)
+        return DocumentType.PASSPORT, fields
+
+    if len(lines) == 3 and all(len(line) == 30 for line in lines):
+        first, second, third = lines
+        number, number_check = first[5:14], first[14]
+        if number_check == "<":
+            # Long document numbers overflow into the optional data; the last character is the check digit
+            overflow = first[15:30].split("<", 1)[0]
+            number, number_check = number + overflow[:-1], overflow[-1:]
+        birth, birth_check = second[0:6], second[6]
+        expiry, expiry_check = second[8:14], second[14]
+        composite = first[5:30] + second[0:7] + second[8:15] + second[18:29]
+        if mrz_check_digit(composite) != second[29]:
+            return None
+
+        fields = _mrz_names(third)
+        if mrz_check_digit(number) == number_check:
+            fields["card_number"] = number.replace("<", "")
+        if mrz_check_digit(birth) == birth_check:
+            fields["date_of_birth"] = _mrz_date(birth, future=False)
+        if mrz_check_digit(expiry) == expiry_check:
+            fields["card_expires_date"] = _mrz_date(expiry, future=True)
+        return DocumentType.EAD_CARD, fields
+
+    return None
+
+
+def _aamva_date(value: str, country: Optional[str]) -> Optional[str]:
+    """AAMVA dates are MMDDCCYY in the US and CCYYMMDD in Canada"""
+    digits = re.sub(r"\D", "", value)
+    if len(digits) != 8:
+        return None
+    formats = ["%Y%m%d", "%m%d%Y"] if country == "CAN" else ["%m%d%Y", "%Y%m%d"]
+    for date_format in formats:
+        try:
+            return datetime.strptime(digits, date_format).strftime("%m/%d/%Y")
+        except ValueError:
+            continue
+    return None
+
+
+def is_aamva(data: str) -> bool:
+    """Whether decoded barcode text carries an AAMVA driver license header"""
+    return "ANSI " in data or "AAMVA" in data
+
+
+def read_pdf417(image: Image.Image) -> Optional[str]:
+    """
+    Read the text of a PDF417 barcode with zxing-cpp
+
+    Args:
+        image: PIL image
+
+    Returns:
+        Barcode text, or None if none was found or zxing-cpp is not installed
+    """
+    try:
+        import zxingcpp
+    except ImportError:
+        return None
+
+    for barcode in zxingcpp.read_barcodes(image.convert("L"), formats=zxingcpp.BarcodeFormat.PDF417):
+        # Raw bytes keep the AAMVA separators that the text rendering escapes
+        return barcode.bytes.decode("latin-1")
+    return None
+
+
+def parse_aamva(data: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse the text of an AAMVA driver license PDF417 barcode
+
+    Args:
+        data: Decoded barcode text
+
+    Returns:
+        Raw driver license fields, or None if the data is not AAMVA
+    """
+    if not is_aamva(data):
+        return None
+
+    elements = {}
+    for line in re.split(r"[\n\r\x1e]+", data):
+        if "ANSI " in line:
+            # The first element follows the header and subfile designator on the same line
+            header_end = re.search(r"(?:DL|ID)(?=D[A-Z]{2})", line)
+            line = line[header_end.end():] if header_end else ""
+        match = AAMVA_ELEMENT.match(line.strip())
+        if match and match.group(1) not in elements:
+            elements[match.group(1)] = match.group(2).strip()
+
+    country = elements.get("DCG")
+    fields: Dict[str, Any] = {}
+    for element, field in AAMVA_FIELDS.items():
+        value = elements.get(element)
+        if not value or value.upper() in ("NONE", "UNAVL"):
+            continue
+        fields[field] = _aamva_date(value, country) if field.endswith("date") or field == "date_of_birth" else value
+
+    # Version 1-3 barcodes carry "first,middle" in DCT or "LAST,FIRST,MIDDLE" in DAA
+    if "first_name" not in fields and elements.get("DCT"):
+        fields["first_name"] = elements["DCT"].replace(",", " ").strip()
+    if "last_name" not in fields and elements.get("DAA"):
+        parts = [part.strip() for part in elements["DAA"].split(",")]
+        fields["last_name"] = parts[0]
+        fields.setdefault("first_name", " ".join(parts[1:]) or None)
+
+    middle = elements.get("DAD")
+    if middle and middle.upper() in ("NONE", "UNAVL"):
+        middle = None
+    names = [fields.get("first_name"), middle, fields.get("last_name")]
+    if any(names):
+        fields["full_name"] = " ".join(name for name in names if name)
+
+    postal_code = elements.get("DAK", "").strip()
+    if len(postal_code) == 9 and postal_code.isdigit():
+        postal_code = postal_code[:5] if postal_code.endswith("0000") else f"{postal_code[:5]}-{postal_code[5:]}"
+    street = ", ".join(value for value in [elements.get("DAG"), elements.get("DAH")] if value)
+    city_line = " ".join(value for value in [elements.get("DAJ"), postal_code] if value)
+    address = ", ".join(value for value in [street, elements.get("DAI"), city_line] if value)
+    if address:
+        fields["address"] = address
+
+    return fields or None
+
+
+class DocumentDecoder:
+    """
+    Deterministic field decoding from PDF417 barcodes and MRZ text
+
+    Uses optional local libraries: zxing-cpp for PDF417 and pytesseract (with
+    the tesseract binary) for MRZ OCR. When a library is missing the matching
+    reader is skipped and extraction falls back to the LLM.
+    """
+
+    MRZ_REGION = 0.4  # MRZ is searched in the bottom part of the image
+
+    def decode_image(self, image: Image.Image) -> Optional[Tuple[DocumentType, Dict[str, Any]]]:
+        """
+        Decode document fields from an image
+
+        Args:
+            image: PIL image
+
+        Returns:
+            Tuple of (DocumentType, raw fields) or None if nothing could be decoded
+        """
+        barcode = self._read_pdf417(image)
+        if barcode:
+            fields = parse_aamva(barcode)
+            if fields:
+                return DocumentType.DRIVER_LICENSE, fields
+
+        mrz_lines = self._read_mrz(image)
+        if mrz_lines:
+            return parse_mrz(mrz_lines)
+
+        return None
+
+    async def decode(self, image_base64: str) -> Optional[Tuple[DocumentType, Dict[str, Any]]]:
+        """
+        Decode document fields from a base64 encoded image on the thread executor
+
+        Args:
+            image_base64: Base64 encoded image
+
+        Returns:
+            Tuple of (DocumentType, raw fields) or None if nothing could be decoded
+        """
+        def _decode():
+            image = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+            return self.decode_image(image)
+
+        try:
+            return await thread_executor.run(_decode)
+        except Exception as e:
+            print(f"Barcode/MRZ decoding failed: {str(e)}")
+            return None
+
+    def _read_pdf417(self, image: Image.Image) -> Optional[str]:
+        """Read PDF417 barcode text with zxing-cpp"""
+        return read_pdf417(image)
+
+    def _read_mrz(self, image: Image.Image) -> Optional[List[str]]:
+        """OCR the bottom of the image and return candidate MRZ lines"""
+        try:
+            import pytesseract
+        except ImportError:
+            return None
+
+        gray = image.convert("L")
+        band = gray.crop((0, int(gray.height * (1 - self.MRZ_REGION)), gray.width, gray.height))
+        if band.width < 1000:
+            band = band.resize((1000, round(band.height * 1000 / band.width)), Image.BICUBIC)
+
+        try:
+            text = pytesseract.image_to_string(
+                band,
+                config="--psm 6 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<"
+            )
+        except pytesseract.TesseractNotFoundError:
+            return None
+
+        lines = [line.replace(" ", "") for line in text.splitlines()]
+        lines = [line for line in lines if MRZ_LINE.match(line)]
+        if len(lines) >= 3 and all(len(line) == 30 for line in lines[-3:]):
+            return lines[-3:]
+        if len(lines) >= 2:
+            return lines[-2:]
+        return None
@@ -1,22 +1,24 @@
-import httpx
 import json
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from models import DocumentType, DOCUMENT_FIELDS
 from config import config
 from utils.date_utils import standardize_date
 from utils.name_parser import NameParser, guess_name_order, normalize_name
+from utils.json_stream import IncrementalJSONParser
+from processors.llm_client import LLMClient, llm_client as shared_llm_client
+from processors.cascade import ModelCascade, cascade_stats, check_fields, check_schema, model_tiers
+from processors.prompts import CompiledPrompt, prompt_registry
 
 class FieldExtractor:
     """Extract fields from documents using vision LLM"""
     
-    def __init__(self):
-        self.api_key = config.OPENAI_API_KEY
-        self.base_url = config.OPENAI_BASE_URL
+    def __init__(self, llm_client: Optional[LLMClient] = None):
+        self.llm = llm_client or shared_llm_client
         self.model = config.OPENAI_MODEL
-        self.timeout = config.OPENAI_TIMEOUT
         self.temperature = config.TEMPERATURE
         self.max_tokens = config.MAX_TOKENS
+        self.extract_cascade = ModelCascade("extract")
     
     async def extract(self, image_base64: str, document_type: DocumentType) -> Dict[str, Any]:
         """
@@ -29,154 +31,295 @@ class FieldExtractor:
         Returns:
             Dictionary of extracted fields
         """
-        if document_type == DocumentType.UNKNOWN:
-            return {}
+        fields, _ = await self.extract_with_tier(image_base64, document_type)
+        return fields
+    
+    async def extract_with_tier(
+        self,
+        image_base64: str,
+        document_type: DocumentType,
+        known_fields: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Extract fields, escalating from the cheap model when the result fails validation
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        Args:
+            image_base64: Base64 encoded image
+            document_type: Type of document
+            known_fields: Raw field values already decoded from a barcode or MRZ;
+                these take precedence and only the remaining fields are requested
+            
+        Returns:
+            Tuple of (dictionary of extracted fields, model that answered or None)
+        """
+        if document_type == DocumentType.UNKNOWN:
+            return {}, None
         
         # Get fields to extract
-        fields_to_extract = DOCUMENT_FIELDS.get(document_type, {})
-        
-        # Create extraction prompt
-        prompt = self._create_extraction_prompt(document_type, fields_to_extract)
-        
-        payload = {
-            "model": self.model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
+        allowed_fields = DOCUMENT_FIELDS.get(document_type, {})
+        fields_to_extract = allowed_fields
+        known = {}
+        if known_fields:
+            known = {
+                field: value for field, value in known_fields.items()
+                if field in allowed_fields and value not in (None, "")
+            }
+            decoded = self._post_process_fields(known, document_type)
+            fields_to_extract = {
+                field: field_type for field, field_type in allowed_fields.items()
+                if decoded.get(field) is None
+            }
+            if not fields_to_extract:
+                return decoded, None
+        
+        # Compiled once per document type and field subset
+        prompt = prompt_registry.extraction(document_type, fields_to_extract)
+        
+        async def attempt(model: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+            content = await self._complete(prompt, image_base64, model, "Extraction")
+            if content is None:
+                return None, ["error"]
+            
+            # Parse JSON from response
+            extracted_fields = self._parse_json_response(content)
+            problems = check_schema(extracted_fields)
+            if problems:
+                return None, problems
+            
+            # Decoded values win over what the model read
+            if known:
+                extracted_fields = {
+                    **{field: value for field, value in extracted_fields.items() if field in fields_to_extract},
+                    **known
                 }
-            ],
-            "max_tokens": self.max_tokens,
-            "temperature": self.temperature
-        }
+            
+            # Post-process fields
+            processed_fields = self._post_process_fields(
+                extracted_fields, 
+                document_type
+            )
+            
+            return processed_fields, check_fields(processed_fields, document_type)
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    self.base_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=self.timeout
-                )
-                
-                if response.status_code != 200:
-                    print(f"Extraction error: {response.status_code} - {response.text}")
-                    return {}
-                
-                result = response.json()
-                
-                if "choices" in result and len(result["choices"]) > 0:
-                    content = result["choices"][0]["message"]["content"]
-                    
-                    # Parse JSON from response
-                    extracted_fields = self._parse_json_response(content)
-                    
-                    # Post-process fields
-                    processed_fields = self._post_process_fields(
-                        extracted_fields, 
-                        document_type
-                    )
-                    
-                    return processed_fields
-                
-                return {}
-                    
-            except Exception as e:
-                print(f"Error during field extraction: {str(e)}")
-                return {}
+        fields, model = await self.extract_cascade.run(attempt)
+        if fields is None and known:
+            return decoded, None
+        return fields or {}, model
     
-    def _create_extraction_prompt(self, document_type: DocumentType, fields: Dict) -> str:
-        """Create a detailed extraction prompt"""
-        field_descriptions = self._get_field_descriptions(document_type)
-        
-        field_list = "\n".join([
-            f"- {field}: {desc}" 
-            for field, desc in field_descriptions.items()
-        ])
-        
-        example_json = json.dumps(
-            {field: "value" for field in fields.keys()}, 
-            indent=2
-        )
+    async def classify_and_extract(self, image_base64: str) -> Tuple[DocumentType, Dict[str, Any]]:
+        """
+        Classify document and extract its fields in a single LLM call
         
-        return f"""
-        Please extract the following information from this {document_type.value.replace('_', ' ')}:
+        Args:
+            image_base64: Base64 encoded image
+            
+        Returns:
+            Tuple of (DocumentType, dictionary of extracted fields)
+        """
+        document_type, fields, _ = await self.classify_and_extract_with_tier(image_base64)
+        return document_type, fields
+    
+    async def classify_and_extract_with_tier(
+        self,
+        image_base64: str
+    ) -> Tuple[DocumentType, Dict[str, Any], Optional[str]]:
+        """
+        Classify and extract in one call per tier, escalating from the cheap model
+        when the result fails validation
         
-        {field_list}
+        Args:
+            image_base64: Base64 encoded image
+            
+        Returns:
+            Tuple of (DocumentType, dictionary of extracted fields, model that answered or None)
+        """
+        prompt = prompt_registry.fused
         
-        Important Instructions for Name Extraction:
-        1. If the document shows a complete name in one field, extract it as "full_name"
-        2. If the document shows first and last names in separate fields, extract them as "first_name" and "last_name"
-        3. If you can see any name information, extract what you can see
-        4. Common patterns to recognize:
-           - "SMITH, JOHN" format: extract as full_name (we'll parse it later)
-           - Separate fields labeled "First Name" and "Last Name": extract both
-           - Single name field: extract as full_name
+        async def attempt(model: str) -> Tuple[Optional[Tuple[DocumentType, Dict[str, Any]]], List[str]]:
+            content = await self._complete(prompt, image_base64, model, "Fused extraction")
+            if content is None:
+                return None, ["error"]
+            
+            # Parse JSON from response
+            extracted_fields = self._parse_json_response(content)
+            problems = check_schema(extracted_fields)
+            if problems:
+                return None, problems
+            
+            # Split the document type off the field values
+            type_value = str(extracted_fields.pop("document_type", "") or "").strip().lower()
+            if type_value not in [doc_type.value for doc_type in DOCUMENT_FIELDS]:
+                return (DocumentType.UNKNOWN, {}), ["document_type:unknown"]
+            document_type = DocumentType(type_value)
+            
+            # Keep only the fields defined for this document type
+            allowed_fields = DOCUMENT_FIELDS[document_type]
+            extracted_fields = {
+                field: value for field, value in extracted_fields.items()
+                if field in allowed_fields
+            }
+            
+            # Post-process fields
+            processed_fields = self._post_process_fields(
+                extracted_fields,
+                document_type
+            )
+            
+            return (document_type, processed_fields), check_fields(processed_fields, document_type)
         
-        General Instructions:
-        - Extract ONLY what is visible on the document
-        - For dates: extract in the format shown (we'll standardize later)
-        - For missing fields: use null
-        - Do NOT make assumptions or split/combine fields yourself
+        result, model = await self.extract_cascade.run(attempt)
+        if result is None:
+            return DocumentType.UNKNOWN, {}, model
+        return result[0], result[1], model
+    
+    async def _complete(self, prompt: CompiledPrompt, image_base64: str, model: str, label: str) -> Optional[str]:
+        """
+        Send one extraction request and return the message content
         
-        Example format:
-        {example_json}
+        Args:
+            prompt: Compiled prompt
+            image_base64: Base64 encoded image
+            model: Model to call
+            label: Operation name used in error messages
+            
+        Returns:
+            Response content, or None if the call failed
+        """
+        payload = self._build_payload(prompt, image_base64, model)
         
-        Return only the JSON object, no additional text.
+        try:
+            response = await self.llm.post(payload, operation="extract")
+            
+            if response.status_code != 200:
+                print(f"{label} error: {response.status_code} - {response.text}")
+                return None
+            
+            result = response.json()
+            
+            if "choices" in result and len(result["choices"]) > 0:
+                return result["choices"][0]["message"]["content"]
+            
+            return None
+                
+        except Exception as e:
+            print(f"Error during {label.lower()}: {str(e)}")
+            return None
+    
+    async def extract_stream(
+        self,
+        image_base64: str,
+        document_type: Optional[DocumentType] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
+        Stream extraction progress from a streamed LLM response
+        
+        The cheap model is streamed first; if its final result fails validation
+        an "escalated" event is sent and the stronger model is streamed.
+        
+        Args:
+            image_base64: Base64 encoded image
+            document_type: Known document type, or None to classify in the same call
+            
+        Yields:
+            Event dicts: "classified" (fused mode only), one "field" per parsed
+            field with its raw value, "escalated" when the cheap answer is rejected,
+            then "extracted" with post-processed fields and the answering model
+        """
+        models = model_tiers()
+        fallback = None
+        
+        for index, model in enumerate(models):
+            final = None
+            try:
+                async for event in self._stream_with_model(image_base64, document_type, model):
+                    if event["event"] == "extracted":
+                        final = event
+                        continue
+                    yield event
+            except Exception as e:
+                if index == len(models) - 1:
+                    raise
+                print(f"Error during streamed extraction ({model}): {str(e)}")
+            
+            if final is None:
+                problems = ["error"]
+            else:
+                fields = final["fields"]
+                problems = check_fields(fields, DocumentType(final["document_type"]))
+                if not problems:
+                    cascade_stats.record_answer("extract", model)
+                    yield {**final, "model_tier": model}
+                    return
+                if fields or fallback is None:
+                    fallback = {**final, "model_tier": model}
+            
+            if index < len(models) - 1:
+                cascade_stats.record_escalation("extract", model, problems)
+                yield {"event": "escalated", "from_model": model, "to_model": models[index + 1], "reasons": problems}
+        
+        if fallback is None:
+            yield {"event": "extracted", "document_type": DocumentType.UNKNOWN.value, "fields": {}, "model_tier": None}
+            return
+        
+        cascade_stats.record_answer("extract", fallback["model_tier"], validated=False)
+        yield fallback
     
-    def _get_field_descriptions(self, document_type: DocumentType) -> Dict[str, str]:
-        """Get human-readable descriptions for each field"""
-        # Common name field descriptions for all document types
-        common_name_fields = {
-            "full_name": "Complete name as shown on document",
-            "first_name": "First name (given name)",
-            "last_name": "Last name (surname/family name)"
-        }
+    async def _stream_with_model(
+        self,
+        image_base64: str,
+        document_type: Optional[DocumentType],
+        model: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream one model's response as classified/field/extracted events"""
+        fused = document_type is None
+        prompt = prompt_registry.fused if fused else prompt_registry.extraction(document_type)
         
-        descriptions = {
-            DocumentType.PASSPORT: {
-                **common_name_fields,
-                "date_of_birth": "Date of birth (MM/DD/YYYY format)",
-                "country": "Issuing country (lowercase with underscores)",
-                "issue_date": "Date of issue (MM/DD/YYYY format)",
-                "expiration_date": "Expiration date (MM/DD/YYYY format)",
-                "passport_number": "Passport number/document number"
-            },
-            DocumentType.DRIVER_LICENSE: {
-                **common_name_fields,
-                "license_number": "Driver's license number",
-                "date_of_birth": "Date of birth (MM/DD/YYYY format)",
-                "issue_date": "Issue date (MM/DD/YYYY format)",
-                "expiration_date": "Expiration date (MM/DD/YYYY format)",
-                "address": "Full address"
-            },
-            DocumentType.EAD_CARD: {
-                **common_name_fields,
-                "card_number": "USCIS card number (with hyphens)",
-                "category": "Category code (e.g., C09)",
-                "card_expires_date": "Card expiration date (MM/DD/YYYY format)",
-                "date_of_birth": "Date of birth (MM/DD/YYYY format)"
-            }
-        }
+        payload = self._build_payload(prompt, image_base64, model)
+        parser = IncrementalJSONParser()
+        pending = []  # Fields parsed before the document type is known
+        
+        async for delta in self.llm.stream(payload, operation="extract"):
+            for field, value in parser.feed(delta):
+                if fused and document_type is None:
+                    if field != "document_type":
+                        pending.append((field, value))
+                        continue
+                    type_value = str(value or "").strip().lower()
+                    if type_value not in [doc_type.value for doc_type in DOCUMENT_FIELDS]:
+                        yield {"event": "classified", "document_type": DocumentType.UNKNOWN.value}
+                        yield {"event": "extracted", "document_type": DocumentType.UNKNOWN.value, "fields": {}}
+                        return
+                    document_type = DocumentType(type_value)
+                    yield {"event": "classified", "document_type": document_type.value}
+                    ready, pending = pending, []
+                else:
+                    ready = [(field, value)]
+                
+                for name, raw_value in ready:
+                    if name in DOCUMENT_FIELDS[document_type]:
+                        yield {"event": "field", "name": name, "value": raw_value}
         
-        return descriptions.get(document_type, {})
+        if document_type is None:
+            yield {"event": "classified", "document_type": DocumentType.UNKNOWN.value}
+            yield {"event": "extracted", "document_type": DocumentType.UNKNOWN.value, "fields": {}}
+            return
+        
+        allowed_fields = DOCUMENT_FIELDS[document_type]
+        extracted_fields = {
+            field: value for field, value in parser.fields.items()
+            if field in allowed_fields
+        }
+        yield {
+            "event": "extracted",
+            "document_type": document_type.value,
+            "fields": self._post_process_fields(extracted_fields, document_type)
+        }
+    
+    def _build_payload(self, prompt: CompiledPrompt, image_base64: str, model: Optional[str] = None) -> Dict[str, Any]:
+        """Build a chat completion request with the prompt and document image"""
+        return prompt.payload(
+            image_base64, model or self.model, self.max_tokens, self.temperature, detail=config.LLM_IMAGE_DETAIL["extract"]
+        )
     
     def _parse_json_response(self, content: str) -> Dict[str, Any]:
         """Parse JSON from LLM response"""
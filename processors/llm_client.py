@@ -0,0 +1,214 @@
+import asyncio
+import httpx
+import json
+import time
+from typing import Dict, Any, AsyncIterator, Optional
+from config import config
+from processors.prompts import count_tokens
+from processors.rate_limiter import AdaptiveRateLimiter
+from processors.resilience import ResilientCaller, is_retryable_status
+
+class LLMStreamError(Exception):
+    """Raised when a streaming completion request is rejected"""
+
+class LLMClient:
+    """Shared, pooled HTTP transport for vision LLM calls"""
+
+    def __init__(self, limiter: Optional[AdaptiveRateLimiter] = None):
+        self.api_key = config.OPENAI_API_KEY
+        self.base_url = config.OPENAI_BASE_URL
+        self.timeout = config.OPENAI_TIMEOUT
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.resilience = ResilientCaller()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Get the pooled HTTP client, creating it on first use"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create an HTTP client with keep-alive pooling"""
+        limits = httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY
+        )
+
+        http2 = config.HTTP2_ENABLED
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("Warning: HTTP/2 requested but the h2 package is not installed. Falling back to HTTP/1.1.")
+                http2 = False
+
+        return httpx.AsyncClient(
+            limits=limits,
+            http2=http2,
+            timeout=self.timeout,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+        )
+
+    async def start(self):
+        """Open the connection pool (called from the application lifespan)"""
+        _ = self.client
+
+    async def post(self, payload: Dict[str, Any], operation: str = "default") -> httpx.Response:
+        """
+        Send a chat completion request through the shared pool
+        
+        Calls queue behind the rate limiter and run under the operation's
+        resilience policy (retries, hedging and circuit breaker).
+
+        Args:
+            payload: Chat completion request body
+            operation: Policy name from config.LLM_POLICIES (classify, extract)
+
+        Returns:
+            Raw HTTP response
+        """
+        estimated_tokens = self.estimate_tokens(payload)
+
+        async def send(timeout: float) -> httpx.Response:
+            return await self._send(payload, estimated_tokens, timeout)
+
+        return await self.resilience.call(operation, send)
+
+    async def _send(self, payload: Dict[str, Any], estimated_tokens: int, timeout: float) -> httpx.Response:
+        """Perform a single rate-limited HTTP attempt"""
+        async with self.limiter.acquire(estimated_tokens):
+            start = time.monotonic()
+            try:
+                response = await self.client.post(
+                    self.base_url,
+                    json=payload,
+                    timeout=timeout
+                )
+            except httpx.TimeoutException:
+                self.limiter.record_timeout(time.monotonic() - start)
+                raise
+
+        self.limiter.record(
+            response.status_code,
+            getattr(response, "headers", None),
+            time.monotonic() - start
+        )
+        return response
+
+    async def stream(self, payload: Dict[str, Any], operation: str = "default") -> AsyncIterator[str]:
+        """
+        Send a streaming chat completion request and yield content deltas
+        
+        The call is rate limited and guarded by the operation's circuit
+        breaker; it is not retried or hedged once tokens have been yielded.
+
+        Args:
+            payload: Chat completion request body
+            operation: Policy name from config.LLM_POLICIES (classify, extract)
+
+        Yields:
+            Pieces of the assistant message content as they arrive
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            LLMStreamError: If the provider rejects the request
+        """
+        policy = self.resilience.policy(operation)
+        policy.breaker.allow()
+        estimated_tokens = self.estimate_tokens(payload)
+
+        # Set once the breaker has been told how this call went, so a half-open probe is always released
+        resolved = False
+        async with self.limiter.acquire(estimated_tokens):
+            start = time.monotonic()
+            try:
+                async with self.client.stream(
+                    "POST",
+                    self.base_url,
+                    json={**payload, "stream": True},
+                    timeout=policy.timeout
+                ) as response:
+                    self.limiter.record(response.status_code, response.headers, time.monotonic() - start)
+
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode(errors="replace")
+                        if is_retryable_status(response.status_code):
+                            policy.breaker.record_failure()
+                        else:
+                            policy.breaker.record_success()
+                        resolved = True
+                        raise LLMStreamError(f"{response.status_code} - {body[:200]}")
+
+                    # The provider accepted the call; don't hold the probe for the whole stream
+                    policy.breaker.record_success()
+                    resolved = True
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if not chunk.get("choices"):
+                            continue
+                        delta = chunk["choices"][0].get("delta", {}).get("content")
+                        if delta:
+                            yield delta
+            except (asyncio.CancelledError, GeneratorExit):
+                # The caller went away; that says nothing about the provider
+                if not resolved:
+                    policy.breaker.abandon()
+                    resolved = True
+                raise
+            except LLMStreamError:
+                raise
+            except Exception as e:
+                # Transport failures and malformed chunks, before or during the stream
+                if isinstance(e, httpx.TimeoutException):
+                    self.limiter.record_timeout(time.monotonic() - start)
+                policy.breaker.record_failure()
+                resolved = True
+                raise
+            finally:
+                if not resolved:
+                    policy.breaker.record_failure()
+
+    @staticmethod
+    def estimate_tokens(payload: Dict[str, Any]) -> int:
+        """
+        Roughly estimate the tokens a request will consume against the TPM quota
+
+        Args:
+            payload: Chat completion request body
+
+        Returns:
+            Estimated prompt + completion tokens
+        """
+        tokens = payload.get("max_tokens", config.MAX_TOKENS)
+        for message in payload.get("messages", []):
+            content = message.get("content", "")
+            if isinstance(content, str):
+                tokens += count_tokens(content)
+                continue
+            for part in content:
+                if part.get("type") == "text":
+                    tokens += count_tokens(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    tokens += config.LLM_IMAGE_TOKEN_ESTIMATE
+        return tokens
+
+    async def aclose(self):
+        """Close all pooled connections"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+# Application-scoped LLM client shared by all processors
+llm_client = LLMClient()
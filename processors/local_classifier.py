@@ -0,0 +1,222 @@
+import base64
+import io
+from collections import deque
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from PIL import Image
+from models import DocumentType
+from processors.decoder import is_aamva, read_pdf417
+from utils.image_utils import box_mean
+
+ID1_ASPECT = 85.60 / 53.98  # Credit-card size: driver licenses, EAD cards
+ID3_ASPECT = 125.0 / 88.0  # Passport data page
+
+
+def _runs(mask: np.ndarray, max_gap: int = 0) -> List[Tuple[int, int]]:
+    """(start, end) index pairs of True runs, bridging gaps of up to max_gap False values"""
+    runs = []
+    start = None
+    gap = 0
+    for index, value in enumerate(mask):
+        if value:
+            if start is None:
+                start = index
+            gap = 0
+        elif start is not None:
+            gap += 1
+            if gap > max_gap:
+                runs.append((start, index - gap + 1))
+                start = None
+                gap = 0
+    if start is not None:
+        runs.append((start, len(mask) - gap))
+    return runs
+
+
+class LocalClassifier:
+    """
+    CPU-only document classifier from simple image features
+
+    Passports carry a two-line machine readable zone (MRZ), EAD cards a
+    three-line one on the back, and US driver licenses a PDF417 barcode on the
+    back. Those, plus the image aspect ratio, decide the type without an LLM
+    call when the evidence is strong; otherwise the result is UNKNOWN with a
+    low confidence and the caller falls back to the vision model.
+
+    A barcode alone is weak evidence (shipping labels, boarding passes and
+    forms carry them too): it only decides the type on a card-shaped image or
+    when its payload reads as AAMVA (zxing-cpp, when installed).
+    """
+
+    WORK_WIDTH = 800  # Images are analyzed at this width
+
+    # MRZ line detection
+    INK_DARKNESS = 140  # Ink pixels are darker than this...
+    INK_CONTRAST = 15  # ...and this much darker than their neighbourhood
+    MRZ_SEARCH_FROM = 0.4  # Only look in the lower part of the image
+    MRZ_BINS = 64
+    MRZ_MIN_SPAN = 0.6  # Fraction of the width an MRZ line covers
+    MRZ_MAX_INK = 0.35  # OCR-B on a light background is sparse compared to bold print
+
+    # Barcode detection
+    BARCODE_TILE = 16
+    BARCODE_MIN_EDGE = 18.0  # Mean horizontal gradient inside a bar tile
+    BARCODE_ANISOTROPY = 3.0  # Horizontal vs vertical gradient ratio
+    BARCODE_MIN_TILES = 20
+    BARCODE_MIN_WIDTH = 0.15
+
+    def classify(self, image: Image.Image) -> Tuple[DocumentType, float]:
+        """
+        Classify a document image from local features
+
+        Args:
+            image: PIL image
+
+        Returns:
+            Tuple of (DocumentType, confidence between 0 and 1)
+        """
+        features = self.features(image)
+        mrz_lines = features["mrz_lines"]
+        aspect = features["aspect_ratio"]
+        card_shaped = abs(aspect - ID1_ASPECT) < 0.12
+
+        if mrz_lines == 2:
+            # TD3 passport MRZ; an ID-3 page or portrait booklet photo confirms it
+            booklet = abs(aspect - ID3_ASPECT) < 0.12 or aspect < 1.0
+            return DocumentType.PASSPORT, 0.95 if booklet else 0.9
+        if mrz_lines >= 3:
+            # TD1 card MRZ (back of an EAD card)
+            return DocumentType.EAD_CARD, 0.9 if card_shaped else 0.85
+        if features["barcode"]:
+            if card_shaped:
+                return DocumentType.DRIVER_LICENSE, 0.95
+            if is_aamva(read_pdf417(image) or ""):
+                return DocumentType.DRIVER_LICENSE, 0.9
+            return DocumentType.DRIVER_LICENSE, 0.6
+        if mrz_lines == 1:
+            # A single MRZ-like line is suggestive but often just cropped or noisy
+            return DocumentType.PASSPORT, 0.5
+        return DocumentType.UNKNOWN, 0.0
+
+    def classify_base64(self, image_base64: str) -> Tuple[DocumentType, float]:
+        """
+        Classify a base64 encoded image
+
+        Args:
+            image_base64: Base64 encoded image
+
+        Returns:
+            Tuple of (DocumentType, confidence between 0 and 1)
+        """
+        image = Image.open(io.BytesIO(base64.b64decode(image_base64)))
+        # Let the JPEG decoder downscale while decoding; we only need ~WORK_WIDTH pixels
+        image.draft("L", (self.WORK_WIDTH, self.WORK_WIDTH))
+        return self.classify(image)
+
+    def features(self, image: Image.Image) -> Dict[str, Any]:
+        """
+        Compute the classification features
+
+        Args:
+            image: PIL image
+
+        Returns:
+            Dict with aspect_ratio, mrz_lines and barcode
+        """
+        gray = self._grayscale(image)
+        return {
+            "aspect_ratio": image.width / image.height,
+            "mrz_lines": self._count_mrz_lines(gray),
+            "barcode": self._has_barcode(gray)
+        }
+
+    def _grayscale(self, image: Image.Image) -> np.ndarray:
+        """Grayscale float array resized to WORK_WIDTH"""
+        height = max(1, round(image.height * self.WORK_WIDTH / image.width))
+        resized = image.convert("L").resize((self.WORK_WIDTH, height), Image.BILINEAR)
+        return np.asarray(resized, dtype=np.float32)
+
+    def _count_mrz_lines(self, gray: np.ndarray) -> int:
+        """
+        Count stacked MRZ-like text lines in the lower part of the image
+
+        An MRZ line is a long, unbroken run of evenly spaced monospace glyphs
+        (the "<" fillers leave no word gaps) with sparse ink. Lines must share
+        left/right edges and height to count as one zone.
+        """
+        height, width = gray.shape
+        ink = (gray < box_mean(gray, 15) - self.INK_CONTRAST) & (gray < self.INK_DARKNESS)
+
+        top = int(height * self.MRZ_SEARCH_FROM)
+        region = ink[top:]
+        transitions = region[:, 1:] != region[:, :-1]
+        text_rows = transitions.sum(axis=1) / width > 0.04
+
+        bin_width = (width - 1) // self.MRZ_BINS
+        lines = []
+        for start, end in _runs(text_rows):
+            line_height = end - start
+            if line_height < height * 0.015 or line_height > height * 0.08:
+                continue
+
+            per_bin = transitions[start:end, :bin_width * self.MRZ_BINS].sum(axis=0)
+            per_bin = per_bin.reshape(self.MRZ_BINS, bin_width).sum(axis=1)
+            spans = _runs(per_bin >= line_height * 0.5, max_gap=1)
+            if not spans:
+                continue
+            left, right = max(spans, key=lambda span: span[1] - span[0])
+            if (right - left) / self.MRZ_BINS < self.MRZ_MIN_SPAN:
+                continue
+            if region[start:end, left * bin_width:right * bin_width].mean() > self.MRZ_MAX_INK:
+                continue
+            lines.append((start, line_height, left, right))
+
+        # Longest group of consecutive, aligned lines with regular spacing
+        best = min(len(lines), 1)
+        group = lines[:1]
+        for line in lines[1:]:
+            previous = group[-1]
+            overlap = min(line[3], previous[3]) - max(line[2], previous[2])
+            aligned = overlap >= 0.85 * (max(line[3], previous[3]) - min(line[2], previous[2]))
+            similar = max(line[1], previous[1]) <= 1.5 * min(line[1], previous[1])
+            close = line[0] - previous[0] <= 3.5 * previous[1]
+            group = group + [line] if aligned and similar and close else [line]
+            best = max(best, len(group))
+        return best
+
+    def _has_barcode(self, gray: np.ndarray) -> bool:
+        """
+        Detect a PDF417/linear barcode: a wide block of tiles whose edges are
+        almost all vertical (strong horizontal gradient, weak vertical gradient)
+        """
+        tile = self.BARCODE_TILE
+        gx = np.abs(np.diff(gray, axis=1))[:-1, :]
+        gy = np.abs(np.diff(gray, axis=0))[:, :-1]
+        rows, cols = gx.shape[0] // tile, gx.shape[1] // tile
+        if rows == 0 or cols == 0:
+            return False
+
+        gx = gx[:rows * tile, :cols * tile].reshape(rows, tile, cols, tile).mean(axis=(1, 3))
+        gy = gy[:rows * tile, :cols * tile].reshape(rows, tile, cols, tile).mean(axis=(1, 3))
+        candidates = (gx > self.BARCODE_MIN_EDGE) & (gx > self.BARCODE_ANISOTROPY * gy)
+
+        # Largest 4-connected block of candidate tiles
+        seen = np.zeros_like(candidates)
+        for row, col in zip(*np.nonzero(candidates)):
+            if seen[row, col]:
+                continue
+            seen[row, col] = True
+            queue = deque([(row, col)])
+            cells = []
+            while queue:
+                r, c = queue.popleft()
+                cells.append((r, c))
+                for nr, nc in ((r + 1, c), (r - 1, c), (r, c + 1), (r, c - 1)):
+                    if 0 <= nr < rows and 0 <= nc < cols and candidates[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        queue.append((nr, nc))
+
+            block_width = (max(c for _, c in cells) - min(c for _, c in cells) + 1) / cols
+            if len(cells) >= self.BARCODE_MIN_TILES and block_width >= self.BARCODE_MIN_WIDTH:
+                return True
+        return False
@@ -0,0 +1,557 @@
+import asyncio
+import re
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from models import DocumentType
+from config import config
+from processors.classifier import DocumentClassifier
+from processors.extractor import FieldExtractor
+from processors.decoder import DECODER_TIER, DocumentDecoder
+from processors.cascade import cascade_stats
+from processors.cache import ResultCache
+from processors.singleflight import SingleFlight
+from database.models import Document
+from database.operations import DatabaseService
+from utils.executors import render_executor
+from utils.image_utils import UploadBuffer, render_llm_pages, render_page_previews
+from utils.previews import store_previews, release_previews
+from utils.pdf_render import pdf_page_count
+
+# Multi-page PDF handling: page 1 only, the first document page, or every distinct document
+PDF_PAGE_MODES = ("first", "best", "all")
+
+# Fields that identify a document across pages, e.g. both sides of a card
+IDENTITY_FIELDS = ("passport_number", "license_number", "card_number")
+
+def document_identity(document_type: DocumentType, fields: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Key under which pages showing the same document are merged
+    
+    Args:
+        document_type: DocumentType enum value
+        fields: Extracted fields
+        
+    Returns:
+        Tuple of the type and its document number (or name and date of birth),
+        or None if the fields don't identify the document
+    """
+    for name in IDENTITY_FIELDS:
+        if fields.get(name):
+            return document_type, re.sub(r"[^A-Z0-9]", "", str(fields[name]).upper())
+    if fields.get("full_name") and fields.get("date_of_birth"):
+        return document_type, " ".join(str(fields["full_name"]).upper().split()), fields["date_of_birth"]
+    return None
+
+def uses_source_image() -> bool:
+    """Whether barcode/MRZ decoding or the local classifier will read the full-resolution source image"""
+    return config.DETERMINISTIC_DECODING_ENABLED or config.LOCAL_CLASSIFIER_ENABLED
+
+class DocumentPipeline:
+    """Classification and extraction with result caching and request coalescing in front of the LLM"""
+
+    def __init__(
+        self,
+        classifier: Optional[DocumentClassifier] = None,
+        extractor: Optional[FieldExtractor] = None,
+        cache: Optional[ResultCache] = None,
+        decoder: Optional[DocumentDecoder] = None
+    ):
+        self.classifier = classifier or DocumentClassifier()
+        self.extractor = extractor or FieldExtractor()
+        self.decoder = decoder or DocumentDecoder()
+        self.cache = cache if config.RESULT_CACHE_ENABLED else None
+        self.flights = SingleFlight()
+
+    async def classify(self, content_hash: str, image_base64: str, source_base64: Optional[str] = None) -> DocumentType:
+        """
+        Classify a document, reusing a cached or in-flight result when available
+
+        Args:
+            content_hash: SHA-256 hex digest of the uploaded bytes
+            image_base64: Base64 encoded LLM image
+            source_base64: Full-resolution image for the local classifier (default image_base64)
+
+        Returns:
+            DocumentType enum value
+        """
+        key = ResultCache.make_key(content_hash, "classify")
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return DocumentType(cached)
+
+        async def _classify() -> DocumentType:
+            document_type = await self.classifier.classify(image_base64, source_base64)
+            # Unknown usually means the call failed, so don't pin it in the cache
+            if self.cache is not None and document_type != DocumentType.UNKNOWN:
+                await self.cache.set(key, document_type.value)
+            return document_type
+
+        return await self.flights.do(key, _classify)
+    
+    async def decode(
+        self,
+        image_base64: str,
+        source_base64: Optional[str] = None
+    ) -> Optional[Tuple[DocumentType, Dict[str, Any], Optional[str]]]:
+        """
+        Decode fields from a PDF417 barcode or MRZ and ask the LLM only for the rest
+        
+        The barcode and MRZ are read from the full-resolution source image; the
+        token-budgeted LLM image is too coarse and lossy for them.
+        
+        Args:
+            image_base64: Base64 encoded LLM image
+            source_base64: Full-resolution image to decode (default image_base64)
+            
+        Returns:
+            Tuple of (DocumentType, dictionary of extracted fields, answering tier),
+            or None if nothing could be decoded
+        """
+        if not config.DETERMINISTIC_DECODING_ENABLED:
+            return None
+        
+        decoded = await self.decoder.decode(source_base64 or image_base64)
+        if decoded is None:
+            return None
+        
+        document_type, known_fields = decoded
+        fields, model = await self.extractor.extract_with_tier(image_base64, document_type, known_fields)
+        if model is None:
+            cascade_stats.record_answer("extract", DECODER_TIER)
+            return document_type, fields, DECODER_TIER
+        return document_type, fields, f"{DECODER_TIER}+{model}"
+
+    async def extract(
+        self,
+        content_hash: str,
+        image_base64: str,
+        source_base64: Optional[str] = None
+    ) -> Tuple[DocumentType, Dict[str, Any], Optional[str]]:
+        """
+        Classify a document and extract its fields, reusing a cached or in-flight result when available
+
+        Args:
+            content_hash: SHA-256 hex digest of the uploaded bytes
+            image_base64: Base64 encoded LLM image
+            source_base64: Full-resolution image for decoding and local classification (default image_base64)
+
+        Returns:
+            Tuple of (DocumentType, dictionary of extracted fields, model that answered)
+        """
+        key = ResultCache.make_key(content_hash, "extract")
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return DocumentType(cached["document_type"]), cached["fields"], cached.get("model_tier")
+
+        async def _extract() -> Tuple[DocumentType, Dict[str, Any], Optional[str]]:
+            decoded = await self.decode(image_base64, source_base64)
+            local_type = None
+            if decoded is None and config.FUSED_EXTRACTION:
+                local_type = await self.classifier.classify_local(source_base64 or image_base64)
+            
+            if decoded is not None:
+                # Barcode/MRZ gave the type and most fields without a classification call
+                document_type, fields, model_tier = decoded
+            elif local_type is not None:
+                # Type already known from local features; only the fields need the LLM
+                document_type = local_type
+                fields, model_tier = await self.extractor.extract_with_tier(image_base64, document_type)
+            elif config.FUSED_EXTRACTION:
+                # Classify and extract in a single LLM call
+                document_type, fields, model_tier = await self.extractor.classify_and_extract_with_tier(image_base64)
+            else:
+                document_type = await self.classify(content_hash, image_base64, source_base64)
+                fields, model_tier = {}, None
+                if document_type != DocumentType.UNKNOWN:
+                    fields, model_tier = await self.flights.do(
+                        ResultCache.make_key(content_hash, "extract", document_type.value),
+                        lambda: self.extractor.extract_with_tier(image_base64, document_type)
+                    )
+
+            if self.cache is not None and document_type != DocumentType.UNKNOWN and fields:
+                await self.cache.set(key, {
+                    "document_type": document_type.value,
+                    "fields": fields,
+                    "model_tier": model_tier
+                })
+
+            return document_type, fields, model_tier
+
+        return await self.flights.do(key, _extract)
+
+    async def extract_page(
+        self,
+        page_hash: str,
+        image_base64: str,
+        document_type: DocumentType,
+        source_base64: Optional[str] = None
+    ) -> Tuple[Dict[str, Any], Optional[str]]:
+        """
+        Extract the fields of a page already classified, reusing a cached or in-flight result
+        
+        Args:
+            page_hash: Content hash of the upload plus the page number
+            image_base64: Base64 encoded LLM page image
+            document_type: Type the page was classified as
+            source_base64: Full-resolution page image to decode (default image_base64)
+            
+        Returns:
+            Tuple of (dictionary of extracted fields, model that answered)
+        """
+        key = ResultCache.make_key(page_hash, "extract", document_type.value)
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached["fields"], cached.get("model_tier")
+        
+        async def _extract() -> Tuple[Dict[str, Any], Optional[str]]:
+            decoded = await self.decode(image_base64, source_base64)
+            if decoded is not None and decoded[0] == document_type:
+                _, fields, model_tier = decoded
+            else:
+                fields, model_tier = await self.extractor.extract_with_tier(image_base64, document_type)
+            if self.cache is not None and fields:
+                await self.cache.set(key, {"fields": fields, "model_tier": model_tier})
+            return fields, model_tier
+        
+        return await self.flights.do(key, _extract)
+
+    async def scan_pdf_pages(
+        self,
+        upload: UploadBuffer,
+        mode: str
+    ) -> Tuple[List[Tuple[int, DocumentType, str, Optional[str]]], bool]:
+        """
+        Render and classify the pages of a PDF concurrently
+        
+        Pages are rendered in runs of config.PDF_RENDER_BATCH_PAGES, so the PDF
+        crosses to the render executor (and is opened) once per run, and each
+        run's pages are classified in order. Up to config.PDF_PAGE_CONCURRENCY
+        runs are in flight at once. Blank pages are dropped after rendering and
+        the local classifier answers before the LLM does (see
+        DocumentClassifier.classify). In "best" mode, once a document page is
+        found, later pages are not classified and runs not yet rendered are
+        cancelled; a classification already started still completes (the
+        coalesced call is shielded) and only fills the result cache.
+        
+        Args:
+            upload: The PDF upload
+            mode: "best" or "all"
+            
+        Returns:
+            Tuple of (document pages as (page number, DocumentType, LLM image,
+            source image or None) in page order, whether page 1 has content to
+            preview when no page is a document)
+        """
+        content_hash = await upload.prepare_hash()
+        page_count = await render_executor.run(pdf_page_count, upload.content, content_hash)
+        semaphore = asyncio.Semaphore(config.PDF_PAGE_CONCURRENCY)
+        last_page = min(page_count, config.PDF_MAX_PAGES)
+        batch_size = max(1, config.PDF_RENDER_BATCH_PAGES)
+        
+        source = uses_source_image()
+        
+        async def scan(first: int) -> List[Tuple[int, DocumentType, Optional[str], Optional[str]]]:
+            nonlocal last_page
+            scanned = []
+            async with semaphore:
+                if first > last_page:
+                    return scanned
+                images = await render_executor.run(
+                    render_llm_pages, upload.content, first, min(first + batch_size - 1, last_page), source, content_hash
+                )
+                for number, rendered in enumerate(images, start=first):
+                    if number > last_page:
+                        break  # An earlier page is already a document
+                    if rendered is None:
+                        continue  # Blank page
+                    image_base64, source_base64 = rendered
+                    document_type = await self.classify(f"{content_hash}:{number}", image_base64, source_base64)
+                    scanned.append((number, document_type, image_base64, source_base64))
+                    if mode == "best" and document_type != DocumentType.UNKNOWN:
+                        # Later pages can't beat this one; earlier pages still might
+                        last_page = min(last_page, number)
+                        break
+            return scanned
+        
+        tasks = {
+            first: asyncio.ensure_future(scan(first))
+            for first in range(1, last_page + 1, batch_size)
+        }
+        pages, cover = [], False
+        try:
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    for number, document_type, image_base64, source_base64 in task.result():
+                        if document_type == DocumentType.UNKNOWN:
+                            cover = cover or number == 1
+                            continue
+                        pages.append((number, document_type, image_base64, source_base64))
+                for first, task in tasks.items():
+                    if first > last_page:
+                        task.cancel()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        
+        pages.sort(key=lambda page: page[0])
+        if mode == "best":
+            pages = pages[:1]
+        return pages, cover
+
+    async def save_document(
+        self,
+        db_service: DatabaseService,
+        renditions: Dict[str, Tuple[bytes, str]],
+        **result: Any
+    ) -> Document:
+        """
+        Store a document's preview renditions and persist its extraction result
+        
+        Args:
+            db_service: Database service used to store the result
+            renditions: Dictionary of rendition name to (encoded bytes, MIME type)
+            **result: Arguments of DatabaseService.process_extraction_result
+            
+        Returns:
+            Stored Document
+        """
+        previews = await store_previews(renditions, db_service)
+        try:
+            return await db_service.process_extraction_result(previews=previews, **result)
+        finally:
+            # The document took references of its own
+            await release_previews(previews, db_service)
+
+    async def process_pdf_pages(
+        self,
+        file_name: str,
+        content: bytes,
+        db_service: DatabaseService,
+        file_path: Optional[str] = None,
+        mode: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> List[Tuple[int, DocumentType, Dict[str, Any], Document]]:
+        """
+        Find, extract and persist the documents in a multi-page PDF
+        
+        "best" stores the first page that is a document; "all" stores one
+        Document per distinct document, merging pages that show the same one
+        (e.g. the front and back of a card). When no page is a document a single
+        unknown Document is stored.
+        
+        Args:
+            file_name: Original file name
+            content: PDF file content as bytes
+            db_service: Database service used to store the results
+            file_path: Path of the stored upload
+            mode: "best" or "all" (default config.PDF_PAGE_MODE)
+            content_hash: SHA-256 hex digest of the content, if already known
+            
+        Returns:
+            List of (page number, DocumentType, dictionary of extracted fields,
+            stored Document), in page order
+        """
+        mode = mode or config.PDF_PAGE_MODE
+        upload = UploadBuffer(content, "application/pdf", content_hash)
+        pages, cover = await self.scan_pdf_pages(upload, mode)
+        
+        if not pages:
+            renditions = await render_executor.run(render_page_previews, upload.content, 1, upload.content_hash) if cover else {}
+            document = await self.save_document(
+                db_service,
+                renditions,
+                file_name=file_name,
+                document_type=DocumentType.UNKNOWN.value,
+                extracted_fields={},
+                file_path=file_path
+            )
+            return [(1, DocumentType.UNKNOWN, {}, document)]
+        
+        extracted = await asyncio.gather(*[
+            self.extract_page(f"{upload.content_hash}:{number}", image_base64, document_type, source_base64)
+            for number, document_type, image_base64, source_base64 in pages
+        ])
+        
+        # Merge pages showing the same document, keeping the first page's values
+        documents: Dict[Any, List] = {}
+        for (number, document_type, _, _), (fields, model_tier) in zip(pages, extracted):
+            identity = document_identity(document_type, fields) or number
+            if identity in documents:
+                merged = documents[identity][2]
+                for name, value in fields.items():
+                    if merged.get(name) in (None, ""):
+                        merged[name] = value
+                continue
+            documents[identity] = [number, document_type, dict(fields), model_tier]
+        
+        results = []
+        for number, document_type, fields, model_tier in documents.values():
+            document = await self.save_document(
+                db_service,
+                await render_executor.run(render_page_previews, upload.content, number, upload.content_hash),
+                file_name=file_name,
+                document_type=document_type.value,
+                extracted_fields=fields,
+                file_path=file_path,
+                model_tier=model_tier,
+                page_number=number
+            )
+            results.append((number, document_type, fields, document))
+        return results
+
+    async def process_upload(
+        self,
+        file_name: str,
+        content_type: str,
+        content: bytes,
+        db_service: DatabaseService,
+        file_path: Optional[str] = None,
+        pdf_mode: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> Tuple[DocumentType, Dict[str, Any], Document]:
+        """
+        Classify, extract and persist a single uploaded document
+        
+        PDFs are scanned page by page unless the PDF mode is "first"; the first
+        document found is returned (process_pdf_pages returns them all).
+        
+        Args:
+            file_name: Original file name
+            content_type: MIME type of the upload
+            content: Uploaded file content as bytes
+            db_service: Database service used to store the result
+            file_path: Path of the stored upload
+            pdf_mode: "first", "best" or "all" (default config.PDF_PAGE_MODE)
+            content_hash: SHA-256 hex digest of the content, if already known
+            
+        Returns:
+            Tuple of (DocumentType, dictionary of extracted fields, stored Document)
+        """
+        pdf_mode = pdf_mode or config.PDF_PAGE_MODE
+        if content_type == "application/pdf" and pdf_mode != "first":
+            _, document_type, fields, document = (
+                await self.process_pdf_pages(file_name, content, db_service, file_path, pdf_mode, content_hash)
+            )[0]
+            return document_type, fields, document
+        
+        upload = UploadBuffer(content, content_type, content_hash)
+        # One render executor call builds every rendition, so a process pool receives the upload once
+        image_base64 = await upload.prepare(source=uses_source_image(), previews=True)
+        source_base64 = await upload.prepare_source() if uses_source_image() else None
+        
+        # Classify document and extract fields
+        document_type, fields, model_tier = await self.extract(upload.content_hash, image_base64, source_base64)
+        
+        # Save to database with previews
+        document = await self.save_document(
+            db_service,
+            await upload.previews(),
+            file_name=file_name,
+            document_type=document_type.value,
+            extracted_fields=fields,
+            file_path=file_path,
+            model_tier=model_tier
+        )
+        
+        return document_type, fields, document
+
+    async def process_upload_stream(
+        self,
+        file_name: str,
+        content_type: str,
+        content: bytes,
+        db_service: DatabaseService,
+        file_path: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Classify, extract and persist a document, yielding progress events
+        
+        Args:
+            file_name: Original file name
+            content_type: MIME type of the upload
+            content: Uploaded file content as bytes
+            db_service: Database service used to store the result
+            file_path: Path of the stored upload
+            content_hash: SHA-256 hex digest of the content, if already known
+            
+        Yields:
+            Event dicts: page_rendered, classified, field (one per field),
+            escalated (when the cheap model's answer is rejected), extracted and persisted
+        """
+        upload = UploadBuffer(content, content_type, content_hash)
+        image_base64 = await upload.prepare(source=uses_source_image(), previews=True)
+        source_base64 = await upload.prepare_source() if uses_source_image() else None
+        yield {"event": "page_rendered", "page": 1}
+        
+        content_hash = upload.content_hash
+        key = ResultCache.make_key(content_hash, "extract")
+        cached = await self.cache.get(key) if self.cache is not None else None
+        decoded = await self.decode(image_base64, source_base64) if cached is None else None
+        
+        if cached is not None:
+            document_type = DocumentType(cached["document_type"])
+            fields = cached["fields"]
+            model_tier = cached.get("model_tier")
+            yield {"event": "classified", "document_type": document_type.value, "cached": True}
+            for name, value in fields.items():
+                yield {"event": "field", "name": name, "value": value}
+        elif decoded is not None:
+            # Barcode/MRZ decoded; any fields it lacked were filled by one LLM call
+            document_type, fields, model_tier = decoded
+            yield {"event": "classified", "document_type": document_type.value}
+            for name, value in fields.items():
+                yield {"event": "field", "name": name, "value": value}
+            
+            if self.cache is not None and fields:
+                await self.cache.set(key, {
+                    "document_type": document_type.value,
+                    "fields": fields,
+                    "model_tier": model_tier
+                })
+        else:
+            if config.FUSED_EXTRACTION:
+                known_type = await self.classifier.classify_local(source_base64 or image_base64)
+            else:
+                known_type = await self.classify(content_hash, image_base64, source_base64)
+            if known_type is not None:
+                yield {"event": "classified", "document_type": known_type.value}
+            
+            document_type, fields, model_tier = DocumentType.UNKNOWN, {}, None
+            if config.FUSED_EXTRACTION or known_type != DocumentType.UNKNOWN:
+                async for event in self.extractor.extract_stream(image_base64, known_type):
+                    if event["event"] == "extracted":
+                        document_type = DocumentType(event["document_type"])
+                        fields = event["fields"]
+                        model_tier = event.get("model_tier")
+                        continue
+                    yield event
+            
+            if self.cache is not None and document_type != DocumentType.UNKNOWN and fields:
+                await self.cache.set(key, {
+                    "document_type": document_type.value,
+                    "fields": fields,
+                    "model_tier": model_tier
+                })
+        
+        yield {"event": "extracted", "document_type": document_type.value, "fields": fields, "model_tier": model_tier}
+        
+        # Save to database with previews
+        document = await self.save_document(
+            db_service,
+            await upload.previews(),
+            file_name=file_name,
+            document_type=document_type.value,
+            extracted_fields=fields,
+            file_path=file_path,
+            model_tier=model_tier
+        )
+        
+        yield {"event": "persisted", "document_id": document.id}
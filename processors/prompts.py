@@ -0,0 +1,252 @@
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+from models import DocumentType, DOCUMENT_FIELDS
+from config import config
+from utils.image_utils import image_mime_type
+
+# Common name field descriptions for all document types
+COMMON_NAME_FIELDS = {
+    "full_name": "Complete name as shown on document",
+    "first_name": "First name (given name)",
+    "last_name": "Last name (surname/family name)"
+}
+
+FIELD_DESCRIPTIONS = {
+    DocumentType.PASSPORT: {
+        **COMMON_NAME_FIELDS,
+        "date_of_birth": "Date of birth (MM/DD/YYYY format)",
+        "country": "Issuing country (lowercase with underscores)",
+        "issue_date": "Date of issue (MM/DD/YYYY format)",
+        "expiration_date": "Expiration date (MM/DD/YYYY format)",
+        "passport_number": "Passport number/document number"
+    },
+    DocumentType.DRIVER_LICENSE: {
+        **COMMON_NAME_FIELDS,
+        "license_number": "Driver's license number",
+        "date_of_birth": "Date of birth (MM/DD/YYYY format)",
+        "issue_date": "Issue date (MM/DD/YYYY format)",
+        "expiration_date": "Expiration date (MM/DD/YYYY format)",
+        "address": "Full address"
+    },
+    DocumentType.EAD_CARD: {
+        **COMMON_NAME_FIELDS,
+        "card_number": "USCIS card number (with hyphens)",
+        "category": "Category code (e.g., C09)",
+        "card_expires_date": "Card expiration date (MM/DD/YYYY format)",
+        "date_of_birth": "Date of birth (MM/DD/YYYY format)"
+    }
+}
+
+CLASSIFY_TEXT = "\n".join([
+    "Please analyze this image and determine what type of immigration document it is.",
+    "Classify it as one of the following:",
+    "- passport: International travel document",
+    "- driver_license: State-issued driver's license",
+    "- ead_card: Employment Authorization Document (EAD) card",
+    "Only respond with one of these exact words: passport, driver_license, ead_card, or unknown"
+])
+
+# Rules shared by every extraction prompt, sent as the system message
+EXTRACTION_INSTRUCTIONS = "\n".join([
+    "You extract fields from images of immigration documents.",
+    "",
+    "Name extraction:",
+    '1. If the document shows a complete name in one field, extract it as "full_name"',
+    '2. If the document shows first and last names in separate fields, extract them as "first_name" and "last_name"',
+    "3. If you can see any name information, extract what you can see",
+    '4. "SMITH, JOHN" format: extract as full_name (we\'ll parse it later)',
+    "",
+    "General rules:",
+    "- Extract ONLY what is visible on the document",
+    "- For dates: extract in the format shown (we'll standardize later)",
+    "- For missing fields: use null",
+    "- Do NOT make assumptions or split/combine fields yourself",
+    "- Return only a single flat JSON object, no additional text"
+])
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """Tokenizer for the configured model, or None without tiktoken"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(config.OPENAI_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count prompt tokens
+
+    Uses tiktoken when installed, otherwise estimates ~4 characters per token.
+
+    Args:
+        text: Prompt text
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+class CompiledPrompt:
+    """Prompt text built once, with its token count"""
+
+    def __init__(self, name: str, text: str, system: Optional[str] = None):
+        self.name = name
+        self.text = text
+        self.system = system
+        self.tokens = count_tokens(text) + (count_tokens(system) if system else 0)
+        self._system_messages = [{"role": "system", "content": system}] if system else []
+
+    def payload(
+        self,
+        image_base64: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        detail: str = "auto"
+    ) -> Dict[str, Any]:
+        """
+        Build a chat completion request for one image
+
+        Args:
+            image_base64: Base64 encoded image
+            model: Model to call
+            max_tokens: Completion token limit
+            temperature: Sampling temperature
+            detail: Vision detail level (low, high or auto)
+
+        Returns:
+            Chat completion request body
+        """
+        return {
+            "model": model,
+            "messages": [
+                *self._system_messages,
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": self.text
+                        },
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{image_mime_type(image_base64)};base64,{image_base64}",
+                                "detail": detail
+                            }
+                        }
+                    ]
+                }
+            ],
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+
+
+def _field_list(document_type: DocumentType, fields: Iterable[str], indent: str = "") -> str:
+    """Bullet list of field descriptions"""
+    descriptions = FIELD_DESCRIPTIONS.get(document_type, {})
+    return "\n".join(f"{indent}- {field}: {descriptions.get(field, field)}" for field in fields)
+
+
+@lru_cache(maxsize=64)
+def _compile_extraction(document_type: DocumentType, fields: Tuple[str, ...]) -> CompiledPrompt:
+    """Extraction prompt for a document type and field subset"""
+    example_json = json.dumps({field: "value" for field in fields})
+    text = "\n".join([
+        f"Please extract the following information from this {document_type.value.replace('_', ' ')}:",
+        _field_list(document_type, fields),
+        "",
+        f"Example format: {example_json}"
+    ])
+    return CompiledPrompt(f"extract:{document_type.value}", text, system=EXTRACTION_INSTRUCTIONS)
+
+
+def _compile_fused() -> CompiledPrompt:
+    """Prompt that classifies and extracts in one response"""
+    type_list = "\n".join(
+        f"{document_type.value}:\n{_field_list(document_type, fields, indent='  ')}"
+        for document_type, fields in DOCUMENT_FIELDS.items()
+    )
+    example_json = json.dumps(
+        {"document_type": "passport", **{field: "value" for field in DOCUMENT_FIELDS[DocumentType.PASSPORT]}}
+    )
+    text = "\n".join([
+        "Determine what type of immigration document this image is.",
+        'Set "document_type" to one of: passport, driver_license, ead_card, or unknown.',
+        "Then extract the fields for that document type only:",
+        type_list,
+        "",
+        'If the document type is unknown, return only {"document_type": "unknown"}',
+        f"Example format: {example_json}"
+    ])
+    return CompiledPrompt("fused", text, system=EXTRACTION_INSTRUCTIONS)
+
+
+class PromptRegistry:
+    """
+    Classification and extraction prompts compiled once at startup
+
+    The version combines config.PROMPT_VERSION with a digest of the compiled
+    text, so editing a prompt invalidates cached results without a manual bump.
+    """
+
+    def __init__(self):
+        self.classify = CompiledPrompt("classify", CLASSIFY_TEXT)
+        self.fused = _compile_fused()
+        self.extract = {
+            document_type: _compile_extraction(document_type, tuple(fields))
+            for document_type, fields in DOCUMENT_FIELDS.items()
+        }
+
+        digest = hashlib.sha256()
+        for prompt in self.prompts():
+            digest.update((prompt.system or "").encode())
+            digest.update(prompt.text.encode())
+        self.version = f"{config.PROMPT_VERSION}.{digest.hexdigest()[:8]}"
+
+    def extraction(self, document_type: DocumentType, fields: Optional[Iterable[str]] = None) -> CompiledPrompt:
+        """
+        Get the extraction prompt for a document type
+
+        Args:
+            document_type: Type of document
+            fields: Subset of the type's fields to request, or None for all
+
+        Returns:
+            Compiled prompt
+        """
+        if fields is None:
+            return self.extract[document_type]
+        wanted = set(fields)
+        # Keep DOCUMENT_FIELDS order so equal subsets share one compiled prompt
+        return _compile_extraction(
+            document_type,
+            tuple(field for field in DOCUMENT_FIELDS[document_type] if field in wanted)
+        )
+
+    def prompts(self) -> Iterable[CompiledPrompt]:
+        """All prompts compiled at startup"""
+        return [self.classify, self.fused, *self.extract.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        """Prompt version and input token counts"""
+        return {
+            "version": self.version,
+            "tokens": {prompt.name: prompt.tokens for prompt in self.prompts()}
+        }
+
+# Application-scoped prompt registry
+prompt_registry = PromptRegistry()
@@ -0,0 +1,269 @@
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Mapping, Optional
+from config import config
+
+def parse_reset_duration(value: str) -> Optional[float]:
+    """
+    Parse a provider reset duration such as "1s", "6m0s" or "250ms"
+
+    Args:
+        value: Duration string from a rate-limit header
+
+    Returns:
+        Duration in seconds or None if it cannot be parsed
+    """
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    matches = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+    if not matches:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in matches)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at capacity per minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds to wait before amount tokens are available"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        """Consume tokens (may go negative when the provider reports less headroom)"""
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def clamp(self, remaining: float):
+        """Align the bucket with the remaining quota reported by the provider"""
+        self._refill()
+        self.level = min(self.level, remaining)
+
+
+class AdaptiveRateLimiter:
+    """Request/token rate limiting with AIMD concurrency control for LLM calls"""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        min_concurrency: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        initial_concurrency: Optional[int] = None,
+        target_latency: Optional[float] = None
+    ):
+        self.requests = TokenBucket(requests_per_minute or config.LLM_RPM_LIMIT)
+        self.tokens = TokenBucket(tokens_per_minute or config.LLM_TPM_LIMIT)
+        self.min_concurrency = min_concurrency or config.LLM_MIN_CONCURRENCY
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
+        self.limit = float(initial_concurrency or config.LLM_INITIAL_CONCURRENCY)
+        self.target_latency = target_latency or config.LLM_TARGET_LATENCY
+
+        self.active = 0
+        self.waiting = 0
+        self.blocked_until = 0.0
+        self.last_decrease = float("-inf")  # When the limit was last cut (monotonic)
+        self._condition: Optional[asyncio.Condition] = None
+        self._bucket_lock: Optional[asyncio.Lock] = None
+
+        self.counters = {
+            "requests": 0,
+            "rate_limited": 0,
+            "timeouts": 0,
+            "increases": 0,
+            "decreases": 0
+        }
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    @property
+    def bucket_lock(self) -> asyncio.Lock:
+        if self._bucket_lock is None:
+            self._bucket_lock = asyncio.Lock()
+        return self._bucket_lock
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int = 0):
+        """
+        Wait for a concurrency slot and rate budget, queueing instead of failing
+
+        Args:
+            estimated_tokens: Estimated prompt + completion tokens for the call
+        """
+        self.waiting += 1
+        try:
+            async with self.condition:
+                await self.condition.wait_for(lambda: self.active < int(self.limit))
+                self.active += 1
+        finally:
+            self.waiting -= 1
+
+        try:
+            await self._wait_for_budget(estimated_tokens)
+            self.counters["requests"] += 1
+            yield
+        finally:
+            async with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
+
+    async def _wait_for_budget(self, estimated_tokens: int):
+        """Sleep until both buckets and any provider-imposed pause allow the call"""
+        async with self.bucket_lock:
+            while True:
+                delay = max(
+                    self.blocked_until - time.monotonic(),
+                    self.requests.delay_for(1),
+                    self.tokens.delay_for(estimated_tokens)
+                )
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            self.requests.take(1)
+            self.tokens.take(estimated_tokens)
+
+    def record(self, status_code: int, headers: Optional[Mapping[str, Any]], latency: float):
+        """
+        Feed a completed response back into the limiter
+
+        Args:
+            status_code: HTTP status code
+            headers: Response headers
+            latency: Request latency in seconds
+        """
+        self._apply_headers(headers)
+
+        if status_code == 429:
+            self.counters["rate_limited"] += 1
+            retry_after = self._header(headers, "retry-after")
+            pause = parse_reset_duration(retry_after) if retry_after else None
+            self._pause(pause if pause is not None else 1.0)
+            self._decrease(latency)
+        elif status_code < 500:
+            if latency > self.target_latency:
+                self._decrease(latency)
+            else:
+                self._increase()
+
+    def record_timeout(self, latency: Optional[float] = None):
+        """
+        Treat a timed-out call as a congestion signal
+
+        Args:
+            latency: Seconds the call ran before timing out, if known
+        """
+        self.counters["timeouts"] += 1
+        self._decrease(latency)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get limiter state and counters"""
+        return {
+            **self.counters,
+            "concurrency_limit": round(self.limit, 2),
+            "active": self.active,
+            "waiting": self.waiting,
+            "paused_for": max(0.0, round(self.blocked_until - time.monotonic(), 3))
+        }
+
+    def _increase(self):
+        """Additive increase: roughly +1 slot per window of successful calls"""
+        new_limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+        if int(new_limit) > int(self.limit):
+            self.counters["increases"] += 1
+        self.limit = new_limit
+        self._notify()
+
+    def _decrease(self, latency: Optional[float] = None):
+        """
+        Multiplicative decrease on 429s, timeouts or latency above target
+
+        At most once per window: a call that was already in flight at the last
+        cut reports the same congestion, so a burst of concurrent failures
+        backs off once instead of once per call.
+
+        Args:
+            latency: Seconds the failed call took, placing its start before or after the last cut
+        """
+        now = time.monotonic()
+        if latency is not None and now - latency < self.last_decrease:
+            return
+        self.limit = max(float(self.min_concurrency), self.limit * config.LLM_CONCURRENCY_BACKOFF)
+        self.last_decrease = now
+        self.counters["decreases"] += 1
+
+    def _pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def _notify(self):
+        """Wake queued callers after the limit grows"""
+        if self._condition is None:
+            return
+
+        async def _wake():
+            async with self.condition:
+                self.condition.notify_all()
+
+        try:
+            asyncio.get_running_loop().create_task(_wake())
+        except RuntimeError:
+            pass
+
+    def _apply_headers(self, headers: Optional[Mapping[str, Any]]):
+        """Sync the buckets with the provider's x-ratelimit-* headers"""
+        remaining_requests = self._number(self._header(headers, "x-ratelimit-remaining-requests"))
+        remaining_tokens = self._number(self._header(headers, "x-ratelimit-remaining-tokens"))
+
+        if remaining_requests is not None:
+            self.requests.clamp(remaining_requests)
+            if remaining_requests <= 0:
+                reset = parse_reset_duration(self._header(headers, "x-ratelimit-reset-requests") or "")
+                self._pause(reset if reset is not None else 1.0)
+
+        if remaining_tokens is not None:
+            self.tokens.clamp(remaining_tokens)
+            if remaining_tokens <= 0:
+                reset = parse_reset_duration(self._header(headers, "x-ratelimit-reset-tokens") or "")
+                self._pause(reset if reset is not None else 1.0)
+
+    @staticmethod
+    def _header(headers: Optional[Mapping[str, Any]], name: str) -> Optional[str]:
+        if not isinstance(headers, Mapping):
+            return None
+        value = headers.get(name)
+        return str(value) if value is not None else None
+
+    @staticmethod
+    def _number(value: Optional[str]) -> Optional[float]:
+        if value is None:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return None
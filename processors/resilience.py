@@ -0,0 +1,263 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+import httpx
+from config import config
+
+RETRYABLE_EXCEPTIONS = (httpx.TimeoutException, httpx.TransportError)
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and calls fail fast"""
+
+
+def is_retryable_status(status_code: int) -> bool:
+    """Check whether an HTTP status is worth retrying (429 and 5xx)"""
+    return status_code == 429 or status_code >= 500
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open probe"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self):
+        """
+        Check whether a call may proceed
+
+        Raises:
+            CircuitOpenError: If the upstream is considered unhealthy
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("Circuit open: upstream LLM is unhealthy")
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError("Circuit half-open: probe call in progress")
+            self._probe_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def abandon(self):
+        """
+        Resolve a call that ended without an outcome (e.g. it was cancelled)
+
+        An abandoned half-open probe counts as a failure, so the breaker
+        reopens instead of waiting forever for the probe; otherwise the
+        call tells nothing about the upstream and is not counted.
+        """
+        if self.state == self.HALF_OPEN:
+            self.record_failure()
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Get the q-th quantile (0..1) of recent latencies, or None if empty"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+
+class ResiliencePolicy:
+    """Retry, hedging and circuit breaker settings for one operation"""
+
+    def __init__(self, operation: str, settings: Optional[Dict[str, Any]] = None):
+        settings = {**config.LLM_POLICIES.get("default", {}), **(settings or {})}
+        self.operation = operation
+        self.timeout = settings.get("timeout", config.OPENAI_TIMEOUT)
+        self.max_retries = settings.get("max_retries", 2)
+        self.base_delay = settings.get("base_delay", 0.5)
+        self.max_delay = settings.get("max_delay", 8.0)
+        self.hedge_enabled = settings.get("hedge_enabled", False)
+        self.hedge_percentile = settings.get("hedge_percentile", 0.95)
+        self.hedge_min_samples = settings.get("hedge_min_samples", 20)
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.get("breaker_failure_threshold", 5),
+            reset_timeout=settings.get("breaker_reset_timeout", 30.0)
+        )
+        self.latencies = LatencyTracker()
+
+    @classmethod
+    def for_operation(cls, operation: str) -> "ResiliencePolicy":
+        """Build a policy from config.LLM_POLICIES"""
+        return cls(operation, config.LLM_POLICIES.get(operation))
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for a retry attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def hedge_delay(self) -> Optional[float]:
+        """Latency after which a duplicate request is sent, or None when hedging is off"""
+        if not self.hedge_enabled or len(self.latencies.samples) < self.hedge_min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+
+class ResilientCaller:
+    """Apply per-operation retries, hedged requests and circuit breaking to LLM calls"""
+
+    def __init__(self):
+        self.policies: Dict[str, ResiliencePolicy] = {}
+        self.counters = {
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "short_circuited": 0
+        }
+
+    def policy(self, operation: str) -> ResiliencePolicy:
+        if operation not in self.policies:
+            self.policies[operation] = ResiliencePolicy.for_operation(operation)
+        return self.policies[operation]
+
+    async def call(self, operation: str, send: Callable[[float], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        Run a request under the operation's resilience policy
+
+        Args:
+            operation: Operation name (classify, extract)
+            send: Coroutine factory taking a timeout and performing one HTTP attempt
+
+        Returns:
+            The final HTTP response (which may still be an error status)
+
+        Raises:
+            CircuitOpenError: If the breaker is open
+            httpx.TimeoutException, httpx.TransportError: If all attempts fail at the transport level
+        """
+        policy = self.policy(operation)
+
+        try:
+            policy.breaker.allow()
+        except CircuitOpenError:
+            self.counters["short_circuited"] += 1
+            raise
+
+        attempt = 0
+        resolved = False
+        try:
+            while True:
+                try:
+                    response = await self._attempt(policy, send)
+                except RETRYABLE_EXCEPTIONS:
+                    if attempt >= policy.max_retries:
+                        raise
+                else:
+                    if not is_retryable_status(response.status_code):
+                        policy.breaker.record_success()
+                        resolved = True
+                        return response
+                    if attempt >= policy.max_retries:
+                        return response
+
+                self.counters["retries"] += 1
+                await asyncio.sleep(policy.backoff(attempt))
+                attempt += 1
+        except asyncio.CancelledError:
+            policy.breaker.abandon()
+            resolved = True
+            raise
+        finally:
+            # Retries exhausted or a non-retryable error: always resolve the
+            # breaker, so a half-open probe can't stay in flight forever
+            if not resolved:
+                policy.breaker.record_failure()
+
+    async def _attempt(self, policy: ResiliencePolicy, send: Callable[[float], Awaitable[httpx.Response]]) -> httpx.Response:
+        """One attempt, with a hedged duplicate once the primary is slower than the percentile"""
+        start = time.monotonic()
+        hedge_delay = policy.hedge_delay()
+
+        if hedge_delay is None:
+            response = await send(policy.timeout)
+            self._observe(policy, response, time.monotonic() - start)
+            return response
+
+        primary = asyncio.ensure_future(send(policy.timeout))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay)
+        if done:
+            response = primary.result()
+            self._observe(policy, response, time.monotonic() - start)
+            return response
+
+        self.counters["hedges"] += 1
+        hedge = asyncio.ensure_future(send(policy.timeout))
+        pending = {primary, hedge}
+        last_error: Optional[BaseException] = None
+        response = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    response = task.result()
+                    if not is_retryable_status(response.status_code):
+                        if task is hedge:
+                            self.counters["hedge_wins"] += 1
+                        self._observe(policy, response, time.monotonic() - start)
+                        return response
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if response is not None:
+            return response
+        raise last_error
+
+    @staticmethod
+    def _observe(policy: ResiliencePolicy, response: httpx.Response, latency: float):
+        if not is_retryable_status(response.status_code):
+            policy.latencies.add(latency)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get resilience counters and per-operation breaker state"""
+        return {
+            **self.counters,
+            "operations": {
+                name: {
+                    "breaker": policy.breaker.state,
+                    "p50": policy.latencies.percentile(0.5),
+                    "p95": policy.latencies.percentile(0.95),
+                    "hedge_after": policy.hedge_delay()
+                }
+                for name, policy in self.policies.items()
+            }
+        }
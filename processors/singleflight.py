@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one in-flight task"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {
+            "leaders": 0,
+            "coalesced": 0
+        }
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn once per key among concurrent callers
+
+        Args:
+            key: Identity of the call (e.g. image hash + operation + document type)
+            fn: Zero-argument coroutine factory performing the call
+
+        Returns:
+            The shared result; exceptions are raised in every waiting caller
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.counters["leaders"] += 1
+            # Run as its own task so a disconnecting caller does not cancel it for the others
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.counters["coalesced"] += 1
+
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get coalescing counters"""
+        return {**self.counters, "in_flight": self.in_flight()}
+
+    def _finish(self, key: str, task: asyncio.Task):
+        """Forget a completed call"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
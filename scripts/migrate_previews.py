@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Move document images stored inline as data URLs into stored preview renditions
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from database.models import init_db, get_async_session, get_sync_engine
+from database.operations import DatabaseService
+from utils.previews import migrate_data_url_previews
+
+async def migrate():
+    """Migrate every document still holding a data URL"""
+    AsyncSessionLocal = get_async_session()
+    async with AsyncSessionLocal() as session:
+        return await migrate_data_url_previews(DatabaseService(session))
+
+def main():
+    """Add the preview columns, migrate, then reclaim the space in SQLite"""
+    init_db()
+
+    migrated, cleared = asyncio.run(migrate())
+    print(f"Migrated {migrated} documents ({cleared} unreadable data URLs cleared)")
+
+    engine = get_sync_engine()
+    if engine.dialect.name == "sqlite":
+        print("Compacting database...")
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+
+    print("Preview migration complete!")
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,24 @@ Test configuration and fixtures
 """
 
 import pytest
+import pytest_asyncio
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from typing import AsyncGenerator
+import importlib
 import tempfile
 import shutil
 from pathlib import Path
 
+from config import config
 from database.models import Base
 from database.operations import DatabaseService
+from processors.llm_client import llm_client
+from processors.rate_limiter import AdaptiveRateLimiter
+from processors.resilience import ResilientCaller, ResiliencePolicy
+from utils.executors import render_executor
+from utils.storage import LocalFileStorage
 
 
 @pytest.fixture(scope="session")
@@ -23,7 +31,34 @@ def event_loop():
     loop.close()
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(autouse=True)
+def reset_llm_client(monkeypatch):
+    """Give each test fresh limiter/breaker state and skip retry backoff sleeps.
+
+    The model cascade, local classifier and barcode/MRZ decoder are off by default
+    so each mocked response maps to one call; their tests turn them back on explicitly.
+    Rendering runs on threads so patched config reaches it; the process pool has its own tests.
+    """
+    llm_client.limiter = AdaptiveRateLimiter()
+    llm_client.resilience = ResilientCaller()
+    monkeypatch.setattr(ResiliencePolicy, "backoff", lambda self, attempt: 0)
+    monkeypatch.setattr(config, "LLM_CASCADE_ENABLED", False)
+    monkeypatch.setattr(config, "LOCAL_CLASSIFIER_ENABLED", False)
+    monkeypatch.setattr(config, "DETERMINISTIC_DECODING_ENABLED", False)
+    monkeypatch.setattr(render_executor, "kind", "thread")
+    yield
+
+
+@pytest.fixture(autouse=True)
+def temp_storage(tmp_path_factory, monkeypatch):
+    """Store files (uploads and the previews the pipeline renders) in a temporary directory"""
+    store = LocalFileStorage(str(tmp_path_factory.mktemp("objects")))
+    # The module, not the storage instance utils re-exports under the same name
+    monkeypatch.setattr(importlib.import_module("utils.storage"), "storage", store)
+    return store
+
+
+@pytest_asyncio.fixture(scope="function")
 async def test_db():
     """Create a test database for each test function."""
     # Use an in-memory SQLite database for tests
@@ -43,7 +78,7 @@ async def test_db():
     await engine.dispose()
 
 
-@pytest.fixture(scope="function")
+@pytest_asyncio.fixture(scope="function")
 async def db_service(test_db: AsyncSession):
     """Create a database service instance with test database."""
     return DatabaseService(test_db)
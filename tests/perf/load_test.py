@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Open-loop async load generator for the Document Processing API
+
+Fires requests at a target rate (Poisson arrivals) against /classify,
+/extract and the document endpoints, then reports p50/p95/p99 latency,
+throughput and error rate per endpoint.
+
+    python tests/perf/load_test.py --base-url http://localhost:8000 --rps 10 --duration 60 \
+        --mix classify=1,extract=2,documents=1,document=1,image=1
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+TEST_DATA_DIR = Path(__file__).parent.parent / "test_data"
+UPLOAD_TYPES = {"image/jpeg", "image/png", "application/pdf"}
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (q in 0..100)"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def load_upload_files() -> List[tuple]:
+    """Read the test images the API accepts"""
+    files = []
+    for path in sorted(TEST_DATA_DIR.iterdir()):
+        content_type = mimetypes.guess_type(path.name)[0]
+        if content_type in UPLOAD_TYPES:
+            files.append((path.name, path.read_bytes(), content_type))
+    return files
+
+
+class LoadTest:
+    """Drive a weighted endpoint mix at a target request rate"""
+
+    def __init__(self, base_url: str, rps: float, duration: float, mix: Dict[str, float], timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.rps = rps
+        self.duration = duration
+        self.mix = mix
+        self.timeout = timeout
+        self.files = load_upload_files()
+        self.document_ids: List[str] = []
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def run(self) -> Dict[str, Dict]:
+        """Run the test and return the report"""
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            await self.refresh_document_ids(client)
+
+            scenarios = list(self.mix.keys())
+            weights = list(self.mix.values())
+            tasks = []
+            start = time.monotonic()
+            next_arrival = start
+
+            while next_arrival - start < self.duration:
+                delay = next_arrival - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                scenario = random.choices(scenarios, weights)[0]
+                tasks.append(asyncio.ensure_future(self.request(client, scenario)))
+                next_arrival += random.expovariate(self.rps)
+
+            await asyncio.gather(*tasks)
+            elapsed = time.monotonic() - start
+
+        return self.report(elapsed)
+
+    async def refresh_document_ids(self, client: httpx.AsyncClient):
+        """Collect document ids for the read endpoints"""
+        try:
+            response = await client.get("/documents", params={"limit": 50})
+            if response.status_code == 200:
+                self.document_ids = [doc["id"] for doc in response.json()["documents"]] or self.document_ids
+        except httpx.HTTPError:
+            pass
+
+    async def request(self, client: httpx.AsyncClient, scenario: str):
+        """Issue one request for a scenario and record the outcome"""
+        start = time.monotonic()
+        try:
+            if scenario in ("classify", "extract"):
+                name, content, content_type = random.choice(self.files)
+                response = await client.post(f"/{scenario}", files={"file": (name, content, content_type)})
+                if scenario == "extract" and response.status_code == 200:
+                    await self.refresh_document_ids(client)
+            elif scenario == "documents":
+                response = await client.get("/documents", params={"limit": 10})
+            elif scenario in ("document", "image"):
+                if not self.document_ids:
+                    return
+                document_id = random.choice(self.document_ids)
+                path = f"/documents/{document_id}" + ("/image" if scenario == "image" else "")
+                response = await client.get(path)
+            else:
+                raise ValueError(f"Unknown scenario: {scenario}")
+        except httpx.HTTPError:
+            self.latencies[scenario].append(time.monotonic() - start)
+            self.errors[scenario] += 1
+            self.statuses[scenario][0] += 1
+            return
+
+        self.latencies[scenario].append(time.monotonic() - start)
+        self.statuses[scenario][response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors[scenario] += 1
+
+    def report(self, elapsed: float) -> Dict[str, Dict]:
+        """Summarize latency percentiles, throughput and errors"""
+        report = {}
+        for scenario, samples in sorted(self.latencies.items()):
+            report[scenario] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "error_rate": round(self.errors[scenario] / len(samples), 4),
+                "p50_ms": round(percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(percentile(samples, 99) * 1000, 1),
+                "statuses": dict(self.statuses[scenario])
+            }
+        return report
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse "classify=1,extract=2" into scenario weights"""
+    mix = {}
+    for item in spec.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def print_report(report: Dict[str, Dict]):
+    """Print the report as a table"""
+    header = f"{'endpoint':<10} {'reqs':>6} {'rps':>7} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for scenario, row in report.items():
+        print(
+            f"{scenario:<10} {row['requests']:>6} {row['throughput_rps']:>7} "
+            f"{row['error_rate'] * 100:>6.2f} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Document Processing API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=5.0, help="Target request rate")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load")
+    parser.add_argument("--mix", default="classify=1,extract=2,documents=1,document=1,image=1")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    load_test = LoadTest(args.base_url, args.rps, args.duration, parse_mix(args.mix), args.timeout)
+    result = asyncio.run(load_test.run())
+    print_report(result)
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(result, indent=2))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Peak memory per upload for sizing worker memory
+
+Runs the extract pipeline in-process against the mock LLM (no network, no API
+quota) and reports how much each request raises the server process's peak
+RSS, per test file and under concurrency, plus the peak of the largest render
+worker process (RENDER_EXECUTOR=process). Every measurement runs in a fresh process,
+so allocator state left behind by earlier requests doesn't hide the cost.
+
+    python tests/perf/memory_benchmark.py
+    python tests/perf/memory_benchmark.py --concurrency 1,4,16 --files passport.jpg,data7.pdf,~/photo.jpg --json memory.json
+"""
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+PERF_DIR = Path(__file__).parent
+ROOT_DIR = PERF_DIR.parent.parent
+TEST_DATA_DIR = PERF_DIR.parent / "test_data"
+UPLOAD_TYPES = {"image/jpeg", "image/png", "application/pdf"}
+RESULT_PREFIX = "MEMORY_RESULT "
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """High-water mark of resident set size in MB (for RUSAGE_CHILDREN, the largest exited child)"""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def upload_files(names: List[str]) -> List[Path]:
+    """Files to upload: test_data names or other paths, default every test file the API accepts"""
+    if names:
+        return [Path(name).resolve() if Path(name).is_file() else TEST_DATA_DIR / name for name in names]
+    return [
+        path for path in sorted(TEST_DATA_DIR.iterdir())
+        if mimetypes.guess_type(path.name)[0] in UPLOAD_TYPES
+    ]
+
+
+async def measure(path: Path, concurrency: int, latency: str) -> Dict[str, Any]:
+    """Run concurrent uploads of one file in this process and measure the peak"""
+    sys.path.insert(0, str(ROOT_DIR))
+    sys.path.insert(0, str(PERF_DIR))
+    import httpx
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from database.models import Base
+    from database.operations import DatabaseService
+    from mock_llm_server import MockLLM, create_app
+    from processors import DocumentPipeline, llm_client
+    from utils.executors import render_executor
+
+    # Answer LLM calls in-process from the canned responses. The response is
+    # picked by file name, so the mock never decodes images on this process's heap
+    mock = MockLLM(latency=latency)
+    current = {"name": path.name}
+    mock.match = lambda image_bytes: mock.canned.get(current["name"], mock.canned["default"])
+    llm_client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(mock)))
+    database_dir = tempfile.TemporaryDirectory()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_dir.name}/benchmark.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    pipeline = DocumentPipeline()
+    content_type = mimetypes.guess_type(path.name)[0]
+
+    async def upload(content: bytes, file_type: str):
+        async with session_maker() as session:
+            await pipeline.process_upload(path.name, file_type, content, DatabaseService(session))
+
+    # Warm up imports, the DB, the HTTP stack and the classify/extract path on the
+    # smallest other test image, so the baseline is a worker that has served requests
+    warmup = min(
+        (other for other in upload_files([]) if other != path and other.suffix != ".pdf"),
+        key=lambda other: other.stat().st_size
+    )
+    current["name"] = warmup.name
+    await upload(warmup.read_bytes(), mimetypes.guess_type(warmup.name)[0])
+    current["name"] = path.name
+
+    baseline = peak_rss_mb()
+    start = time.monotonic()
+    # Each request reads its own copy, as separate uploads would arrive
+    outcomes = await asyncio.gather(
+        *[upload(path.read_bytes(), content_type) for _ in range(concurrency)],
+        return_exceptions=True
+    )
+    elapsed = time.monotonic() - start
+    peak = peak_rss_mb()
+
+    await engine.dispose()
+    database_dir.cleanup()
+    # Render workers are child processes; their peak is known once they exit
+    render_executor.shutdown(wait=True)
+    return {
+        "file": path.name,
+        "size_kb": round(path.stat().st_size / 1024, 1),
+        "concurrency": concurrency,
+        "baseline_mb": round(baseline, 1),
+        "peak_mb": round(peak, 1),
+        "peak_per_request_mb": round((peak - baseline) / concurrency, 2),
+        "render_worker_peak_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+        "seconds": round(elapsed, 2),
+        "errors": sum(isinstance(outcome, Exception) for outcome in outcomes)
+    }
+
+
+def run_isolated(path: Path, concurrency: int, latency: str) -> Dict[str, Any]:
+    """Measure in a fresh interpreter so earlier runs don't pre-grow the heap"""
+    completed = subprocess.run(
+        [sys.executable, __file__, "--worker", str(path), "--concurrency", str(concurrency), "--latency", latency],
+        capture_output=True,
+        text=True,
+        cwd=ROOT_DIR
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"Benchmark worker failed for {path.name}:\n{completed.stderr[-2000:]}")
+
+
+def print_report(results: List[Dict[str, Any]]):
+    """Print the results as a table"""
+    header = f"{'file':<22} {'size KB':>9} {'conc':>5} {'base MB':>8} {'peak MB':>8} {'MB/req':>7} {'worker MB':>9} {'secs':>6} {'errors':>6}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['file']:<22} {row['size_kb']:>9} {row['concurrency']:>5} {row['baseline_mb']:>8} "
+            f"{row['peak_mb']:>8} {row['peak_per_request_mb']:>7} {row['render_worker_peak_mb']:>9} {row['seconds']:>6} {row['errors']:>6}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure peak RSS per upload")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--files", default="", help="Comma-separated test_data file names or paths (default all test files)")
+    parser.add_argument("--latency", default="fixed:0.2", help="Mock LLM latency, so concurrent requests overlap")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = asyncio.run(measure(Path(args.worker), int(args.concurrency), args.latency))
+        print(RESULT_PREFIX + json.dumps(result))
+        sys.exit(0)
+
+    names = [name.strip() for name in args.files.split(",") if name.strip()]
+    results = [
+        run_isolated(path, int(level), args.latency)
+        for level in args.concurrency.split(",")
+        for path in upload_files(names)
+    ]
+    print_report(results)
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2))
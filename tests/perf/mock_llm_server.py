@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub for benchmarking without spending quota
+
+Serves /v1/chat/completions with configurable latency, error rates and
+canned responses per image in tests/test_data. Images are matched with a
+perceptual hash, so resized or re-encoded uploads still resolve to the
+right canned response.
+
+    python tests/perf/mock_llm_server.py --port 9000 --latency lognormal:1.2,0.5 --error-rate 0.02
+    OPENAI_BASE_URL=http://localhost:9000/v1/chat/completions python main.py
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import math
+import random
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from PIL import Image
+
+PERF_DIR = Path(__file__).parent
+TEST_DATA_DIR = PERF_DIR.parent / "test_data"
+CANNED_RESPONSES_PATH = PERF_DIR / "canned_responses.json"
+
+
+def parse_latency(spec: str):
+    """
+    Build a latency sampler from a spec string
+
+    Supported specs: fixed:SECONDS, uniform:LOW,HIGH, normal:MEAN,STDDEV,
+    lognormal:MEDIAN,SIGMA
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def average_hash(image: Image.Image, size: int = 8) -> int:
+    """Perceptual hash that survives resizing and recompression"""
+    pixels = list(image.convert("L").resize((size, size), Image.BILINEAR).getdata())
+    mean = sum(pixels) / len(pixels)
+    bits = 0
+    for pixel in pixels:
+        bits = (bits << 1) | (1 if pixel >= mean else 0)
+    return bits
+
+
+class MockLLM:
+    """Canned-response vision model with injected latency and errors"""
+
+    MATCH_DISTANCE = 10  # Max differing hash bits for an image to match
+
+    def __init__(
+        self,
+        latency: str = "fixed:0.5",
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        stream_chunk_delay: float = 0.02
+    ):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.stream_chunk_delay = stream_chunk_delay
+        self.canned = json.loads(CANNED_RESPONSES_PATH.read_text())
+        self.fingerprints = self._fingerprint_test_data()
+        self.counters = {"requests": 0, "errors": 0, "rate_limited": 0, "matched": 0}
+
+    def _fingerprint_test_data(self) -> List[Tuple[int, str]]:
+        """Hash every decodable image in tests/test_data"""
+        fingerprints = []
+        for path in sorted(TEST_DATA_DIR.iterdir()):
+            try:
+                with Image.open(path) as image:
+                    fingerprints.append((average_hash(image), path.name))
+            except Exception:
+                continue
+        return fingerprints
+
+    def match(self, image_bytes: Optional[bytes]) -> Dict[str, Any]:
+        """Find the canned response for an uploaded image"""
+        if image_bytes:
+            try:
+                with Image.open(io.BytesIO(image_bytes)) as image:
+                    fingerprint = average_hash(image)
+                distance, name = min(
+                    (bin(fingerprint ^ known).count("1"), name)
+                    for known, name in self.fingerprints
+                )
+                if distance <= self.MATCH_DISTANCE and name in self.canned:
+                    self.counters["matched"] += 1
+                    return self.canned[name]
+            except Exception:
+                pass
+        return self.canned["default"]
+
+    def render(self, payload: Dict[str, Any]) -> str:
+        """Produce the assistant message the real model would return"""
+        prompt, image_bytes = self._unpack(payload)
+        canned = self.match(image_bytes)
+
+        # Classification prompts expect a single word
+        if payload.get("max_tokens", 0) <= 50 or "Only respond with" in prompt:
+            return canned["document_type"]
+
+        # Fused prompts expect the type alongside the fields
+        if '"document_type"' in prompt:
+            return json.dumps({"document_type": canned["document_type"], **canned["fields"]})
+
+        return json.dumps(canned["fields"])
+
+    @staticmethod
+    def _unpack(payload: Dict[str, Any]) -> Tuple[str, Optional[bytes]]:
+        """Pull the prompt text and decoded image out of a chat payload"""
+        texts = []
+        image_bytes = None
+        for message in payload.get("messages", []):
+            content = message.get("content", "")
+            if isinstance(content, str):
+                texts.append(content)
+                continue
+            for part in content:
+                if part.get("type") == "text":
+                    texts.append(part.get("text", ""))
+                elif part.get("type") == "image_url":
+                    url = part.get("image_url", {}).get("url", "")
+                    if "," in url:
+                        try:
+                            image_bytes = base64.b64decode(url.split(",", 1)[1])
+                        except ValueError:
+                            image_bytes = None
+        return "\n".join(texts), image_bytes
+
+
+def create_app(mock: MockLLM) -> FastAPI:
+    """Build the stub API around a MockLLM"""
+    app = FastAPI(title="Mock Vision LLM")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        mock.counters["requests"] += 1
+
+        await asyncio.sleep(mock.sample_latency())
+
+        if random.random() < mock.rate_limit_rate:
+            mock.counters["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limit reached", "type": "requests"}},
+                headers={"retry-after": "1", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1s"}
+            )
+        if random.random() < mock.error_rate:
+            mock.counters["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": {"message": "Injected failure"}})
+
+        content = mock.render(payload)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = payload.get("model", "mock")
+
+        if payload.get("stream"):
+            async def chunks():
+                for i in range(0, len(content), 12):
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": content[i:i + 12]}, "finish_reason": None}]
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(mock.stream_chunk_delay)
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(content) // 4, "total_tokens": len(content) // 4}
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return mock.counters
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible vision LLM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", default="lognormal:1.0,0.4", help="fixed:S | uniform:A,B | normal:M,SD | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    args = parser.parse_args()
+
+    mock = MockLLM(latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    uvicorn.run(create_app(mock), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,90 @@
+"""
+Unit tests for the result cache and cached pipeline
+"""
+
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+import json
+
+from processors.cache import ResultCache
+from processors.pipeline import DocumentPipeline
+from models import DocumentType
+from utils.executors import thread_executor
+
+
+class TestResultCache:
+    """Test suite for ResultCache"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create a cache backed by a temporary SQLite file"""
+        cache = ResultCache(db_path=str(tmp_path / "cache.db"), max_memory_entries=2)
+        yield cache
+        cache.close()
+
+    @pytest.mark.asyncio
+    async def test_miss_then_hit(self, cache):
+        """Test that a stored value is returned from memory"""
+        key = ResultCache.make_key(ResultCache.hash_content(b"abc"), "classify")
+
+        assert await cache.get(key) is None
+        await cache.set(key, "passport")
+        assert await cache.get(key) == "passport"
+
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_falls_back_to_disk(self, cache):
+        """Test that entries evicted from memory are served from SQLite, on the thread executor"""
+        completed = thread_executor.stats()["completed"]
+        await cache.set("a", 1)
+        await cache.set("b", 2)
+        await cache.set("c", 3)
+
+        assert cache.stats()["memory_entries"] == 2
+        assert await cache.get("a") == 1
+        assert cache.stats()["disk_hits"] == 1
+        # Three writes and one disk read show up in the executor stats
+        assert thread_executor.stats()["completed"] == completed + 4
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_are_ignored(self, tmp_path):
+        """Test TTL expiry in both tiers"""
+        cache = ResultCache(db_path=str(tmp_path / "cache.db"), ttl=-1)
+        await cache.set("a", 1)
+
+        assert await cache.get("a") is None
+        cache.close()
+
+
+class TestCachedPipeline:
+    """Test suite for DocumentPipeline caching"""
+
+    @pytest.mark.asyncio
+    async def test_repeat_extract_skips_llm(self, tmp_path, sample_passport_image):
+        """Test that a repeat upload is served without an LLM call"""
+        cache = ResultCache(db_path=str(tmp_path / "cache.db"))
+        pipeline = DocumentPipeline(cache=cache)
+        content_hash = ResultCache.hash_content(b"same upload")
+
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {
+                "choices": [{
+                    "message": {
+                        "content": json.dumps({"document_type": "passport", "full_name": "John Doe"})
+                    }
+                }]
+            }
+            mock_post.return_value = mock_response
+
+            first = await pipeline.extract(content_hash, sample_passport_image)
+            second = await pipeline.extract(content_hash, sample_passport_image)
+
+        assert first[0] == DocumentType.PASSPORT
+        assert second == first
+        assert mock_post.call_count == 1
+        cache.close()
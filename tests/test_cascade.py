@@ -0,0 +1,180 @@
+"""
+Unit tests for the cheap-model-first cascade
+"""
+
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+import json
+
+from config import config
+from processors.cascade import check_fields, check_schema, model_tiers
+from processors.classifier import DocumentClassifier
+from processors.extractor import FieldExtractor
+from processors.pipeline import DocumentPipeline
+from models import DocumentType
+
+
+def completion(content: str) -> Mock:
+    """Build a mocked chat completion response"""
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    return response
+
+
+@pytest.fixture(autouse=True)
+def enable_cascade(monkeypatch):
+    """Run these tests with the cascade on"""
+    monkeypatch.setattr(config, "LLM_CASCADE_ENABLED", True)
+    monkeypatch.setattr(config, "OPENAI_CHEAP_MODEL", "gpt-4o-mini")
+    monkeypatch.setattr(config, "OPENAI_MODEL", "gpt-4o")
+
+
+@pytest.fixture
+def passport_fields():
+    """Complete, consistent passport fields"""
+    return {
+        "full_name": "John Michael Smith",
+        "date_of_birth": "01/15/1990",
+        "country": "United States",
+        "issue_date": "03/20/2020",
+        "expiration_date": "03/20/2030",
+        "passport_number": "123456789"
+    }
+
+
+class TestValidation:
+    """Test suite for cascade validation checks"""
+
+    def test_model_tiers(self, monkeypatch):
+        """Test tier order and disabling the cascade"""
+        assert model_tiers() == ["gpt-4o-mini", "gpt-4o"]
+        monkeypatch.setattr(config, "LLM_CASCADE_ENABLED", False)
+        assert model_tiers() == ["gpt-4o"]
+
+    def test_schema(self):
+        """Test that nested or empty responses fail schema validation"""
+        assert check_schema({"full_name": "John"}) == []
+        assert check_schema({}) == ["schema:not_an_object"]
+        assert check_schema({"full_name": {"first": "John"}}) == ["schema:full_name"]
+
+    def test_complete_fields_pass(self, passport_fields):
+        """Test that complete, consistent fields are accepted"""
+        assert check_fields(passport_fields, DocumentType.PASSPORT) == []
+
+    def test_missing_required_field(self, passport_fields):
+        """Test that a missing required field is reported"""
+        passport_fields["passport_number"] = None
+        assert check_fields(passport_fields, DocumentType.PASSPORT) == ["missing:passport_number"]
+
+    def test_cross_field_sanity(self, passport_fields):
+        """Test date ordering and identifier format checks"""
+        passport_fields["expiration_date"] = "03/20/2019"
+        passport_fields["passport_number"] = "#?"
+        problems = check_fields(passport_fields, DocumentType.PASSPORT)
+        assert "sanity:expires_before_issued" in problems
+        assert "sanity:passport_number_format" in problems
+
+    def test_ead_category_format(self):
+        """Test EAD category code validation"""
+        fields = {
+            "full_name": "Jane Doe",
+            "date_of_birth": "05/10/1992",
+            "card_number": "SRC1234567890",
+            "category": "(c)(09)",
+            "card_expires_date": "05/10/2026"
+        }
+        assert check_fields(fields, DocumentType.EAD_CARD) == []
+        fields["category"] = "employment"
+        assert check_fields(fields, DocumentType.EAD_CARD) == ["sanity:category_format"]
+
+
+class TestCascade:
+    """Test suite for escalation between model tiers"""
+
+    @pytest.mark.asyncio
+    async def test_cheap_model_answer_accepted(self, sample_passport_image, passport_fields):
+        """Test that a valid cheap-model answer is not escalated"""
+        extractor = FieldExtractor()
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_post.return_value = completion(json.dumps(passport_fields))
+
+            fields, model = await extractor.extract_with_tier(sample_passport_image, DocumentType.PASSPORT)
+
+        assert model == "gpt-4o-mini"
+        assert fields["passport_number"] == "123456789"
+        assert mock_post.call_count == 1
+        assert mock_post.call_args.kwargs["json"]["model"] == "gpt-4o-mini"
+
+    @pytest.mark.asyncio
+    async def test_escalates_on_missing_fields(self, sample_passport_image, passport_fields):
+        """Test that an incomplete cheap answer is retried on the strong model"""
+        extractor = FieldExtractor()
+        incomplete = {"document_type": "passport", "full_name": "John Michael Smith"}
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_post.side_effect = [
+                completion(json.dumps(incomplete)),
+                completion(json.dumps({"document_type": "passport", **passport_fields}))
+            ]
+
+            document_type, fields, model = await extractor.classify_and_extract_with_tier(sample_passport_image)
+
+        assert document_type == DocumentType.PASSPORT
+        assert model == "gpt-4o"
+        assert fields["passport_number"] == "123456789"
+        assert [call.kwargs["json"]["model"] for call in mock_post.call_args_list] == ["gpt-4o-mini", "gpt-4o"]
+
+    @pytest.mark.asyncio
+    async def test_escalates_on_unparseable_response(self, sample_passport_image, passport_fields):
+        """Test that a response that is not JSON triggers escalation"""
+        extractor = FieldExtractor()
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_post.side_effect = [
+                completion("I cannot read this document."),
+                completion(json.dumps(passport_fields))
+            ]
+
+            fields, model = await extractor.extract_with_tier(sample_passport_image, DocumentType.PASSPORT)
+
+        assert model == "gpt-4o"
+        assert fields["full_name"] == "John Michael Smith"
+
+    @pytest.mark.asyncio
+    async def test_strong_answer_returned_even_if_incomplete(self, sample_passport_image):
+        """Test that the last tier's answer is used when nothing validates"""
+        extractor = FieldExtractor()
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_post.return_value = completion(json.dumps({"full_name": "John Smith"}))
+
+            fields, model = await extractor.extract_with_tier(sample_passport_image, DocumentType.PASSPORT)
+
+        assert model == "gpt-4o"
+        assert fields["full_name"] == "John Smith"
+        assert fields["passport_number"] is None
+
+    @pytest.mark.asyncio
+    async def test_classifier_escalates_unknown(self, sample_passport_image):
+        """Test that "unknown" from the cheap model is re-checked by the strong model"""
+        classifier = DocumentClassifier()
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_post.side_effect = [completion("unknown"), completion("driver_license")]
+
+            document_type, model = await classifier.classify_with_tier(sample_passport_image)
+
+        assert document_type == DocumentType.DRIVER_LICENSE
+        assert model == "gpt-4o"
+
+    @pytest.mark.asyncio
+    async def test_answering_tier_is_persisted(self, db_service, passport_fields):
+        """Test that the answering model is stored in the extraction history"""
+        pipeline = DocumentPipeline()
+        with open("tests/test_data/passport.jpg", "rb") as f:
+            content = f.read()
+
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_post.return_value = completion(json.dumps({"document_type": "passport", **passport_fields}))
+
+            _, _, document = await pipeline.process_upload("passport.jpg", "image/jpeg", content, db_service)
+
+        history = await db_service.history.get_document_history(document.id)
+        assert history[0].model_tier == "gpt-4o-mini"
@@ -0,0 +1,210 @@
+"""
+Unit tests for deterministic PDF417 and MRZ decoding
+"""
+
+import base64
+import io
+import json
+
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+from PIL import Image
+
+from config import config
+from processors.decoder import DocumentDecoder, mrz_check_digit, parse_aamva, parse_mrz
+from processors.extractor import FieldExtractor
+from processors.pipeline import DocumentPipeline
+from models import DocumentType
+
+
+# ICAO 9303 part 4 specimen
+TD3_MRZ = [
+    "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<",
+    "L898902C36UTO7408122F1204159ZE184226B<<<<<10"
+]
+
+# ICAO 9303 part 5 specimen
+TD1_MRZ = [
+    "I<UTOD231458907<<<<<<<<<<<<<<<",
+    "7408122F1204159UTO<<<<<<<<<<<6",
+    "ERIKSSON<<ANNA<MARIA<<<<<<<<<<"
+]
+
+AAMVA_DATA = (
+    "@\n\x1e\rANSI 636014080102DL00410279ZC03200024DL"
+    "DAQD1234562\n"
+    "DCSSAMPLE\n"
+    "DDEN\n"
+    "DACJOHN\n"
+    "DADQUINCY\n"
+    "DBD08312021\n"
+    "DBB01151990\n"
+    "DBA01152027\n"
+    "DBC1\n"
+    "DAG2570 24TH STREET\n"
+    "DAIANYTOWN\n"
+    "DAJCA\n"
+    "DAK958180000\n"
+    "DCGUSA\r"
+)
+
+
+def completion(content: str) -> Mock:
+    """Build a mocked chat completion response"""
+    response = Mock()
+    response.status_code = 200
+    response.json.return_value = {"choices": [{"message": {"content": content}}]}
+    return response
+
+
+class TestParsers:
+    """Test suite for the AAMVA and MRZ parsers"""
+
+    def test_check_digit(self):
+        """Test ICAO check digits from the specimen"""
+        assert mrz_check_digit("L898902C3") == "6"
+        assert mrz_check_digit("740812") == "2"
+        assert mrz_check_digit("<<<<<<<<<<<<<<") == "0"
+
+    def test_td3_passport(self):
+        """Test passport MRZ field mapping"""
+        document_type, fields = parse_mrz(TD3_MRZ)
+
+        assert document_type == DocumentType.PASSPORT
+        assert fields["passport_number"] == "L898902C3"
+        assert fields["date_of_birth"] == "08/12/1974"
+        assert fields["expiration_date"] == "04/15/2012"
+        assert fields["first_name"] == "ANNA MARIA"
+        assert fields["last_name"] == "ERIKSSON"
+
+    def test_td1_card(self):
+        """Test card MRZ field mapping"""
+        document_type, fields = parse_mrz(TD1_MRZ)
+
+        assert document_type == DocumentType.EAD_CARD
+        assert fields["card_number"] == "D23145890"
+        assert fields["date_of_birth"] == "08/12/1974"
+        assert fields["full_name"] == "ANNA MARIA ERIKSSON"
+
+    def test_bad_check_digit_rejected(self):
+        """Test that a misread MRZ fails the composite check and is rejected"""
+        lines = [TD3_MRZ[0], TD3_MRZ[1][:13] + "7408132F1204159ZE184226B<<<<<10"]
+
+        assert parse_mrz(lines) is None
+
+    def test_aamva(self):
+        """Test AAMVA element mapping"""
+        fields = parse_aamva(AAMVA_DATA)
+
+        assert fields == {
+            "license_number": "D1234562",
+            "last_name": "SAMPLE",
+            "first_name": "JOHN",
+            "date_of_birth": "01/15/1990",
+            "issue_date": "08/31/2021",
+            "expiration_date": "01/15/2027",
+            "full_name": "JOHN QUINCY SAMPLE",
+            "address": "2570 24TH STREET, ANYTOWN, CA 95818"
+        }
+
+    def test_non_aamva_barcode(self):
+        """Test that other PDF417 payloads are ignored"""
+        assert parse_aamva("BOARDING PASS M1DOE/JOHN") is None
+
+
+class TestDecoder:
+    """Test suite for image decoding"""
+
+    def test_pdf417_roundtrip(self):
+        """Test reading an AAMVA barcode from an image"""
+        zxingcpp = pytest.importorskip("zxingcpp")
+        if not hasattr(zxingcpp, "create_barcode"):
+            pytest.skip("zxing-cpp without barcode writer")
+        barcode = Image.fromarray(np.asarray(
+            zxingcpp.create_barcode(AAMVA_DATA, zxingcpp.BarcodeFormat.PDF417).to_image(scale=2)
+        ))
+        image = Image.new("L", (barcode.width + 80, barcode.height + 80), 255)
+        image.paste(barcode, (40, 40))
+
+        document_type, fields = DocumentDecoder().decode_image(image)
+
+        assert document_type == DocumentType.DRIVER_LICENSE
+        assert fields["license_number"] == "D1234562"
+
+    def test_nothing_decoded(self):
+        """Test that an image without barcode or MRZ yields None"""
+        with patch.object(DocumentDecoder, "_read_pdf417", return_value=None), \
+             patch.object(DocumentDecoder, "_read_mrz", return_value=None):
+            assert DocumentDecoder().decode_image(Image.new("L", (200, 100), 255)) is None
+
+
+class TestPipelineDecoding:
+    """Test suite for the decoding stage ahead of the LLM"""
+
+    @pytest.fixture(autouse=True)
+    def enable_decoding(self, monkeypatch):
+        monkeypatch.setattr(config, "DETERMINISTIC_DECODING_ENABLED", True)
+
+    @pytest.fixture
+    def image_base64(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (100, 60), "white").save(buffer, format="JPEG")
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    @pytest.mark.asyncio
+    async def test_complete_barcode_skips_llm(self, image_base64):
+        """Test that a fully decoded license makes no LLM call"""
+        pipeline = DocumentPipeline()
+        decoded = (DocumentType.DRIVER_LICENSE, parse_aamva(AAMVA_DATA))
+        with patch.object(DocumentDecoder, "decode", new_callable=AsyncMock, return_value=decoded), \
+             patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            document_type, fields, model_tier = await pipeline.extract("hash-dl", image_base64)
+
+        assert document_type == DocumentType.DRIVER_LICENSE
+        assert model_tier == "decoder"
+        assert fields["address"] == "2570 24TH STREET, ANYTOWN, CA 95818"
+        assert fields["first_name"] == "John"
+        mock_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_llm_asked_only_for_missing_fields(self, image_base64):
+        """Test that the LLM fills only what the MRZ does not carry"""
+        pipeline = DocumentPipeline()
+        decoded = parse_mrz(TD3_MRZ)
+        with patch.object(DocumentDecoder, "decode", new_callable=AsyncMock, return_value=decoded), \
+             patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_post.return_value = completion(json.dumps({
+                "country": "Utopia",
+                "issue_date": "04/16/2002",
+                "passport_number": "WRONG"
+            }))
+
+            document_type, fields, model_tier = await pipeline.extract("hash-passport", image_base64)
+
+        prompt = mock_post.call_args.kwargs["json"]["messages"][-1]["content"][0]["text"]
+        assert mock_post.call_count == 1
+        assert "- issue_date:" in prompt
+        assert "- passport_number:" not in prompt
+        assert model_tier == "decoder+gpt-4o"
+        assert document_type == DocumentType.PASSPORT
+        assert fields["passport_number"] == "L898902C3"
+        assert fields["issue_date"] == "04/16/2002"
+        assert fields["country"] == "utopia"
+
+    @pytest.mark.asyncio
+    async def test_decoder_reads_full_resolution(self, db_service):
+        """Test that the barcode/MRZ decoder gets the full-size image while the LLM gets the downscaled one"""
+        buffer = io.BytesIO()
+        Image.new("RGB", (3000, 2000), "white").save(buffer, format="JPEG")
+        content = buffer.getvalue()
+        decoded = (DocumentType.DRIVER_LICENSE, parse_aamva(AAMVA_DATA))
+
+        with patch.object(DocumentDecoder, "decode", new_callable=AsyncMock, return_value=decoded) as decode, \
+             patch.object(FieldExtractor, "extract_with_tier", new_callable=AsyncMock, return_value=({}, None)) as extract:
+            await DocumentPipeline().process_upload("dl.jpg", "image/jpeg", content, db_service)
+
+        source = Image.open(io.BytesIO(base64.b64decode(decode.await_args.args[0])))
+        llm_image = Image.open(io.BytesIO(base64.b64decode(extract.await_args.args[0])))
+        assert source.size == (3000, 2000)
+        assert max(llm_image.size) < 3000
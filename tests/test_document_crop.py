@@ -0,0 +1,91 @@
+"""
+Unit tests for document region detection and cropping
+"""
+
+import base64
+import io
+import random
+
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+from config import config
+from utils.document_crop import crop_to_document, find_document_quad
+from utils.image_utils import encode_for_llm, fit_token_budget, image_token_cost
+
+
+TEST_DATA = "tests/test_data"
+
+
+def card_on_table(angle: float = 6.0) -> Image.Image:
+    """ID-1 card with text lines, slightly rotated on a textured dark background"""
+    card = Image.new("RGB", (856, 540), (236, 240, 245))
+    draw = ImageDraw.Draw(card)
+    draw.rectangle([40, 120, 260, 420], fill=(120, 140, 170))
+    for row in range(8):
+        draw.rectangle([300, 130 + row * 40, 300 + 60 * (row % 4 + 5), 146 + row * 40], fill=(40, 40, 60))
+    card = card.rotate(angle, expand=True, fillcolor=(0, 0, 0))
+    mask = Image.new("L", (856, 540), 255).rotate(angle, expand=True)
+
+    rng = random.Random(3)
+    table = Image.new("RGB", (1600, 1200), (92, 64, 40))
+    draw = ImageDraw.Draw(table)
+    for _ in range(400):
+        x, y = rng.randrange(1600), rng.randrange(1200)
+        shade = rng.randrange(-12, 12)
+        draw.line([x, y, x + rng.randrange(40, 200), y], fill=(92 + shade, 64 + shade, 40 + shade), width=3)
+    table = table.filter(ImageFilter.GaussianBlur(1))
+    table.paste(card, (400, 300), mask)
+    return table
+
+
+class TestDocumentCrop:
+    """Test suite for document quadrilateral detection"""
+
+    def test_card_on_table(self):
+        """Test that a tilted card is found and deskewed to its own aspect ratio"""
+        cropped = crop_to_document(card_on_table())
+
+        assert cropped is not None
+        assert cropped.width / cropped.height == pytest.approx(856 / 540, rel=0.06)
+        assert 856 * 0.95 < cropped.width < 856 * 1.1
+
+    def test_passport_photo(self):
+        """Test that the passport photographed on a bedspread is cropped to the booklet"""
+        image = Image.open(f"{TEST_DATA}/passport.jpg")
+
+        cropped = crop_to_document(image)
+
+        assert cropped is not None
+        assert cropped.width * cropped.height < 0.6 * image.width * image.height
+        assert cropped.height > cropped.width
+
+    @pytest.mark.parametrize("name", ["data18.jpg.webp", "ead_card.png", "data2.png", "data14.png"])
+    def test_tight_scans_are_left_alone(self, name):
+        """Test that images already cropped to the document are not cut further"""
+        assert find_document_quad(Image.open(f"{TEST_DATA}/{name}")) is None
+
+    def test_llm_image_is_cropped(self, monkeypatch):
+        """Test that the LLM image is cropped only when cropping is enabled"""
+        buffer = io.BytesIO()
+        card_on_table().save(buffer, format="JPEG")
+
+        cropped = Image.open(io.BytesIO(base64.b64decode(encode_for_llm(buffer.getvalue()))))
+        monkeypatch.setattr(config, "DOCUMENT_CROP_ENABLED", False)
+        full = Image.open(io.BytesIO(base64.b64decode(encode_for_llm(buffer.getvalue()))))
+
+        assert cropped.width / cropped.height == pytest.approx(856 / 540, rel=0.06)
+        assert full.width / full.height == pytest.approx(1600 / 1200, rel=0.01)
+
+    def test_crop_keeps_resolution_within_budget(self):
+        """Test that a document in a large photo is cropped from a full decode, then fitted"""
+        buffer = io.BytesIO()
+        card_on_table().resize((4096, 3072), Image.BICUBIC).save(buffer, format="JPEG")
+
+        cropped = Image.open(io.BytesIO(base64.b64decode(encode_for_llm(buffer.getvalue()))))
+
+        # The frame's budget decodes it at 1024x768, where the card is only ~550px wide
+        card_width = round(856 * 4096 / 1600)
+        expected = fit_token_budget(card_width, round(card_width * 540 / 856))
+        assert cropped.width == pytest.approx(expected[0], rel=0.1)
+        assert image_token_cost(*cropped.size) <= config.LLM_IMAGE_MAX_TOKENS
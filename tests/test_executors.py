@@ -0,0 +1,95 @@
+"""
+Unit tests for the CPU offload executors
+"""
+
+import asyncio
+import io
+import time
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from utils.executors import OffloadExecutor
+from utils.image_utils import UploadBuffer, render_llm_image
+
+
+def jpeg(size) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "gray").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class TestOffloadExecutor:
+    """Test suite for thread/process offloading and queue metrics"""
+
+    @pytest.mark.asyncio
+    async def test_queue_depth_and_wait_time(self):
+        """Test that tasks beyond the worker count queue and their wait is recorded"""
+        executor = OffloadExecutor("test", "thread", max_workers=1)
+        tasks = [asyncio.ensure_future(executor.run(time.sleep, 0.05)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+
+        assert executor.queue_depth() == 2
+        await asyncio.gather(*tasks)
+
+        stats = executor.stats()
+        assert stats["completed"] == 3
+        assert stats["queue_depth"] == 0
+        assert stats["wait"]["max_ms"] >= 80  # The last task waited for two others
+        assert stats["run"]["avg_ms"] >= 40
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive(self):
+        """Test that the loop keeps running while a blocking task is offloaded"""
+        executor = OffloadExecutor("test", "thread", max_workers=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.ensure_future(ticker())
+        await executor.run(time.sleep, 0.2)
+        ticking.cancel()
+
+        assert ticks >= 5
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_failures_counted(self):
+        """Test that exceptions reach the caller and are counted"""
+        executor = OffloadExecutor("test", "inline", max_workers=1)
+
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(divmod, 1, 0)
+
+        assert executor.stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_process_pool_renders(self):
+        """Test that rendering runs in a worker process with the same result"""
+        executor = OffloadExecutor("test", "process", max_workers=1)
+        content = jpeg((3000, 2000))
+        try:
+            rendered = await executor.run(render_llm_image, content, "image/jpeg")
+
+            assert rendered == render_llm_image(content, "image/jpeg")
+            with pytest.raises(HTTPException):
+                await executor.run(render_llm_image, b"%PDF-1.4 broken", "application/pdf")
+            assert executor.stats()["pool_restarts"] == 0
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_upload_prepare_matches_sync(self):
+        """Test that the offloaded upload encodings equal the synchronous ones"""
+        for content in [jpeg((3000, 2000)), jpeg((640, 480))]:
+            offloaded, inline = UploadBuffer(content, "image/jpeg"), UploadBuffer(content, "image/jpeg")
+
+            assert await offloaded.prepare() == inline.llm_image()
+            assert offloaded.content_hash == inline.content_hash
+            assert await offloaded.previews() == inline.render_previews()
@@ -199,4 +199,48 @@ class TestFieldExtractor:
             
             result = await extractor.extract(sample_passport_image, DocumentType.PASSPORT)
             
-            assert result == {}
\ No newline at end of file
+            assert result == {}
+    
+    @pytest.mark.asyncio
+    async def test_classify_and_extract_fused(self, extractor, sample_passport_image, passport_fields):
+        """Test fused classification and extraction in a single call"""
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {
+                "choices": [{
+                    "message": {
+                        "content": json.dumps({"document_type": "passport", **passport_fields, "license_number": "X1"})
+                    }
+                }]
+            }
+            mock_post.return_value = mock_response
+            
+            document_type, result = await extractor.classify_and_extract(sample_passport_image)
+            
+            assert document_type == DocumentType.PASSPORT
+            assert result["full_name"] == "John Michael Smith"
+            assert result["date_of_birth"] == "01/15/1990"
+            assert "document_type" not in result
+            assert "license_number" not in result
+            mock_post.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_classify_and_extract_unknown(self, extractor, sample_passport_image):
+        """Test fused call when the document type is unknown"""
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {
+                "choices": [{
+                    "message": {
+                        "content": json.dumps({"document_type": "unknown"})
+                    }
+                }]
+            }
+            mock_post.return_value = mock_response
+            
+            document_type, result = await extractor.classify_and_extract(sample_passport_image)
+            
+            assert document_type == DocumentType.UNKNOWN
+            assert result == {}
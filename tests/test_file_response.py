@@ -0,0 +1,146 @@
+"""
+Tests for serving stored files with ETags, Range requests and caching
+"""
+
+import io
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from PIL import Image
+
+import main
+from database.models import get_db
+from utils.file_response import FileRangeResponse, detect_media_type, etag_matches, parse_range
+from utils.storage import storage_key
+
+
+@pytest_asyncio.fixture
+async def client(test_db, temp_storage, monkeypatch):
+    """API client on the test database and temporary storage"""
+    monkeypatch.setattr(main, "storage", temp_storage)
+
+    async def override_db():
+        yield test_db
+
+    main.app.dependency_overrides[get_db] = override_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        yield client
+    main.app.dependency_overrides.clear()
+
+
+@pytest_asyncio.fixture
+async def stored_webp(db_service, temp_storage):
+    """A document whose stored upload is a WebP image; returns (image URL, content hash, bytes)"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 200), "gray").save(buffer, format="WEBP")
+    content = buffer.getvalue()
+    content_hash = await temp_storage.put_bytes(content)
+    await db_service.files.add_reference(content_hash, len(content))
+    document = await db_service.process_extraction_result(
+        "scan.webp", "passport", {}, file_path=storage_key(content_hash)
+    )
+    return f"/documents/{document.id}/image", content_hash, content
+
+
+class TestStoredFileServing:
+    """Test suite for /documents/{id}/image"""
+
+    @pytest.mark.asyncio
+    async def test_full_response_is_cacheable(self, client, stored_webp):
+        """Test that the file is sent with its sniffed type, a strong ETag and immutable caching"""
+        url, content_hash, content = stored_webp
+
+        response = await client.get(url)
+
+        assert response.status_code == 200
+        assert response.content == content
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["content-length"] == str(len(content))
+        assert response.headers["etag"] == f'"{content_hash}"'
+        assert response.headers["accept-ranges"] == "bytes"
+        assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+
+    @pytest.mark.asyncio
+    async def test_if_none_match_not_modified(self, client, stored_webp):
+        """Test that a revalidation with the current ETag costs a 304 and no body"""
+        url, content_hash, _ = stored_webp
+
+        response = await client.get(url, headers={"If-None-Match": f'W/"other", "{content_hash}"'})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == f'"{content_hash}"'
+
+    @pytest.mark.asyncio
+    async def test_range_requests(self, client, stored_webp):
+        """Test byte, suffix, stale If-Range and unsatisfiable ranges"""
+        url, content_hash, content = stored_webp
+        size = len(content)
+
+        response = await client.get(url, headers={"Range": "bytes=0-9"})
+        assert response.status_code == 206
+        assert response.content == content[:10]
+        assert response.headers["content-range"] == f"bytes 0-9/{size}"
+
+        response = await client.get(url, headers={"Range": "bytes=-5"})
+        assert response.content == content[-5:]
+
+        response = await client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        assert response.status_code == 200
+        assert response.content == content
+
+        response = await client.get(url, headers={"Range": f"bytes={size}-"})
+        assert response.status_code == 416
+        assert response.headers["content-range"] == f"bytes */{size}"
+
+    @pytest.mark.asyncio
+    async def test_missing_file_not_found(self, client, stored_webp, temp_storage):
+        """Test that a document whose file is gone answers 404"""
+        url, content_hash, _ = stored_webp
+        await temp_storage.delete(content_hash)
+
+        assert (await client.get(url)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_sendfile_used_when_offered(tmp_path):
+    """Test that a range is handed to the server's zerocopysend extension instead of being read"""
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"%PDF-1.4 0123456789")
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "extensions": {"http.response.zerocopysend": {}}}
+    await FileRangeResponse(path, 9, 4, 206, media_type="application/pdf")(scope, None, send)
+
+    assert sent[0]["status"] == 206
+    assert (sent[1]["type"], sent[1]["offset"], sent[1]["count"]) == ("http.response.zerocopysend", 9, 4)
+    assert sent[1]["file"].closed
+
+
+def test_detect_media_type():
+    """Test magic byte detection of served image types"""
+    assert detect_media_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert detect_media_type(b"RIFF\x10\0\0\0WEBPVP8 ") == "image/webp"
+    assert detect_media_type(b"\0\0\0\x1cftypavif\0\0") == "image/avif"
+    assert detect_media_type(b"%PDF-1.7") == "application/pdf"
+    assert detect_media_type(b"<html>") == "application/octet-stream"
+
+
+def test_parse_range():
+    """Test Range header parsing; unsupported forms fall back to the whole file"""
+    assert parse_range("bytes=100-", 1000) == (100, 999)
+    assert parse_range("bytes=100-5000", 1000) == (100, 999)
+    assert parse_range("bytes=-2000", 1000) == (0, 999)
+    assert parse_range("bytes=0-1,5-6", 1000) is None
+    assert parse_range("bytes=9-3", 1000) is None
+    assert parse_range("items=0-1", 1000) is None
+    with pytest.raises(HTTPException) as error:
+        parse_range("bytes=-0", 1000)
+    assert error.value.status_code == 416
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
@@ -0,0 +1,170 @@
+"""
+Unit tests for LLM image preprocessing
+"""
+
+import base64
+import io
+
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+from PIL import Image
+
+from config import config
+from processors.cache import ResultCache
+from processors.classifier import DocumentClassifier
+from utils.executors import render_executor
+from utils.image_utils import UploadBuffer, encode_for_llm, fit_token_budget, image_mime_type, image_token_cost
+
+
+def encoded(image: Image.Image, format: str, **params) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+def decoded(image_base64: str) -> Image.Image:
+    return Image.open(io.BytesIO(base64.b64decode(image_base64)))
+
+
+class TestTokenBudget:
+    """Test suite for the image-token cost formula"""
+
+    def test_cost_formula(self):
+        """Test the provider's high and low detail costs"""
+        assert image_token_cost(4032, 3024) == 765  # Scaled to 1024x768: 2x2 tiles
+        assert image_token_cost(512, 512) == 255
+        assert image_token_cost(4032, 3024, detail="low") == 85
+
+    @pytest.mark.parametrize("size", [(4032, 3024), (3000, 3000), (600, 4000), (1242, 796)])
+    @pytest.mark.parametrize("budget", [255, 765, 1105])
+    def test_fit_within_budget(self, size, budget):
+        """Test that the fitted size costs no more than the budget and keeps the aspect ratio"""
+        width, height = fit_token_budget(*size, max_tokens=budget)
+
+        assert image_token_cost(width, height) <= budget
+        assert abs(width / height - size[0] / size[1]) < 0.02
+
+    def test_no_upscaling(self):
+        """Test that small images keep their size"""
+        assert fit_token_budget(300, 200) == (300, 200)
+
+
+class TestEncodeForLLM:
+    """Test suite for downscaling and re-encoding uploads"""
+
+    def test_large_photo_downscaled(self):
+        """Test that a phone-sized JPEG is reduced to the budgeted size"""
+        content = encoded(Image.new("RGB", (4032, 3024), "gray"), "JPEG")
+
+        image = decoded(encode_for_llm(content, max_tokens=765))
+
+        assert image.size == (1024, 768)
+        assert image.format == "JPEG"
+
+    def test_small_jpeg_passed_through(self):
+        """Test that a JPEG within budget is sent unchanged"""
+        content = encoded(Image.new("RGB", (640, 480), "gray"), "JPEG")
+
+        assert base64.b64decode(encode_for_llm(content)) == content
+
+    def test_png_reencoded_as_jpeg(self):
+        """Test that transparent PNGs are flattened and labelled correctly"""
+        content = encoded(Image.new("RGBA", (400, 300), (0, 0, 0, 0)), "PNG")
+
+        image_base64 = encode_for_llm(content)
+
+        assert image_mime_type(image_base64) == "image/jpeg"
+        assert decoded(image_base64).getpixel((10, 10)) == (255, 255, 255)
+
+    def test_exif_orientation_applied(self):
+        """Test that a rotated phone photo is upright after re-encoding"""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotate 90 degrees clockwise
+        content = encoded(Image.new("RGB", (4000, 2000), "gray"), "JPEG", exif=exif)
+
+        image = decoded(encode_for_llm(content, max_tokens=765))
+
+        assert image.size == (512, 1024)
+
+
+class TestPayloadImage:
+    """Test suite for the image part of LLM requests"""
+
+    def test_mime_type_sniffing(self, sample_passport_image):
+        """Test that PNG data is no longer labelled as JPEG"""
+        assert image_mime_type(sample_passport_image) == "image/png"
+        assert image_mime_type(base64.b64encode(encoded(Image.new("RGB", (8, 8)), "JPEG")).decode()) == "image/jpeg"
+
+    @pytest.mark.asyncio
+    async def test_classification_uses_low_detail(self, sample_passport_image):
+        """Test that classification requests ask for low detail"""
+        classifier = DocumentClassifier()
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            response = Mock()
+            response.status_code = 200
+            response.json.return_value = {"choices": [{"message": {"content": "passport"}}]}
+            mock_post.return_value = response
+
+            await classifier.classify(sample_passport_image)
+
+        image_url = mock_post.call_args.kwargs["json"]["messages"][-1]["content"][-1]["image_url"]
+        assert image_url["detail"] == "low"
+        assert image_url["url"].startswith("data:image/png;base64,")
+
+
+class TestUploadBuffer:
+    """Test suite for the single-buffer upload and its shared encodings"""
+
+    def test_llm_image_built_once(self):
+        """Test that the LLM image and hash are computed once and cached"""
+        content = encoded(Image.new("RGB", (4032, 3024), "gray"), "JPEG")
+        upload = UploadBuffer(content, "image/jpeg")
+
+        assert upload.llm_image() is upload.llm_image()
+        assert upload.content_hash == ResultCache.hash_content(content)
+
+    @pytest.mark.asyncio
+    async def test_prepare_sends_upload_to_renderer_once(self, monkeypatch):
+        """Test that the LLM image, source image and previews come from one render executor call"""
+        content = encoded(Image.new("RGB", (1600, 1200), "gray"), "JPEG")
+        upload = UploadBuffer(content, "image/jpeg")
+        calls = []
+        run = render_executor.run
+
+        async def counting_run(fn, *args):
+            calls.append(fn.__name__)
+            return await run(fn, *args)
+
+        monkeypatch.setattr(render_executor, "run", counting_run)
+
+        await upload.prepare(source=True, previews=True)
+        source = await upload.prepare_source()
+        previews = await upload.previews()
+
+        assert calls == ["render_upload"]
+        assert source == upload.source_image()
+        assert set(previews) == {"thumbnail", "preview"}
+
+    def test_previews_fit_sizes(self):
+        """Test that each preview rendition fits its size, keeping the aspect ratio"""
+        content = encoded(Image.new("RGB", (3000, 1500), "gray"), "JPEG")
+
+        previews = UploadBuffer(content, "image/jpeg").render_previews()
+
+        assert set(previews) == {"thumbnail", "preview"}
+        for name, side in [("thumbnail", 256), ("preview", 1024)]:
+            image_bytes, mime_type = previews[name]
+            assert mime_type == "image/webp"
+            assert Image.open(io.BytesIO(image_bytes)).size == (side, side // 2)
+
+    def test_small_image_previews_not_enlarged(self, monkeypatch):
+        """Test that a small transparent image is flattened, kept at its size and can be JPEG"""
+        monkeypatch.setattr(config, "PREVIEW_FORMAT", "JPEG")
+        content = encoded(Image.new("RGBA", (200, 120), (0, 0, 0, 0)), "PNG")
+
+        image_bytes, mime_type = UploadBuffer(content, "image/png").render_previews()["thumbnail"]
+
+        thumbnail = Image.open(io.BytesIO(image_bytes))
+        assert mime_type == "image/jpeg"
+        assert (thumbnail.format, thumbnail.size) == ("JPEG", (200, 120))
+        assert thumbnail.getpixel((0, 0)) == (255, 255, 255)
@@ -0,0 +1,132 @@
+"""
+Unit tests for the durable job queue
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+import worker
+from config import config
+from utils.storage import release_file, storage_key
+
+
+class TestJobRepository:
+    """Test suite for JobRepository"""
+
+    @pytest.mark.asyncio
+    async def test_claim_and_complete(self, db_service):
+        """Test that a queued job is claimed with a lease and completed"""
+        job = await db_service.jobs.create_job("passport.jpg", "uploads/passport.jpg", "image/jpeg")
+
+        claimed = await db_service.jobs.claim_job("worker-1", lease_seconds=60)
+
+        assert claimed.id == job.id
+        assert claimed.status == "running"
+        assert claimed.lease_owner == "worker-1"
+        assert claimed.attempts == 1
+
+        assert await db_service.jobs.complete_job(job.id, "worker-1", None, {"document_type": "passport"})
+        finished = await db_service.jobs.get_job(job.id)
+        await db_service.session.refresh(finished)
+        assert finished.status == "succeeded"
+        assert finished.result == {"document_type": "passport"}
+
+    @pytest.mark.asyncio
+    async def test_leased_job_is_not_claimed_twice(self, db_service):
+        """Test that a running job with a live lease is skipped"""
+        await db_service.jobs.create_job("a.jpg", "uploads/a.jpg", "image/jpeg")
+
+        assert await db_service.jobs.claim_job("worker-1", lease_seconds=60) is not None
+        assert await db_service.jobs.claim_job("worker-2", lease_seconds=60) is None
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_is_reclaimed(self, db_service):
+        """Test that a job abandoned by a dead worker is picked up again"""
+        job = await db_service.jobs.create_job("a.jpg", "uploads/a.jpg", "image/jpeg")
+        claimed = await db_service.jobs.claim_job("worker-1", lease_seconds=60)
+        claimed.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        await db_service.session.commit()
+
+        reclaimed = await db_service.jobs.claim_job("worker-2", lease_seconds=60)
+        await db_service.session.refresh(reclaimed)
+
+        assert reclaimed.id == job.id
+        assert reclaimed.lease_owner == "worker-2"
+        assert reclaimed.attempts == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_job_is_requeued_until_attempts_exhausted(self, db_service):
+        """Test retry bookkeeping on failure"""
+        job = await db_service.jobs.create_job("a.jpg", "uploads/a.jpg", "image/jpeg", max_attempts=2)
+
+        await db_service.jobs.claim_job("worker-1", lease_seconds=60)
+        await db_service.jobs.fail_job(job.id, "worker-1", "boom")
+        assert (await db_service.jobs.get_job(job.id)).status == "queued"
+
+        await db_service.jobs.claim_job("worker-1", lease_seconds=60)
+        await db_service.jobs.fail_job(job.id, "worker-1", "boom")
+        failed = await db_service.jobs.get_job(job.id)
+        assert failed.status == "failed"
+        assert failed.error_message == "boom"
+        assert await db_service.jobs.claim_job("worker-1", lease_seconds=60) is None
+
+    @pytest.mark.asyncio
+    async def test_expired_final_attempt_releases_upload(self, db_service, temp_storage):
+        """Test that a job whose worker died on its last attempt fails and drops its upload reference"""
+        content_hash = await temp_storage.put_bytes(b"scan")
+        await db_service.files.add_reference(content_hash, 4)
+        await db_service.files.add_reference(content_hash, 4)
+        job = await db_service.jobs.create_job("a.jpg", storage_key(content_hash), "image/jpeg", max_attempts=1)
+        claimed = await db_service.jobs.claim_job("worker-1", lease_seconds=60)
+        claimed.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+        await db_service.session.commit()
+
+        release = lambda file_path: release_file(file_path, db_service)
+        assert await db_service.jobs.fail_expired_jobs(release) == 1
+        assert await db_service.jobs.fail_expired_jobs(release) == 0
+
+        failed = await db_service.jobs.get_job(job.id)
+        await db_service.session.refresh(failed)
+        assert (failed.status, failed.error_message) == ("failed", "Lease expired on final attempt")
+        assert (await db_service.files.get_stored_file(content_hash)).ref_count == 1
+        assert await db_service.jobs.claim_job("worker-2", lease_seconds=60) is None
+
+
+class TestWorkerLease:
+    """Test suite for lease renewal in the worker"""
+
+    @pytest.mark.asyncio
+    async def test_lost_lease_abandons_job(self, db_service, monkeypatch):
+        """Test that a worker whose job was reclaimed stops before persisting a document"""
+        job = await db_service.jobs.create_job("a.jpg", "uploads/a.jpg", "image/jpeg")
+        claimed = await db_service.jobs.claim_job("worker-1", lease_seconds=60)
+
+        @asynccontextmanager
+        async def session():
+            yield db_service.session
+
+        async def read_stored(file_path):
+            return b"content"
+
+        persisted = []
+
+        class SlowPipeline:
+            async def process_upload(self, **kwargs):
+                # Another worker takes the job over while this one is still extracting
+                claimed.lease_owner = "worker-2"
+                await db_service.session.commit()
+                await asyncio.sleep(10)
+                persisted.append(kwargs["file_name"])
+
+        monkeypatch.setattr(worker, "get_async_session", lambda: session)
+        monkeypatch.setattr(worker, "read_stored", read_stored)
+        monkeypatch.setattr(config, "JOB_LEASE_SECONDS", 0.03)
+
+        await asyncio.wait_for(worker.process_job(SlowPipeline(), claimed, "worker-1"), timeout=2)
+
+        assert persisted == []
+        current = await db_service.jobs.get_job(job.id)
+        assert (current.status, current.lease_owner) == ("running", "worker-2")
@@ -0,0 +1,69 @@
+"""
+Unit tests for incremental JSON parsing and streamed extraction
+"""
+
+import pytest
+import json
+import httpx
+
+from utils.json_stream import IncrementalJSONParser
+from processors.extractor import FieldExtractor
+from processors.llm_client import LLMClient
+from models import DocumentType
+
+
+class TestIncrementalJSONParser:
+    """Test suite for IncrementalJSONParser"""
+
+    def test_members_emitted_as_they_complete(self):
+        """Test that each field is available as soon as its value ends"""
+        parser = IncrementalJSONParser()
+
+        assert parser.feed('```json\n{"full_name": "Jo') == []
+        assert parser.feed('hn Doe", "date') == [("full_name", "John Doe")]
+        assert parser.feed('_of_birth": null}\n```') == [("date_of_birth", None)]
+        assert parser.finished
+
+    def test_separators_inside_strings_and_nested_values(self):
+        """Test that commas and braces inside strings or nested values are not split"""
+        parser = IncrementalJSONParser()
+        text = '{"address": "1 Main St, {Apt 2}", "meta": {"a": [1, 2]}, "n": 3}'
+
+        pairs = []
+        for char in text:
+            pairs.extend(parser.feed(char))
+
+        assert pairs == [("address", "1 Main St, {Apt 2}"), ("meta", {"a": [1, 2]}), ("n", 3)]
+
+
+class TestExtractStream:
+    """Test suite for FieldExtractor.extract_stream"""
+
+    @pytest.mark.asyncio
+    async def test_fused_stream_events(self, sample_passport_image):
+        """Test classified, field and extracted events from a streamed response"""
+        content = json.dumps({
+            "document_type": "passport",
+            "full_name": "John Smith",
+            "date_of_birth": "15/01/1990"
+        })
+
+        def handler(request):
+            body = "".join(
+                f"data: {json.dumps({'choices': [{'delta': {'content': content[i:i + 5]}}]})}\n\n"
+                for i in range(0, len(content), 5)
+            ) + "data: [DONE]\n\n"
+            return httpx.Response(200, text=body)
+
+        client = LLMClient()
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        extractor = FieldExtractor(llm_client=client)
+
+        events = [event async for event in extractor.extract_stream(sample_passport_image)]
+
+        assert events[0] == {"event": "classified", "document_type": "passport"}
+        assert [event["name"] for event in events if event["event"] == "field"] == ["full_name", "date_of_birth"]
+        assert events[-1]["event"] == "extracted"
+        assert events[-1]["fields"]["date_of_birth"] == "01/15/1990"
+        assert events[-1]["fields"]["last_name"] == "Smith"
+        await client.aclose()
@@ -0,0 +1,109 @@
+"""
+Unit tests for the shared LLM client
+"""
+
+import httpx
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+
+from processors.llm_client import LLMClient
+from processors.resilience import CircuitBreaker
+from processors.classifier import DocumentClassifier
+from processors.extractor import FieldExtractor
+
+
+class TestLLMClient:
+    """Test suite for LLMClient"""
+
+    @pytest.mark.asyncio
+    async def test_client_is_reused_across_calls(self):
+        """Test that the pooled HTTP client is created once"""
+        client = LLMClient()
+        first = client.client
+        second = client.client
+
+        assert first is second
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_client_recreated_after_close(self):
+        """Test that a closed pool is reopened on next use"""
+        client = LLMClient()
+        first = client.client
+        await client.aclose()
+
+        assert client.client is not first
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_processors_share_one_transport(self):
+        """Test that classifier and extractor send through the same client"""
+        client = LLMClient()
+        classifier = DocumentClassifier(llm_client=client)
+        extractor = FieldExtractor(llm_client=client)
+
+        assert classifier.llm is extractor.llm
+
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {"choices": [{"message": {"content": "passport"}}]}
+            mock_post.return_value = mock_response
+
+            await classifier.classify("abc")
+            await classifier.classify("abc")
+
+            assert mock_post.call_count == 2
+
+        await client.aclose()
+
+
+def half_open_client(handler) -> LLMClient:
+    """Client sending to a mock transport, with the extract breaker due for a half-open probe"""
+    client = LLMClient()
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    breaker = client.resilience.policy("extract").breaker
+    breaker.state = CircuitBreaker.OPEN
+    breaker.opened_at = -breaker.reset_timeout
+    return client
+
+
+class TestLLMStream:
+    """Test suite for LLMClient.stream and the circuit breaker"""
+
+    @pytest.mark.asyncio
+    async def test_connect_error_reopens_breaker(self):
+        """Test that a probe failing before any response counts as a failure"""
+        def handler(request):
+            raise httpx.ConnectError("connection refused")
+
+        client = half_open_client(handler)
+
+        with pytest.raises(httpx.ConnectError):
+            async for _ in client.stream({"messages": []}, "extract"):
+                pass
+
+        assert client.resilience.policy("extract").breaker.state == CircuitBreaker.OPEN
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_abandoned_stream_releases_probe(self):
+        """Test that a consumer leaving mid-stream doesn't keep the breaker half-open"""
+        chunks = [b'data: {"choices": [{"delta": {"content": "{"}}]}\n\n', b"data: not json\n\n"]
+        client = half_open_client(lambda request: httpx.Response(200, content=b"".join(chunks)))
+
+        stream = client.stream({"messages": []}, "extract")
+        assert await stream.__anext__() == "{"
+        await stream.aclose()
+
+        breaker = client.resilience.policy("extract").breaker
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.allow()
+
+        # A malformed chunk after the headers is counted, and the next call still goes out
+        with pytest.raises(ValueError):
+            async for _ in client.stream({"messages": []}, "extract"):
+                pass
+        assert breaker.failures == 1
+        breaker.allow()
+        await client.aclose()
@@ -0,0 +1,118 @@
+"""
+Unit tests for the local pre-classifier
+"""
+
+import base64
+import random
+
+import pytest
+from unittest.mock import Mock, patch, AsyncMock
+from PIL import Image, ImageDraw
+
+from config import config
+from processors.classifier import DocumentClassifier
+from processors.local_classifier import LocalClassifier
+from models import DocumentType
+
+
+TEST_DATA = "tests/test_data"
+
+
+def synthetic_barcode_card(size=(856, 540)) -> Image.Image:
+    """ID-1 sized card (by default) with a stacked (PDF417-like) barcode block"""
+    card = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(card)
+    rng = random.Random(7)
+    for row in range(20):
+        y = 200 + row * 9
+        x = 100
+        while x < 760:
+            width = rng.choice([2, 2, 4, 6])
+            draw.rectangle([x, y, x + width - 1, y + 8], fill="black")
+            x += width + rng.choice([2, 2, 4, 6])
+    return card
+
+
+def read_base64(name: str) -> str:
+    with open(f"{TEST_DATA}/{name}", "rb") as f:
+        return base64.b64encode(f.read()).decode()
+
+
+class TestLocalClassifier:
+    """Test suite for LocalClassifier features"""
+
+    @pytest.fixture
+    def local(self):
+        return LocalClassifier()
+
+    @pytest.mark.parametrize("name", ["passport.jpg", "data14.png", "data15.png"])
+    def test_passport_mrz(self, local, name):
+        """Test that a two-line MRZ classifies as a passport"""
+        document_type, confidence = local.classify(Image.open(f"{TEST_DATA}/{name}"))
+
+        assert document_type == DocumentType.PASSPORT
+        assert confidence >= config.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+
+    def test_barcode_is_driver_license(self, local):
+        """Test that a stacked barcode classifies as a driver license"""
+        features = local.features(synthetic_barcode_card())
+        document_type, confidence = local.classify(synthetic_barcode_card())
+
+        assert features["barcode"] is True
+        assert features["mrz_lines"] == 0
+        assert document_type == DocumentType.DRIVER_LICENSE
+        assert confidence >= config.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+
+    def test_barcode_alone_is_left_to_the_llm(self, local):
+        """Test that a barcode on an image that isn't card-shaped needs an AAMVA payload to decide"""
+        page = synthetic_barcode_card((856, 1100))
+
+        with patch("processors.local_classifier.read_pdf417", return_value="1Z999AA10123456784"):
+            document_type, confidence = local.classify(page)
+        assert document_type == DocumentType.DRIVER_LICENSE
+        assert confidence < config.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+
+        with patch("processors.local_classifier.read_pdf417", return_value="@\n\x1e\rANSI 636014090002DL00410288"):
+            _, confidence = local.classify(page)
+        assert confidence >= config.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+
+    @pytest.mark.parametrize("name", ["driver_license.jpg", "data7.png", "data2.png"])
+    def test_card_fronts_are_left_to_the_llm(self, local, name):
+        """Test that card fronts without MRZ or barcode are not decided locally"""
+        _, confidence = local.classify(Image.open(f"{TEST_DATA}/{name}"))
+
+        assert confidence < config.LOCAL_CLASSIFIER_MIN_CONFIDENCE
+
+
+class TestClassifierLocalStage:
+    """Test suite for the local stage ahead of the LLM classifier"""
+
+    @pytest.fixture(autouse=True)
+    def enable_local(self, monkeypatch):
+        monkeypatch.setattr(config, "LOCAL_CLASSIFIER_ENABLED", True)
+
+    @pytest.mark.asyncio
+    async def test_confident_local_result_skips_llm(self):
+        """Test that a confident local classification makes no LLM call"""
+        classifier = DocumentClassifier()
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            document_type, tier = await classifier.classify_with_tier(read_base64("passport.jpg"))
+
+        assert document_type == DocumentType.PASSPORT
+        assert tier == "local"
+        mock_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_unsure_local_result_falls_back_to_llm(self):
+        """Test that a low-confidence local result is sent to the LLM"""
+        classifier = DocumentClassifier()
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_response = Mock()
+            mock_response.status_code = 200
+            mock_response.json.return_value = {"choices": [{"message": {"content": "driver_license"}}]}
+            mock_post.return_value = mock_response
+
+            document_type = await classifier.classify(read_base64("driver_license.jpg"))
+
+        assert document_type == DocumentType.DRIVER_LICENSE
+        mock_post.assert_called_once()
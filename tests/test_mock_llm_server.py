@@ -0,0 +1,87 @@
+"""
+Tests for the mock vision LLM used by the performance harness
+"""
+
+import base64
+import io
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent / "perf"))
+
+from mock_llm_server import MockLLM, create_app, parse_latency  # noqa: E402
+from processors.llm_client import LLMClient  # noqa: E402
+from processors.classifier import DocumentClassifier  # noqa: E402
+from processors.extractor import FieldExtractor  # noqa: E402
+from models import DocumentType  # noqa: E402
+
+TEST_DATA_DIR = Path(__file__).parent / "test_data"
+
+
+def mock_llm_client(mock: MockLLM) -> LLMClient:
+    """LLMClient whose transport is the in-process mock server"""
+    client = LLMClient()
+    client.base_url = "http://mock/v1/chat/completions"
+    client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(mock)))
+    return client
+
+
+def load_b64(name: str, scale: float = 1.0) -> str:
+    """Read a test image, optionally resized, as base64 JPEG"""
+    with Image.open(TEST_DATA_DIR / name) as image:
+        image = image.convert("RGB")
+        if scale != 1.0:
+            image = image.resize((int(image.width * scale), int(image.height * scale)))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=80)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class TestMockLLMServer:
+    """Test suite for the mock LLM server"""
+
+    def test_parse_latency(self):
+        """Test latency spec parsing"""
+        assert parse_latency("fixed:0.25")() == 0.25
+        assert 1.0 <= parse_latency("uniform:1,2")() <= 2.0
+        with pytest.raises(ValueError):
+            parse_latency("bogus:1")
+
+    @pytest.mark.asyncio
+    async def test_classify_matches_resized_image(self):
+        """Test that a re-encoded, resized upload resolves to its canned type"""
+        client = mock_llm_client(MockLLM(latency="fixed:0"))
+        classifier = DocumentClassifier(llm_client=client)
+
+        result = await classifier.classify(load_b64("passport.jpg", scale=0.5))
+
+        assert result == DocumentType.PASSPORT
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_fused_extraction_returns_canned_fields(self):
+        """Test that fused prompts get the type alongside the fields"""
+        mock = MockLLM(latency="fixed:0")
+        client = mock_llm_client(mock)
+        extractor = FieldExtractor(llm_client=client)
+
+        document_type, fields = await extractor.classify_and_extract(load_b64("driver_license.jpg"))
+
+        assert document_type == DocumentType.DRIVER_LICENSE
+        assert fields
+        assert mock.counters["matched"] == 1
+        await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_injected_errors(self):
+        """Test that the error rate produces HTTP 500s"""
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(MockLLM(latency="fixed:0", error_rate=1.0))))
+
+        response = await client.post("http://mock/v1/chat/completions", json={"messages": []})
+
+        assert response.status_code == 500
+        await client.aclose()
@@ -0,0 +1,186 @@
+"""
+Unit tests for multi-page PDF scanning
+"""
+
+import asyncio
+import base64
+import hashlib
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from PIL import Image
+
+from config import config
+from models import DocumentType
+from processors import pipeline as pipeline_module
+from processors.classifier import DocumentClassifier
+from processors.extractor import FieldExtractor
+from processors.pipeline import DocumentPipeline, document_identity
+from utils.image_utils import is_blank_page
+from utils.storage import read_stored
+
+
+class FakePdf:
+    """PDF whose pages are given as document types, None for blank pages"""
+
+    def __init__(self, pages, fields=None):
+        self.pages = pages
+        self.fields = fields or {}
+        self.batches = []
+        self.hashes = set()
+
+    def page_count(self, content, content_hash=None):
+        self.hashes.add(content_hash)
+        return len(self.pages)
+
+    def render(self, content, first, last, source=False, content_hash=None):
+        self.hashes.add(content_hash)
+        self.batches.append((first, last))
+        images = []
+        for number in range(first, min(last, len(self.pages)) + 1):
+            if self.pages[number - 1] is None:
+                images.append(None)
+            else:
+                images.append((base64.b64encode(f"page-{number}".encode()).decode(), None))
+        return images
+
+    def previews(self, content, number, content_hash=None):
+        self.hashes.add(content_hash)
+        return {"thumbnail": (f"page-{number}".encode(), "image/webp")}
+
+    @staticmethod
+    def number(image_base64):
+        return int(base64.b64decode(image_base64).decode().split("-")[1])
+
+    async def classify(self, image_base64, source_base64=None):
+        await asyncio.sleep(0.001)
+        return self.pages[self.number(image_base64) - 1]
+
+    async def extract(self, image_base64, document_type, known_fields=None):
+        return dict(self.fields.get(self.number(image_base64), {})), "gpt-4o"
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    """Patch page rendering and the LLM calls; returns a function building the fake PDF"""
+    def build(pages, fields=None):
+        pdf = FakePdf(pages, fields)
+        monkeypatch.setattr(pipeline_module, "pdf_page_count", pdf.page_count)
+        monkeypatch.setattr(pipeline_module, "render_llm_pages", pdf.render)
+        monkeypatch.setattr(pipeline_module, "render_page_previews", pdf.previews)
+        monkeypatch.setattr(DocumentClassifier, "classify", AsyncMock(side_effect=pdf.classify))
+        monkeypatch.setattr(FieldExtractor, "extract_with_tier", AsyncMock(side_effect=pdf.extract))
+        return pdf
+    return build
+
+
+class TestPdfPages:
+    """Test suite for DocumentPipeline.process_pdf_pages"""
+
+    @pytest.mark.asyncio
+    async def test_best_stops_at_first_document(self, fake_pdf, db_service, monkeypatch):
+        """Test that blank and unknown pages are skipped and later pages are neither classified nor rendered"""
+        monkeypatch.setattr(config, "PDF_PAGE_CONCURRENCY", 1)
+        monkeypatch.setattr(config, "PDF_RENDER_BATCH_PAGES", 2)
+        pdf = fake_pdf(
+            [None, DocumentType.UNKNOWN, DocumentType.PASSPORT, DocumentType.EAD_CARD, DocumentType.EAD_CARD],
+            {3: {"full_name": "John Doe", "passport_number": "123456789"}}
+        )
+
+        results = await DocumentPipeline().process_pdf_pages("scan.pdf", b"%PDF", db_service, mode="best")
+
+        assert [(number, document_type) for number, document_type, _, _ in results] == [(3, DocumentType.PASSPORT)]
+        # One render call per run of pages; page 4 shares page 3's run but is never classified
+        assert pdf.batches == [(1, 2), (3, 4)]
+        # The blank page never reached the classifier
+        assert DocumentClassifier.classify.await_count == 2
+        stored = await db_service.get_document_with_fields(results[0][3].id)
+        assert stored["page_number"] == 3
+        assert stored["fields"]["passport_number"]["current_value"] == "123456789"
+
+    @pytest.mark.asyncio
+    async def test_best_prefers_earliest_page(self, fake_pdf, db_service):
+        """Test that a later page finishing first does not win over an earlier document page"""
+        fake_pdf([DocumentType.DRIVER_LICENSE, DocumentType.PASSPORT, DocumentType.EAD_CARD])
+
+        async def classify(image_base64, source_base64=None):
+            # Page 1 answers last
+            number = FakePdf.number(image_base64)
+            await asyncio.sleep(0.02 if number == 1 else 0.001)
+            return [DocumentType.DRIVER_LICENSE, DocumentType.PASSPORT, DocumentType.EAD_CARD][number - 1]
+
+        DocumentClassifier.classify.side_effect = classify
+
+        results = await DocumentPipeline().process_pdf_pages("scan.pdf", b"%PDF", db_service, mode="best")
+
+        assert [number for number, _, _, _ in results] == [1]
+
+    @pytest.mark.asyncio
+    async def test_all_merges_pages_of_the_same_document(self, fake_pdf, db_service):
+        """Test that each distinct document is stored once, with fields merged across its pages"""
+        pdf = fake_pdf(
+            [DocumentType.EAD_CARD, DocumentType.EAD_CARD, None, DocumentType.PASSPORT],
+            {
+                1: {"full_name": "Jane Roe", "card_number": "SRC-123", "category": None},
+                2: {"card_number": "src123", "category": "C09"},
+                4: {"full_name": "Jane Roe", "passport_number": "X1"}
+            }
+        )
+
+        results = await DocumentPipeline().process_pdf_pages("scan.pdf", b"%PDF", db_service, mode="all")
+
+        assert [(number, document_type) for number, document_type, _, _ in results] == [
+            (1, DocumentType.EAD_CARD),
+            (4, DocumentType.PASSPORT)
+        ]
+        assert results[0][2] == {"full_name": "Jane Roe", "card_number": "SRC-123", "category": "C09"}
+        documents = await db_service.documents.get_all_documents()
+        assert sorted(document.page_number for document in documents) == [1, 4]
+        # Each document is previewed by its own first page
+        for _, _, _, document in results:
+            thumbnail = await read_stored(document.thumbnail_path)
+            assert thumbnail == f"page-{document.page_number}".encode()
+        # Every render is keyed by the digest computed once for the upload
+        assert pdf.hashes == {hashlib.sha256(b"%PDF").hexdigest()}
+
+    @pytest.mark.asyncio
+    async def test_no_document_stores_unknown(self, fake_pdf, db_service):
+        """Test that a PDF without document pages is stored once as unknown"""
+        fake_pdf([DocumentType.UNKNOWN, None])
+
+        results = await DocumentPipeline().process_pdf_pages("scan.pdf", b"%PDF", db_service, mode="all")
+
+        assert len(results) == 1
+        assert results[0][1] == DocumentType.UNKNOWN
+        assert FieldExtractor.extract_with_tier.await_count == 0
+
+    @pytest.mark.asyncio
+    async def test_process_upload_dispatches_pdfs(self, fake_pdf, db_service):
+        """Test that process_upload scans PDF pages unless the mode is first"""
+        fake_pdf([DocumentType.UNKNOWN, DocumentType.DRIVER_LICENSE], {2: {"license_number": "D1"}})
+
+        document_type, fields, document = await DocumentPipeline().process_upload(
+            "scan.pdf", "application/pdf", b"%PDF", db_service, pdf_mode="best"
+        )
+
+        assert document_type == DocumentType.DRIVER_LICENSE
+        assert fields == {"license_number": "D1"}
+        assert document.page_number == 2
+
+
+def test_document_identity():
+    """Test that document numbers are compared ignoring case and punctuation"""
+    assert document_identity(DocumentType.PASSPORT, {"passport_number": "ab 12-3"}) == (DocumentType.PASSPORT, "AB123")
+    assert document_identity(DocumentType.PASSPORT, {"full_name": "John  Doe", "date_of_birth": "01/02/1990"}) == (
+        DocumentType.PASSPORT, "JOHN DOE", "01/02/1990"
+    )
+    assert document_identity(DocumentType.PASSPORT, {"full_name": "John Doe"}) is None
+
+
+def test_blank_page():
+    """Test that flat pages are blank and pages with marks are not"""
+    page = Image.new("RGB", (850, 1100), (250, 250, 248))
+    assert is_blank_page(page)
+
+    page.paste((30, 30, 30), (100, 100, 400, 130))
+    assert not is_blank_page(page)
@@ -0,0 +1,135 @@
+"""
+Unit tests for lazy, cached PDF rendering
+"""
+
+import io
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from utils import pdf_render
+from utils.image_utils import render_llm_pages, render_page_previews
+from utils.pdf_render import PageCache, render_dpi, render_pdf_page, render_pdf_pages
+
+
+class FakeDocument:
+    """Letter-sized pages that record which pages were rendered at what DPI"""
+
+    def __init__(self, page_count: int):
+        self.page_count = page_count
+        self.rendered = []
+        self.opened = 0
+
+    def page_size(self, number):
+        return (612, 792)
+
+    def render(self, number, dpi):
+        self.rendered.append((number, round(dpi)))
+        return Image.new("RGB", (round(8.5 * dpi), round(11 * dpi)), "white")
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    """Replace the PDF backend with a three-page fake and start with an empty page cache"""
+    document = FakeDocument(3)
+
+    @contextmanager
+    def open_pdf(content):
+        document.opened += 1
+        yield document
+
+    monkeypatch.setattr(pdf_render, "_open_pdf", open_pdf)
+    monkeypatch.setattr(pdf_render, "page_cache", PageCache(64 * 1024 * 1024))
+    return document
+
+
+class TestPdfRender:
+    """Test suite for the page renderer"""
+
+    def test_pages_rendered_lazily(self, fake_pdf):
+        """Test that only the pages the consumer takes are rendered"""
+        pages = render_pdf_pages(b"%PDF one", dpi=100)
+
+        first = next(pages)
+        pages.close()
+
+        assert first.size == (850, 1100)
+        assert fake_pdf.rendered == [(1, 100)]
+
+    def test_single_page(self, fake_pdf):
+        """Test that a single page can be rendered without the ones before it"""
+        render_pdf_page(b"%PDF two", page=2, dpi=100)
+
+        assert fake_pdf.rendered == [(2, 100)]
+
+    def test_pages_cached_by_hash_and_dpi(self, fake_pdf):
+        """Test that a repeated render hits the cache and a new DPI does not"""
+        render_pdf_page(b"%PDF three", dpi=100)
+        render_pdf_page(b"%PDF three", dpi=100)
+        render_pdf_page(b"%PDF three", dpi=150)
+        render_pdf_page(b"%PDF other", dpi=100)
+
+        assert fake_pdf.rendered == [(1, 100), (1, 150), (1, 100)]
+        assert fake_pdf.opened == 3  # The cache remembers the page count too
+
+    def test_cache_keyed_by_given_hash(self, fake_pdf, monkeypatch):
+        """Test that a caller's content hash keys the cache without hashing the PDF again"""
+        render_pdf_page(b"%PDF five", dpi=100, content_hash="abc")
+        monkeypatch.setattr(pdf_render, "hashlib", None)  # Hashing again would fail
+
+        render_pdf_page(b"%PDF five", dpi=100, content_hash="abc")
+
+        assert fake_pdf.rendered == [(1, 100)]
+
+    def test_render_capped_to_max_side(self, fake_pdf):
+        """Test that the DPI is lowered so the longer side fits the size limit"""
+        image = render_pdf_page(b"%PDF four", dpi=300, max_side=1100)
+
+        assert render_dpi((612, 792), 300, 1100) == 100
+        assert image.size == (850, 1100)
+
+    def test_llm_pages_open_the_pdf_once(self, fake_pdf):
+        """Test that a run of pages is rendered from one open document, blank pages as None"""
+        assert render_llm_pages(b"%PDF run", 2, 5) == [None, None]
+        assert fake_pdf.opened == 1
+        assert [number for number, _ in fake_pdf.rendered] == [2, 3]
+
+    def test_page_previews_from_cached_render(self, fake_pdf):
+        """Test that page previews are downscaled from the page render without altering the cached page"""
+        page = render_pdf_page(b"%PDF previews", 1)
+        size = page.size
+
+        previews = render_page_previews(b"%PDF previews", 1)
+
+        assert max(Image.open(io.BytesIO(previews["preview"][0])).size) == 1024
+        assert max(Image.open(io.BytesIO(previews["thumbnail"][0])).size) == 256
+        assert page.size == size
+        assert len(fake_pdf.rendered) == 1
+
+    def test_cache_evicts_by_size(self):
+        """Test that the least recently used pages are dropped beyond the byte budget"""
+        cache = PageCache(max_bytes=3 * 100 * 100 * 3)
+        for index in range(4):
+            cache.set(index, Image.new("RGB", (100, 100)))
+
+        assert cache.get(0) is None
+        assert cache.get(3) is not None
+        assert cache.stats()["evictions"] == 1
+
+
+def test_real_pdf_first_page():
+    """Test rendering the first page of a real PDF with the installed backend"""
+    try:
+        import fitz  # noqa: F401
+    except ImportError:
+        if shutil.which("pdftoppm") is None:
+            pytest.skip("Neither PyMuPDF nor poppler is installed")
+
+    content = Path("tests/test_data/data7.pdf").read_bytes()
+    image = render_pdf_page(content, dpi=72)
+
+    assert max(image.size) <= 2048
+    assert image.width > 100
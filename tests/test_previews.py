@@ -0,0 +1,114 @@
+"""
+Tests for stored preview renditions and the data URL migration
+"""
+
+import base64
+import io
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+import pytest_asyncio
+from PIL import Image
+
+import main
+from database.models import Document, get_db
+from models import DocumentType
+from processors.pipeline import DocumentPipeline
+from utils.previews import migrate_data_url_previews
+from utils.storage import key_hash, read_stored
+
+
+TEST_DATA = "tests/test_data"
+
+
+@pytest_asyncio.fixture
+async def client(test_db, temp_storage, monkeypatch):
+    """API client on the test database and temporary storage"""
+    monkeypatch.setattr(main, "storage", temp_storage)
+
+    async def override_db():
+        yield test_db
+
+    main.app.dependency_overrides[get_db] = override_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        yield client
+    main.app.dependency_overrides.clear()
+
+
+async def extract_passport(db_service) -> Document:
+    """Run the pipeline on the sample passport with the LLM mocked out"""
+    with open(f"{TEST_DATA}/passport.jpg", "rb") as f:
+        content = f.read()
+    extracted = (DocumentType.PASSPORT, {"passport_number": "123456789"}, "gpt-4o")
+    with patch.object(DocumentPipeline, "extract", new_callable=AsyncMock, return_value=extracted):
+        _, _, document = await DocumentPipeline().process_upload("passport.jpg", "image/jpeg", content, db_service)
+    return document
+
+
+class TestStoredPreviews:
+    """Test suite for previews rendered at ingest"""
+
+    @pytest.mark.asyncio
+    async def test_documents_reference_stored_previews(self, client, db_service):
+        """Test that the list returns thumbnail URLs only and each rendition is served from storage"""
+        document = await extract_passport(db_service)
+
+        listed = (await client.get("/documents")).json()["documents"]
+        assert listed == [{
+            "id": document.id,
+            "file_name": "passport.jpg",
+            "document_type": "passport",
+            "upload_date": document.upload_date.isoformat(),
+            "status": "extracted",
+            "page_number": None,
+            "thumbnail_url": f"/documents/{document.id}/previews/thumbnail"
+        }]
+
+        details = (await client.get(f"/documents/{document.id}")).json()
+        assert "file_data_url" not in details
+        response = await client.get(details["preview_url"])
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+        assert max(Image.open(io.BytesIO(response.content)).size) <= 1024
+        assert (await client.get(f"/documents/{document.id}/previews/original")).status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_delete_releases_previews(self, client, db_service, temp_storage):
+        """Test that deleting the last document using the renditions deletes them"""
+        document = await extract_passport(db_service)
+        thumbnail_hash = key_hash(document.thumbnail_path)
+        assert (await db_service.files.get_stored_file(thumbnail_hash)).ref_count == 1
+
+        assert (await client.delete(f"/documents/{document.id}")).status_code == 200
+
+        assert not await temp_storage.exists(thumbnail_hash)
+        assert not await temp_storage.exists(key_hash(document.preview_path))
+
+
+class TestDataUrlMigration:
+    """Test suite for migrate_data_url_previews"""
+
+    @pytest.mark.asyncio
+    async def test_data_urls_moved_to_previews(self, test_db, db_service):
+        """Test that inline images become stored renditions and unreadable ones are cleared"""
+        buffer = io.BytesIO()
+        Image.new("RGB", (2000, 1000), "gray").save(buffer, format="PNG")
+        data_url = f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+        test_db.add_all([
+            Document(id="a", file_name="scan.png", document_type="passport", file_data_url=data_url),
+            Document(id="b", file_name="broken.jpg", document_type="passport", file_data_url="data:image/jpeg;base64,aGVsbG8="),
+            Document(id="c", file_name="new.jpg", document_type="passport")
+        ])
+        await test_db.commit()
+
+        assert await migrate_data_url_previews(db_service, batch_size=1) == (1, 1)
+
+        migrated = await db_service.documents.get_document("a")
+        thumbnail = Image.open(io.BytesIO(await read_stored(migrated.thumbnail_path)))
+        assert thumbnail.size == (256, 128)
+        assert (await db_service.files.get_stored_file(key_hash(migrated.preview_path))).ref_count == 1
+        assert (await db_service.documents.get_document("b")).thumbnail_path is None
+        assert await db_service.documents.get_data_urls() == []
+        assert await migrate_data_url_previews(db_service) == (0, 0)
@@ -0,0 +1,60 @@
+"""
+Unit tests for the prompt registry
+"""
+
+import pytest
+
+from config import config
+from processors.cache import ResultCache
+from processors.llm_client import LLMClient
+from processors.prompts import PromptRegistry, count_tokens, prompt_registry
+from models import DocumentType
+
+
+class TestPromptRegistry:
+    """Test suite for compiled prompts"""
+
+    def test_prompts_compiled_once(self):
+        """Test that repeated lookups return the same compiled prompt"""
+        assert prompt_registry.extraction(DocumentType.PASSPORT) is prompt_registry.extract[DocumentType.PASSPORT]
+        subset = prompt_registry.extraction(DocumentType.PASSPORT, ["issue_date", "country"])
+        assert prompt_registry.extraction(DocumentType.PASSPORT, ["country", "issue_date"]) is subset
+
+    def test_field_subset(self):
+        """Test that a subset prompt lists only the requested fields"""
+        prompt = prompt_registry.extraction(DocumentType.PASSPORT, ["issue_date"])
+
+        assert "- issue_date:" in prompt.text
+        assert "passport_number" not in prompt.text
+
+    def test_shared_system_message(self):
+        """Test that extraction payloads share the system message and end with the image"""
+        payloads = [
+            prompt_registry.extraction(document_type).payload("aGVsbG8=", "gpt-4o", 500, 0.1)
+            for document_type in [DocumentType.PASSPORT, DocumentType.EAD_CARD]
+        ] + [prompt_registry.fused.payload("aGVsbG8=", "gpt-4o", 500, 0.1)]
+
+        assert len({payload["messages"][0]["content"] for payload in payloads}) == 1
+        assert all(payload["messages"][0]["role"] == "system" for payload in payloads)
+        assert all(payload["messages"][-1]["content"][-1]["type"] == "image_url" for payload in payloads)
+
+    def test_no_indentation_whitespace(self):
+        """Test that prompts carry no leading indentation"""
+        for prompt in prompt_registry.prompts():
+            assert not any(line.startswith("        ") for line in prompt.text.splitlines())
+            assert prompt.tokens == count_tokens(prompt.text) + count_tokens(prompt.system or "")
+
+    def test_quota_estimate_counts_prompt_tokens(self):
+        """Test that the LLM client's quota estimate counts text with the prompt tokenizer"""
+        prompt = prompt_registry.extraction(DocumentType.PASSPORT)
+        payload = prompt.payload("aGVsbG8=", "gpt-4o", 500, 0.1)
+
+        assert LLMClient.estimate_tokens(payload) == 500 + prompt.tokens + config.LLM_IMAGE_TOKEN_ESTIMATE
+
+    def test_version_in_cache_key(self, monkeypatch):
+        """Test that the prompt version is part of cache keys and follows PROMPT_VERSION"""
+        assert prompt_registry.version in ResultCache.make_key("abc", "extract")
+
+        monkeypatch.setattr(config, "PROMPT_VERSION", "99")
+        assert PromptRegistry().version != prompt_registry.version
+        assert PromptRegistry().version.startswith("99.")
@@ -0,0 +1,116 @@
+"""
+Unit tests for the adaptive LLM rate limiter
+"""
+
+import pytest
+import asyncio
+import httpx
+from unittest.mock import Mock, patch, AsyncMock
+
+from processors.rate_limiter import AdaptiveRateLimiter, parse_reset_duration
+from processors.llm_client import LLMClient
+
+
+class TestAdaptiveRateLimiter:
+    """Test suite for AdaptiveRateLimiter"""
+
+    @pytest.fixture
+    def limiter(self):
+        """Create a limiter with generous quotas"""
+        return AdaptiveRateLimiter(
+            requests_per_minute=6000,
+            tokens_per_minute=1000000,
+            min_concurrency=1,
+            max_concurrency=8,
+            initial_concurrency=4,
+            target_latency=5.0
+        )
+
+    def test_parse_reset_duration(self):
+        """Test parsing of provider reset durations"""
+        assert parse_reset_duration("1s") == 1.0
+        assert parse_reset_duration("6m0s") == 360.0
+        assert parse_reset_duration("250ms") == 0.25
+        assert parse_reset_duration("2") == 2.0
+        assert parse_reset_duration("soon") is None
+
+    def test_429_halves_concurrency(self, limiter):
+        """Test multiplicative decrease on rate limiting"""
+        limiter.record(429, httpx.Headers({"retry-after": "0"}), 0.5)
+
+        assert limiter.limit == 2.0
+        assert limiter.counters["rate_limited"] == 1
+
+    def test_concurrent_429s_decrease_once(self, limiter):
+        """Test that a burst of 429s from calls in flight together cuts the limit once"""
+        for _ in range(4):
+            limiter.record(429, httpx.Headers({"retry-after": "0"}), 0.5)
+
+        assert limiter.limit == 2.0
+        assert limiter.counters["decreases"] == 1
+        assert limiter.counters["rate_limited"] == 4
+
+        # A call sent after the cut still backs off again
+        limiter.last_decrease -= 1.0
+        limiter.record_timeout(0.5)
+        assert limiter.limit == 1.0
+
+    def test_fast_success_grows_concurrency(self, limiter):
+        """Test additive increase on fast successful responses"""
+        for _ in range(8):
+            limiter.record(200, httpx.Headers({}), 0.5)
+
+        assert limiter.limit > 4.0
+
+    def test_slow_success_shrinks_concurrency(self, limiter):
+        """Test that latency above target is treated as congestion"""
+        limiter.record(200, httpx.Headers({}), 30.0)
+
+        assert limiter.limit < 4.0
+
+    def test_exhausted_quota_header_pauses(self, limiter):
+        """Test that zero remaining requests pauses until the reset"""
+        limiter.record(200, httpx.Headers({
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "2s"
+        }), 0.5)
+
+        assert limiter.stats()["paused_for"] > 1.0
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, limiter):
+        """Test that callers queue once the concurrency limit is reached"""
+        limiter.limit = 2.0
+        peak = 0
+
+        async def call():
+            nonlocal peak
+            async with limiter.acquire(10):
+                peak = max(peak, limiter.active)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[call() for _ in range(6)])
+
+        assert peak == 2
+        assert limiter.active == 0
+
+    @pytest.mark.asyncio
+    async def test_client_requeues_after_429(self, limiter):
+        """Test that a 429 is queued again instead of returned to the caller"""
+        client = LLMClient(limiter=limiter)
+
+        rate_limited = Mock()
+        rate_limited.status_code = 429
+        rate_limited.headers = httpx.Headers({"retry-after": "0"})
+        ok = Mock()
+        ok.status_code = 200
+        ok.headers = httpx.Headers({})
+
+        with patch('httpx.AsyncClient.post', new_callable=AsyncMock) as mock_post:
+            mock_post.side_effect = [rate_limited, ok]
+
+            response = await client.post({"messages": [], "max_tokens": 10})
+
+        assert response.status_code == 200
+        assert mock_post.call_count == 2
+        await client.aclose()
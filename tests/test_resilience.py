@@ -0,0 +1,171 @@
+"""
+Unit tests for LLM retry, hedging and circuit breaker policies
+"""
+
+import pytest
+import asyncio
+import httpx
+from unittest.mock import Mock
+
+from processors.resilience import ResilientCaller, CircuitBreaker, CircuitOpenError
+
+
+def make_response(status_code):
+    response = Mock()
+    response.status_code = status_code
+    return response
+
+
+class TestResilientCaller:
+    """Test suite for ResilientCaller"""
+
+    @pytest.mark.asyncio
+    async def test_retries_on_5xx_then_succeeds(self):
+        """Test that transient server errors are retried"""
+        caller = ResilientCaller()
+        responses = [make_response(503), make_response(502), make_response(200)]
+
+        async def send(timeout):
+            return responses.pop(0)
+
+        response = await caller.call("extract", send)
+
+        assert response.status_code == 200
+        assert caller.counters["retries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_retries_on_timeout(self):
+        """Test that timeouts are retried and re-raised once exhausted"""
+        caller = ResilientCaller()
+        calls = 0
+
+        async def send(timeout):
+            nonlocal calls
+            calls += 1
+            raise httpx.ReadTimeout("timed out")
+
+        with pytest.raises(httpx.TimeoutException):
+            await caller.call("extract", send)
+
+        assert calls == caller.policy("extract").max_retries + 1
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self):
+        """Test that 4xx responses other than 429 are returned immediately"""
+        caller = ResilientCaller()
+        calls = 0
+
+        async def send(timeout):
+            nonlocal calls
+            calls += 1
+            return make_response(400)
+
+        response = await caller.call("classify", send)
+
+        assert response.status_code == 400
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_hedged_request_wins_over_slow_primary(self):
+        """Test that a duplicate is sent once the primary exceeds the latency percentile"""
+        caller = ResilientCaller()
+        policy = caller.policy("classify")
+        policy.hedge_enabled = True
+        policy.hedge_min_samples = 1
+        policy.latencies.add(0.01)
+        calls = 0
+
+        async def send(timeout):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await asyncio.sleep(1)
+            return make_response(200)
+
+        response = await caller.call("classify", send)
+
+        assert response.status_code == 200
+        assert caller.counters["hedges"] == 1
+        assert caller.counters["hedge_wins"] == 1
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_fails_fast(self):
+        """Test that repeated failures open the circuit"""
+        caller = ResilientCaller()
+        policy = caller.policy("extract")
+        policy.max_retries = 0
+        policy.breaker.failure_threshold = 2
+
+        async def send(timeout):
+            return make_response(500)
+
+        await caller.call("extract", send)
+        await caller.call("extract", send)
+
+        with pytest.raises(CircuitOpenError):
+            await caller.call("extract", send)
+        assert caller.counters["short_circuited"] == 1
+
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_releases_breaker(self):
+        """Test that a half-open probe cancelled mid-call reopens the breaker instead of wedging it"""
+        caller = ResilientCaller()
+        breaker = caller.policy("extract").breaker
+        breaker.reset_timeout = 0
+        breaker.failure_threshold = 1
+        breaker.record_failure()
+
+        started = asyncio.Event()
+
+        async def hang(timeout):
+            started.set()
+            await asyncio.sleep(60)
+
+        probe = asyncio.ensure_future(caller.call("extract", hang))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert breaker.state == CircuitBreaker.OPEN
+        # The reset timeout has passed, so the next call is the new probe
+        response = await caller.call("extract", lambda timeout: asyncio.sleep(0, make_response(200)))
+        assert response.status_code == 200
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_unexpected_error_releases_probe(self):
+        """Test that a probe raising a non-retryable exception counts as a failure"""
+        caller = ResilientCaller()
+        breaker = caller.policy("extract").breaker
+        breaker.reset_timeout = 0
+        breaker.failure_threshold = 1
+        breaker.record_failure()
+
+        async def broken(timeout):
+            raise ValueError("bad payload")
+
+        with pytest.raises(ValueError):
+            await caller.call("extract", broken)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker._probe_in_flight
+
+
+class TestCircuitBreaker:
+    """Test suite for CircuitBreaker"""
+
+    def test_half_open_probe_closes_on_success(self):
+        """Test recovery through a half-open probe"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.allow()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
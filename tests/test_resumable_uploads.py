@@ -0,0 +1,174 @@
+"""
+Tests for resumable (tus-style) uploads
+"""
+
+import base64
+import importlib
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+import pytest_asyncio
+
+import main
+from database.models import get_db
+from models import DocumentType
+from processors.pipeline import DocumentPipeline
+from utils.storage import LocalFileStorage
+from utils.upload_ingest import append_chunks
+
+# The module, not the storage instance utils re-exports under the same name
+storage_module = importlib.import_module("utils.storage")
+
+
+TEST_DATA = "tests/test_data"
+CHUNK_HEADERS = {"Content-Type": "application/offset+octet-stream"}
+
+
+@pytest_asyncio.fixture
+async def client(test_db, tmp_path, monkeypatch):
+    """API client on the test database, storing uploads under tmp_path"""
+    store = LocalFileStorage(str(tmp_path / "objects"))
+    monkeypatch.setattr(storage_module, "storage", store)
+    monkeypatch.setattr(main, "storage", store)
+    monkeypatch.setattr(main, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(main, "PARTIAL_UPLOAD_DIR", tmp_path / "partial")
+    (tmp_path / "partial").mkdir()
+
+    async def override_db():
+        yield test_db
+
+    main.app.dependency_overrides[get_db] = override_db
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        yield client
+    main.app.dependency_overrides.clear()
+
+
+async def create_upload(client, length: int, file_name: str = "packet.jpg") -> str:
+    """Start an upload and return its URL"""
+    metadata = f"filename {base64.b64encode(file_name.encode()).decode()}"
+    response = await client.post("/uploads", headers={"Upload-Length": str(length), "Upload-Metadata": metadata})
+    assert response.status_code == 201
+    assert response.headers["Upload-Offset"] == "0"
+    return response.headers["Location"]
+
+
+class TestResumableUploads:
+    """Test suite for the /uploads endpoints"""
+
+    @pytest.mark.asyncio
+    async def test_resume_and_finalize(self, client, db_service, tmp_path):
+        """Test that an upload sent in parts, with a rejected stale retry, finalizes into extraction"""
+        with open(f"{TEST_DATA}/passport.jpg", "rb") as f:
+            content = f.read()
+        half = len(content) // 2
+        url = await create_upload(client, len(content))
+
+        response = await client.patch(url, content=content[:half], headers={**CHUNK_HEADERS, "Upload-Offset": "0"})
+        assert response.status_code == 204
+        assert response.headers["Upload-Offset"] == str(half)
+
+        # A client retrying from an old offset is told where the upload stands
+        response = await client.patch(url, content=content[:half], headers={**CHUNK_HEADERS, "Upload-Offset": "0"})
+        assert response.status_code == 409
+        assert (await client.head(url)).headers["Upload-Offset"] == str(half)
+        assert (await client.post(f"{url}/finalize")).status_code == 409
+
+        response = await client.patch(url, content=content[half:], headers={**CHUNK_HEADERS, "Upload-Offset": str(half)})
+        assert response.headers["Upload-Offset"] == str(len(content))
+
+        extracted = (DocumentType.PASSPORT, {"passport_number": "123456789"}, "gpt-4o")
+        with patch.object(DocumentPipeline, "extract", new_callable=AsyncMock, return_value=extracted) as extract:
+            response = await client.post(f"{url}/finalize")
+
+        assert response.status_code == 200
+        assert response.json()["document_type"] == "passport"
+        assert extract.await_args.args[0] == main.UploadBuffer(content, "image/jpeg").content_hash
+        documents = await db_service.documents.get_all_documents()
+        assert [document.file_name for document in documents] == ["packet.jpg"]
+        assert (await client.head(url)).status_code == 404
+        assert list((tmp_path / "partial").iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_failed_finalize_can_be_retried(self, client, db_service):
+        """Test that the received bytes survive a failed extraction and a second finalize uses them"""
+        with open(f"{TEST_DATA}/passport.jpg", "rb") as f:
+            content = f.read()
+        url = await create_upload(client, len(content))
+        await client.patch(url, content=content, headers={**CHUNK_HEADERS, "Upload-Offset": "0"})
+
+        extracted = (DocumentType.PASSPORT, {"passport_number": "123456789"}, "gpt-4o")
+        with patch.object(DocumentPipeline, "extract", new_callable=AsyncMock, side_effect=[RuntimeError("LLM down"), extracted]):
+            assert (await client.post(f"{url}/finalize")).status_code == 500
+            assert (await client.head(url)).headers["Upload-Offset"] == str(len(content))
+            # A finalized upload takes no more bytes
+            response = await client.patch(url, content=b"", headers={**CHUNK_HEADERS, "Upload-Offset": str(len(content))})
+            assert response.status_code == 409
+
+            response = await client.post(f"{url}/finalize")
+
+        assert response.status_code == 200
+        assert (await client.head(url)).status_code == 404
+        [document] = await db_service.documents.get_all_documents()
+        assert (await db_service.files.get_stored_file(main.key_hash(document.file_path))).ref_count == 1
+
+    @pytest.mark.asyncio
+    async def test_image_over_processing_limit_rejected(self, client, monkeypatch):
+        """Test that a completed image larger than MAX_FILE_SIZE is refused, not read into memory"""
+        monkeypatch.setattr(main.config, "MAX_FILE_SIZE", 8)
+        url = await create_upload(client, 16)
+        await client.patch(url, content=b"\xff\xd8\xff" + b"0" * 13, headers={**CHUNK_HEADERS, "Upload-Offset": "0"})
+
+        response = await client.post(f"{url}/finalize")
+
+        assert response.status_code == 413
+        assert (await client.head(url)).status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_chunk_past_length_rejected(self, client):
+        """Test that bytes beyond the declared length are refused without moving the offset"""
+        url = await create_upload(client, 10)
+
+        response = await client.patch(url, content=b"%PDF-" + b"0" * 20, headers={**CHUNK_HEADERS, "Upload-Offset": "0"})
+
+        assert response.status_code == 413
+        assert (await client.head(url)).headers["Upload-Offset"] == "0"
+
+    @pytest.mark.asyncio
+    async def test_unsupported_file_rejected_on_finalize(self, client):
+        """Test that the type is sniffed when the upload completes"""
+        url = await create_upload(client, 6)
+        await client.patch(url, content=b"GIF89a", headers={**CHUNK_HEADERS, "Upload-Offset": "0"})
+
+        response = await client.post(f"{url}/finalize")
+
+        assert response.status_code == 400
+        assert (await client.head(url)).status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_expired_uploads_purged(self, client, db_service, tmp_path):
+        """Test that expired uploads and their files are removed"""
+        partial = tmp_path / "partial" / "old.part"
+        partial.write_bytes(b"%PDF-")
+        old = await db_service.uploads.create_upload("old.pdf", str(partial), 100, datetime.utcnow() - timedelta(seconds=1))
+
+        assert (await client.head(f"/uploads/{old.id}")).status_code == 404
+        await create_upload(client, 100)
+
+        assert not partial.exists()
+
+    @pytest.mark.asyncio
+    async def test_interrupted_append_keeps_received_bytes(self, tmp_path):
+        """Test that a broken-off chunk stream leaves the bytes it delivered, replacing stale ones"""
+        partial = tmp_path / "upload.part"
+        partial.write_bytes(b"abcXYZ")
+
+        async def chunks():
+            yield b"def"
+            raise ConnectionError("client went away")
+
+        with pytest.raises(ConnectionError):
+            await append_chunks(partial, 3, chunks(), 100)
+
+        assert partial.read_bytes() == b"abcdef"
@@ -0,0 +1,76 @@
+"""
+Unit tests for single-flight request coalescing
+"""
+
+import pytest
+import asyncio
+
+from processors.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test suite for SingleFlight"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test that identical concurrent calls run once and share the result"""
+        flights = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"document_type": "passport"}
+
+        results = await asyncio.gather(*[flights.do("key", work) for _ in range(5)])
+
+        assert calls == 1
+        assert all(result is results[0] for result in results)
+        assert flights.stats()["coalesced"] == 4
+        assert flights.in_flight() == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_propagate_to_all_waiters(self):
+        """Test that a failure is raised in every waiting caller"""
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(
+            *[flights.do("key", work) for _ in range(3)],
+            return_exceptions=True
+        )
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        """Test that different keys are not coalesced"""
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            return object()
+
+        first, second = await asyncio.gather(flights.do("a", work), flights.do("b", work))
+
+        assert first is not second
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_call(self):
+        """Test that one caller going away leaves the call running for others"""
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        leader = asyncio.ensure_future(flights.do("key", work))
+        follower = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "done"
@@ -0,0 +1,146 @@
+"""
+Unit tests for content-addressed file storage
+"""
+
+import hashlib
+import importlib
+import os
+import uuid
+
+import pytest
+
+from utils.storage import LocalFileStorage, key_hash, release_file, storage_key, store_upload
+from utils.upload_ingest import SpooledUpload
+
+# The module, not the storage instance utils re-exports under the same name
+storage_module = importlib.import_module("utils.storage")
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    """Local storage under tmp_path, installed as the application storage"""
+    store = LocalFileStorage(str(tmp_path / "objects"))
+    monkeypatch.setattr(storage_module, "storage", store)
+    return store
+
+
+def staged_upload(store: LocalFileStorage, content: bytes) -> SpooledUpload:
+    """An upload spooled to the staging directory, as ingest_upload leaves it"""
+    path = store.staging_dir / f"{uuid.uuid4().hex}_scan.jpg"
+    path.write_bytes(content)
+    return SpooledUpload(path, "scan.jpg", "image/jpeg", len(content), hashlib.sha256(content).hexdigest())
+
+
+class TestLocalFileStorage:
+    """Test suite for LocalFileStorage"""
+
+    @pytest.mark.asyncio
+    async def test_put_get_delete(self, local_storage):
+        """Test that bytes are stored under fan-out directories by their digest"""
+        content_hash = await local_storage.put_bytes(b"\xff\xd8\xff scan")
+
+        path = local_storage.path_for(content_hash)
+        assert path.relative_to(local_storage.root).parts == (content_hash[:2], content_hash[2:4], content_hash)
+        assert await local_storage.get(content_hash) == b"\xff\xd8\xff scan"
+        assert list(local_storage.staging_dir.iterdir()) == []
+
+        await local_storage.delete(content_hash)
+        assert not await local_storage.exists(content_hash)
+        with pytest.raises(FileNotFoundError):
+            await local_storage.get(content_hash)
+
+    @pytest.mark.asyncio
+    async def test_duplicate_upload_dropped(self, local_storage):
+        """Test that storing content already present keeps one copy and drops the staged file"""
+        first = staged_upload(local_storage, b"same bytes")
+        second = staged_upload(local_storage, b"same bytes")
+
+        await local_storage.put_file(first.path, first.content_hash)
+        await local_storage.put_file(second.path, second.content_hash)
+
+        assert not second.path.exists()
+        assert list(local_storage.staging_dir.iterdir()) == []
+        assert local_storage.path_for(first.content_hash).read_bytes() == b"same bytes"
+
+
+class TestReferenceCounting:
+    """Test suite for store_upload/release_file"""
+
+    @pytest.mark.asyncio
+    async def test_file_kept_until_last_reference(self, local_storage, db_service):
+        """Test that identical uploads share a file that outlives all but the last document"""
+        file_path = await store_upload(staged_upload(local_storage, b"passport"), db_service)
+        assert await store_upload(staged_upload(local_storage, b"passport"), db_service) == file_path
+
+        first = await db_service.process_extraction_result("a.jpg", "passport", {}, file_path=file_path)
+        second = await db_service.process_extraction_result("b.jpg", "passport", {}, file_path=file_path)
+        # Both requests finish; the documents keep the file
+        await release_file(file_path, db_service)
+        await release_file(file_path, db_service)
+        content_hash = key_hash(file_path)
+        assert (await db_service.files.get_stored_file(content_hash)).ref_count == 2
+
+        await db_service.documents.delete_document(first.id)
+        await release_file(file_path, db_service)
+        assert await local_storage.exists(content_hash)
+
+        await db_service.documents.delete_document(second.id)
+        await release_file(file_path, db_service)
+        assert not await local_storage.exists(content_hash)
+        assert await db_service.files.get_stored_file(content_hash) is None
+
+    @pytest.mark.asyncio
+    async def test_last_release_deletes_before_commit(self, local_storage, db_service, monkeypatch):
+        """Test that the file is deleted inside the release, which is undone if the delete fails"""
+        file_path = await store_upload(staged_upload(local_storage, b"passport"), db_service)
+
+        async def fail(content_hash):
+            raise OSError("storage unavailable")
+
+        monkeypatch.setattr(local_storage, "delete", fail)
+        with pytest.raises(OSError):
+            await release_file(file_path, db_service)
+
+        content_hash = key_hash(file_path)
+        assert (await db_service.files.get_stored_file(content_hash)).ref_count == 1
+        assert await local_storage.exists(content_hash)
+
+    @pytest.mark.asyncio
+    async def test_legacy_paths_deleted_directly(self, tmp_path, db_service):
+        """Test that files stored before content addressing are removed by path"""
+        legacy = tmp_path / "0123_scan.jpg"
+        legacy.write_bytes(b"old")
+
+        await release_file(str(legacy), db_service)
+
+        assert not legacy.exists()
+        assert key_hash(str(legacy)) is None
+        assert key_hash(storage_key("ab" * 32)) == "ab" * 32
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not os.getenv("MINIO_ENDPOINT"), reason="Set MINIO_ENDPOINT (and AWS credentials) to test against MinIO")
+async def test_s3_storage_against_minio(tmp_path):
+    """Test the S3 backend against a local MinIO server"""
+    pytest.importorskip("boto3")
+    from utils.storage import S3FileStorage
+
+    bucket = f"test-{uuid.uuid4().hex[:12]}"
+    store = S3FileStorage(bucket, prefix="uploads", endpoint_url=os.environ["MINIO_ENDPOINT"], staging_dir=str(tmp_path))
+    store._client.create_bucket(Bucket=bucket)
+    try:
+        content_hash = await store.put_bytes(b"%PDF-1.4 packet")
+        staged = store.staging_dir / "upload"
+        staged.write_bytes(b"%PDF-1.4 packet")
+        await store.put_file(staged, content_hash)
+
+        assert not staged.exists()
+        assert await store.get(content_hash) == b"%PDF-1.4 packet"
+        assert store.object_key(content_hash) == f"uploads/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+        await store.delete(content_hash)
+        assert not await store.exists(content_hash)
+        with pytest.raises(FileNotFoundError):
+            await store.get(content_hash)
+    finally:
+        store._client.delete_bucket(Bucket=bucket)
@@ -0,0 +1,155 @@
+"""
+Unit tests for chunked, size-enforced upload ingestion
+"""
+
+import errno
+import hashlib
+import io
+import os
+
+import httpx
+import pytest
+from fastapi import HTTPException, UploadFile
+
+import main
+from config import config
+from utils.upload_ingest import ingest_upload, sniff_content_type, spool_partial
+
+
+TEST_DATA = "tests/test_data"
+
+
+def upload_file(content: bytes, file_name: str = "scan.jpg") -> UploadFile:
+    """Form upload over in-memory bytes"""
+    return UploadFile(file=io.BytesIO(content), filename=file_name)
+
+
+class TestUploadIngest:
+    """Test suite for ingest_upload"""
+
+    @pytest.mark.asyncio
+    async def test_spools_and_hashes_in_chunks(self, tmp_path, monkeypatch):
+        """Test that the stored file, size and digest match the upload read in small chunks"""
+        monkeypatch.setattr(config, "UPLOAD_CHUNK_SIZE", 4096)
+        with open(f"{TEST_DATA}/passport.jpg", "rb") as f:
+            content = f.read()
+
+        spooled = await ingest_upload(upload_file(content, "../passport.jpg"), tmp_path)
+
+        assert spooled.path.parent == tmp_path
+        assert spooled.path.name.endswith("_passport.jpg")
+        assert spooled.size == len(content)
+        assert spooled.content_hash == hashlib.sha256(content).hexdigest()
+        assert spooled.content_type == "image/jpeg"
+        assert await spooled.read() == content
+        assert list(tmp_path.iterdir()) == [spooled.path]
+
+    @pytest.mark.asyncio
+    async def test_content_type_is_sniffed(self, tmp_path):
+        """Test that the type comes from the bytes, not the declared content type or name"""
+        spooled = await ingest_upload(upload_file(b"%PDF-1.4\n...", "scan.jpg"), tmp_path)
+
+        assert spooled.content_type == "application/pdf"
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_stops_reading(self, tmp_path, monkeypatch):
+        """Test that reading stops once the limit is passed and nothing is left on disk"""
+        monkeypatch.setattr(config, "UPLOAD_CHUNK_SIZE", 1024)
+        file = upload_file(b"\xff\xd8\xff" + b"\0" * 100_000)
+
+        with pytest.raises(HTTPException) as error:
+            await ingest_upload(file, tmp_path, max_size=10_000)
+
+        assert "too large" in error.value.detail
+        assert file.file.tell() < 20_000
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("content", [b"GIF89a...", b"<html>", b""])
+    async def test_unsupported_content_rejected(self, tmp_path, content):
+        """Test that unsupported or empty files are rejected and removed"""
+        with pytest.raises(HTTPException) as error:
+            await ingest_upload(upload_file(content), tmp_path)
+
+        assert error.value.status_code == 400
+        assert list(tmp_path.iterdir()) == []
+
+
+def multipart_body(content: bytes, boundary: str = "limit-test") -> bytes:
+    """multipart/form-data body holding one file field"""
+    return (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"scan.jpg\"\r\n"
+        f"Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+
+
+class TestRequestSizeLimit:
+    """Test suite for RequestSizeLimitMiddleware on the API"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        """API client with a 1000 byte file limit"""
+        monkeypatch.setattr(config, "MAX_FILE_SIZE", 1000)
+        monkeypatch.setattr(config, "MULTIPART_OVERHEAD", 200)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+    @pytest.mark.asyncio
+    async def test_declared_length_rejected(self, client):
+        """Test that a Content-Length over the limit is refused"""
+        body = multipart_body(b"\xff\xd8\xff" + b"0" * 2000)
+        async with client:
+            response = await client.post(
+                "/classify", content=body,
+                headers={"Content-Type": "multipart/form-data; boundary=limit-test"}
+            )
+
+        assert response.status_code == 413
+
+    @pytest.mark.asyncio
+    async def test_chunked_body_cut_off(self, client):
+        """Test that a body without Content-Length stops being read at the limit"""
+        body = multipart_body(b"\xff\xd8\xff" + b"0" * 5000)
+        sent = 0
+
+        async def chunks():
+            nonlocal sent
+            for start in range(0, len(body), 256):
+                sent += 256
+                yield body[start:start + 256]
+
+        async with client:
+            response = await client.post(
+                "/classify", content=chunks(),
+                headers={"Content-Type": "multipart/form-data; boundary=limit-test"}
+            )
+
+        assert response.status_code == 413
+        assert sent < len(body)
+
+
+@pytest.mark.asyncio
+async def test_partial_spooled_across_filesystems(tmp_path, monkeypatch):
+    """Test that a completed partial upload reaches a staging directory a rename can't reach"""
+    partial = tmp_path / "upload.part"
+    partial.write_bytes(b"%PDF-1.7 body")
+    staging = tmp_path / "staging"
+    staging.mkdir()
+
+    def rename(source, target):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(os, "rename", rename)
+    spooled = await spool_partial(partial, staging, "scan.pdf")
+
+    assert not partial.exists()
+    assert spooled.path.parent == staging
+    assert spooled.path.read_bytes() == b"%PDF-1.7 body"
+    assert spooled.content_hash == hashlib.sha256(b"%PDF-1.7 body").hexdigest()
+
+
+def test_sniff_content_type():
+    """Test magic byte detection of the supported types"""
+    assert sniff_content_type(b"\xff\xd8\xff\xe0\0\x10JFIF") == "image/jpeg"
+    assert sniff_content_type(b"\x89PNG\r\n\x1a\n\0\0") == "image/png"
+    assert sniff_content_type(b"%PDF-1.7") == "application/pdf"
+    assert sniff_content_type(b"RIFF\0\0\0\0WEBP") is None
@@ -1,14 +1,66 @@
 """Utility functions package"""
 
-from .image_utils import process_pdf_to_images, image_to_base64
+from .image_utils import (
+    process_pdf_to_images, image_to_base64, UploadBuffer,
+    prepare_llm_image, encode_for_llm, fit_token_budget, image_token_cost, render_previews
+)
+from .executors import OffloadExecutor, render_executor, thread_executor, executor_stats
+from .upload_ingest import SpooledUpload, RequestSizeLimitMiddleware, ingest_upload, sniff_content_type, append_chunks, spool_partial
+from .storage import LocalFileStorage, S3FileStorage, storage, storage_key, key_hash, read_stored, store_upload, store_bytes, release_file
+from .previews import preview_url, store_previews, release_previews, migrate_data_url_previews
+from .file_response import FileRangeResponse, IMMUTABLE_CACHE_CONTROL, detect_media_type, file_response, not_modified
+from .pdf_render import render_pdf_pages, render_pdf_page, pdf_page_count, page_cache
+from .document_crop import crop_to_document, find_document_quad
 from .date_utils import standardize_date
 from .name_parser import NameParser, guess_name_order, normalize_name
+from .json_stream import IncrementalJSONParser
 
 __all__ = [
     'process_pdf_to_images', 
     'image_to_base64', 
+    'UploadBuffer',
+    'prepare_llm_image',
+    'encode_for_llm',
+    'fit_token_budget',
+    'image_token_cost',
+    'render_previews',
+    'crop_to_document',
+    'find_document_quad',
+    'render_pdf_pages',
+    'render_pdf_page',
+    'pdf_page_count',
+    'page_cache',
+    'SpooledUpload',
+    'RequestSizeLimitMiddleware',
+    'ingest_upload',
+    'sniff_content_type',
+    'append_chunks',
+    'spool_partial',
+    'LocalFileStorage',
+    'S3FileStorage',
+    'storage',
+    'storage_key',
+    'key_hash',
+    'read_stored',
+    'store_upload',
+    'store_bytes',
+    'release_file',
+    'preview_url',
+    'store_previews',
+    'release_previews',
+    'migrate_data_url_previews',
+    'FileRangeResponse',
+    'IMMUTABLE_CACHE_CONTROL',
+    'detect_media_type',
+    'file_response',
+    'not_modified',
+    'OffloadExecutor',
+    'render_executor',
+    'thread_executor',
+    'executor_stats',
     'standardize_date',
     'NameParser',
     'guess_name_order',
-    'normalize_name'
+    'normalize_name',
+    'IncrementalJSONParser'
 ]
\ No newline at end of file
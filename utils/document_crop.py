@@ -0,0 +1,198 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageDraw
+from utils.image_utils import box_mean
+
+# Detection runs on a small copy of the image
+WORK_SIZE = 256
+BORDER_RING = 0.03  # Background colors are sampled from this outer fraction of the image
+BORDER_SAMPLES = 32
+MIN_COLOR_DISTANCE = 40.0  # Summed RGB difference from the nearest background sample
+MIN_EDGE = 20.0  # Gradient magnitude of a document outline
+
+# A detected quadrilateral is only used when it looks like a document lying in the photo
+MIN_AREA = 0.2  # Fraction of the image; smaller regions are usually a photo or logo on the card
+MAX_AREA = 0.85  # Larger regions leave too little background to be worth cropping
+MIN_FILL = 0.9  # Detected document pixels over quadrilateral area
+MAX_FILL = 1.15
+MAX_OUTSIDE_FILL = 0.25  # Foreground left outside the quadrilateral
+MAX_SIDE_RATIO = 1.25  # Opposite sides of a mildly tilted document have similar lengths
+MAX_CORNER_SKEW = 15.0  # degrees from a right angle
+ASPECT_RANGE = (1.2, 1.8)  # ID-1 cards 1.59, passport pages 1.42, letter pages 1.29
+MARGIN = 0.02  # Grow the crop outward so document edges are not cut off
+
+def _dilate(mask: np.ndarray) -> np.ndarray:
+    """Grow a mask by one pixel (4-connected)"""
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+def _flood(seed: np.ndarray, allowed: np.ndarray) -> np.ndarray:
+    """Pixels of allowed connected to seed"""
+    reached = seed & allowed
+    while True:
+        grown = _dilate(reached) & allowed
+        if np.array_equal(grown, reached):
+            return reached
+        reached = grown
+
+def _foreground(rgb: np.ndarray) -> np.ndarray:
+    """
+    Mask of everything that is not background connected to the image border
+
+    A pixel blocks the background if its color is far from every color sampled
+    on the border or if it lies on a strong edge; the background is flooded in
+    from the border, so a closed document outline keeps its whole interior.
+    """
+    height, width, _ = rgb.shape
+    ring = max(2, round(min(height, width) * BORDER_RING))
+    border = np.zeros((height, width), dtype=bool)
+    border[:ring] = border[-ring:] = True
+    border[:, :ring] = border[:, -ring:] = True
+
+    samples = rgb[border][np.linspace(0, border.sum() - 1, BORDER_SAMPLES).astype(int)]
+    distance = np.full((height, width), np.inf, dtype=np.float32)
+    for color in samples:
+        distance = np.minimum(distance, np.abs(rgb - color).sum(axis=2))
+    # Textured backgrounds raise both thresholds
+    colored = distance > max(MIN_COLOR_DISTANCE, 2.0 * np.percentile(distance[border], 90))
+
+    gray = rgb.mean(axis=2)
+    gradient = np.zeros_like(gray)
+    gradient[:, 1:] += np.abs(np.diff(gray, axis=1))
+    gradient[1:] += np.abs(np.diff(gray, axis=0))
+    edges = gradient > max(MIN_EDGE, 3.0 * np.percentile(gradient[border], 90))
+
+    outer = np.zeros((height, width), dtype=bool)
+    outer[0] = outer[-1] = True
+    outer[:, 0] = outer[:, -1] = True
+    foreground = ~_flood(outer, ~_dilate(colored | edges))
+    # Majority filter drops thin lines (folds, cables) attached to the document
+    return box_mean(foreground.astype(np.float32), max(1, round(min(height, width) * 0.02))) > 0.5
+
+def _is_document(quad: np.ndarray, document: np.ndarray, foreground: np.ndarray) -> bool:
+    """Check that a quadrilateral is a plausible, worthwhile document crop"""
+    height, width = document.shape
+    x, y = quad[:, 0], quad[:, 1]
+    area = 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+    if not MIN_AREA <= area / (height * width) <= MAX_AREA:
+        return False
+    if not MIN_FILL <= document.sum() / area <= MAX_FILL:
+        return False
+
+    polygon = Image.new("1", (width, height), 0)
+    ImageDraw.Draw(polygon).polygon([tuple(point) for point in quad], fill=1)
+    inside = np.asarray(polygon, dtype=bool)
+    if foreground[~inside].mean() > MAX_OUTSIDE_FILL:
+        return False
+
+    sides = [np.linalg.norm(quad[(index + 1) % 4] - quad[index]) for index in range(4)]
+    if min(sides) < 1:
+        return False
+    if max(sides[0], sides[2]) / min(sides[0], sides[2]) > MAX_SIDE_RATIO:
+        return False
+    if max(sides[1], sides[3]) / min(sides[1], sides[3]) > MAX_SIDE_RATIO:
+        return False
+
+    for index in range(4):
+        before = quad[index - 1] - quad[index]
+        after = quad[(index + 1) % 4] - quad[index]
+        cosine = np.dot(before, after) / (np.linalg.norm(before) * np.linalg.norm(after))
+        if abs(np.degrees(np.arccos(np.clip(cosine, -1, 1))) - 90) > MAX_CORNER_SKEW:
+            return False
+
+    horizontal, vertical = sides[0] + sides[2], sides[1] + sides[3]
+    aspect = max(horizontal, vertical) / min(horizontal, vertical)
+    return ASPECT_RANGE[0] <= aspect <= ASPECT_RANGE[1]
+
+def find_document_quad(image: Image.Image) -> Optional[List[Tuple[float, float]]]:
+    """
+    Find the corners of a document photographed on a background
+
+    Args:
+        image: PIL image
+
+    Returns:
+        Corners (top-left, top-right, bottom-right, bottom-left) in image
+        coordinates, or None if no document region was found or the image is
+        already tightly cropped
+    """
+    scale = WORK_SIZE / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    rgb = np.asarray(image.convert("RGB").resize(size, Image.BILINEAR), dtype=np.float32)
+
+    foreground = _foreground(rgb)
+    if not foreground.any():
+        return None
+
+    # The document is the foreground component around the densest spot
+    density = box_mean(foreground.astype(np.float32), max(1, round(min(size) * 0.05)))
+    seed = np.zeros_like(foreground)
+    seed[np.unravel_index(np.where(foreground, density, -1).argmax(), density.shape)] = True
+    document = _flood(seed, foreground)
+
+    # Extreme points along the diagonals are the corners of a roughly upright quadrilateral
+    ys, xs = np.nonzero(document)
+    total, difference = xs + ys, xs - ys
+    corners = [total.argmin(), difference.argmax(), total.argmax(), difference.argmin()]
+    quad = np.array([[xs[index], ys[index]] for index in corners], dtype=np.float64)
+    if not _is_document(quad, document, foreground):
+        return None
+
+    center = quad.mean(axis=0)
+    quad = (center + (quad - center) * (1 + MARGIN) + 0.5) / scale
+    quad[:, 0] = quad[:, 0].clip(0, image.width)
+    quad[:, 1] = quad[:, 1].clip(0, image.height)
+    return [(float(x), float(y)) for x, y in quad]
+
+def quad_size(quad: List[Tuple[float, float]]) -> Tuple[int, int]:
+    """
+    Size of the rectified document a quadrilateral outlines
+
+    Args:
+        quad: Corners (top-left, top-right, bottom-right, bottom-left)
+
+    Returns:
+        Tuple of (width, height) in pixels, averaging opposite sides
+    """
+    top_left, top_right, bottom_right, bottom_left = [np.array(point) for point in quad]
+    width = round((np.linalg.norm(top_right - top_left) + np.linalg.norm(bottom_right - bottom_left)) / 2)
+    height = round((np.linalg.norm(bottom_left - top_left) + np.linalg.norm(bottom_right - top_right)) / 2)
+    return max(1, width), max(1, height)
+
+def rectify_quad(image: Image.Image, quad: List[Tuple[float, float]]) -> Image.Image:
+    """
+    Crop and deskew an image to a quadrilateral
+
+    Args:
+        image: PIL image
+        quad: Corners (top-left, top-right, bottom-right, bottom-left) in image coordinates
+
+    Returns:
+        Rectified image of the quadrilateral
+    """
+    # PIL maps the quadrilateral (upper left, lower left, lower right, upper right) onto the output
+    return image.transform(
+        quad_size(quad),
+        Image.QUAD,
+        [*quad[0], *quad[3], *quad[2], *quad[1]],
+        resample=Image.BICUBIC
+    )
+
+def crop_to_document(image: Image.Image) -> Optional[Image.Image]:
+    """
+    Crop and deskew an image to the document it shows
+
+    Args:
+        image: PIL image
+
+    Returns:
+        Rectified document image, or None if no document region was found
+    """
+    quad = find_document_quad(image)
+    if quad is None:
+        return None
+    return rectify_quad(image, quad)
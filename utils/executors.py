@@ -0,0 +1,153 @@
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional, Tuple, TypeVar
+from fastapi import HTTPException
+from config import config
+
+T = TypeVar("T")
+
+def _timed_call(fn: Callable[..., T], args: Tuple[Any, ...]) -> Tuple[float, T]:
+    """
+    Run fn inside the executor and report when it started
+
+    Wall-clock time, so a start recorded in a worker process can be compared
+    with the submit time recorded in the server process.
+    """
+    started = time.time()
+    try:
+        return started, fn(*args)
+    except HTTPException as e:
+        # Keyword-constructed HTTPExceptions cannot be unpickled in the parent process
+        raise HTTPException(e.status_code, e.detail, e.headers) from None
+
+def _summary(samples: Deque[float]) -> Dict[str, Optional[float]]:
+    """Mean, p95 and max of recent samples in milliseconds"""
+    if not samples:
+        return {"avg_ms": None, "p95_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+    return {
+        "avg_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2)
+    }
+
+class OffloadExecutor:
+    """
+    Runs blocking work off the event loop on a thread or process pool
+
+    Threads suit work that releases the GIL (hashing, numpy, barcode decoding);
+    processes suit pure-Python-heavy work such as PDF rendering and image
+    encoding. "inline" runs the function on the event loop, for debugging.
+
+    Queue depth counts submitted tasks that no worker has picked up yet (tasks
+    in flight beyond the worker count); wait time is how long a task queued.
+    """
+
+    SAMPLES = 1024  # Recent tasks kept for the wait/run time summaries
+
+    def __init__(self, name: str, kind: str, max_workers: int):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self._pool: Optional[Executor] = None
+        self._in_flight = 0
+        self._waits: Deque[float] = deque(maxlen=self.SAMPLES)
+        self._runs: Deque[float] = deque(maxlen=self.SAMPLES)
+        self.counters = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "pool_restarts": 0
+        }
+
+    @property
+    def pool(self) -> Executor:
+        """Get the pool, creating it on first use"""
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(config.EXECUTOR_START_METHOD)
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._pool
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Run fn(*args) on the pool and wait for the result
+
+        For process pools fn must be a module-level function and the arguments
+        and result must be picklable.
+
+        Args:
+            fn: Blocking function
+            *args: Positional arguments for fn
+
+        Returns:
+            The function's result; its exceptions are re-raised here
+        """
+        self.counters["submitted"] += 1
+        self._in_flight += 1
+        submitted = time.time()
+        try:
+            if self.kind == "inline":
+                started, result = _timed_call(fn, args)
+            else:
+                loop = asyncio.get_running_loop()
+                started, result = await loop.run_in_executor(self.pool, _timed_call, fn, args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for the next task
+            self.counters["failed"] += 1
+            self.counters["pool_restarts"] += 1
+            self._pool = None
+            raise
+        except BaseException:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+        self.counters["completed"] += 1
+        self._waits.append(max(0.0, started - submitted))
+        self._runs.append(max(0.0, time.time() - started))
+        return result
+
+    def queue_depth(self) -> int:
+        """Tasks submitted but not yet picked up by a worker"""
+        if self.kind == "inline":
+            return 0
+        return max(0, self._in_flight - self.max_workers)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool size, queue depth, counters and wait/run time summaries"""
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth(),
+            **self.counters,
+            "wait": _summary(self._waits),
+            "run": _summary(self._runs)
+        }
+
+    def shutdown(self, wait: bool = False):
+        """Stop the pool, dropping queued work (called on application shutdown)"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+# Application-scoped executors: rendering/encoding and GIL-releasing image work
+render_executor = OffloadExecutor("render", config.RENDER_EXECUTOR, config.RENDER_WORKERS)
+thread_executor = OffloadExecutor("image-io", "thread", config.IMAGE_THREAD_WORKERS)
+
+def executor_stats() -> Dict[str, Any]:
+    """Stats of the application-scoped executors"""
+    return {
+        "render": render_executor.stats(),
+        "thread": thread_executor.stats()
+    }
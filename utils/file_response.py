@@ -0,0 +1,224 @@
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from starlette.responses import Response
+from utils.executors import thread_executor
+
+# Stored files never change under their URL, so the client may keep them for a year;
+# they are identity documents, so shared proxies and CDNs must not store them
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# Bytes sniffed to detect the media type
+MEDIA_SNIFF_BYTES = 16
+
+def detect_media_type(head: bytes) -> str:
+    """
+    Detect the media type of a served file from its leading bytes
+
+    Args:
+        head: First MEDIA_SNIFF_BYTES bytes of the file
+
+    Returns:
+        MIME type, application/octet-stream when unrecognized
+    """
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    if head[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    return "application/octet-stream"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an ETag (weak comparison, as RFC 9110 requires)
+
+    Args:
+        if_none_match: Header value, e.g. '"abc", W/"def"' or '*'
+        etag: Quoted entity tag of the current representation
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Byte range requested by a Range header
+
+    Only single byte ranges are honoured; for anything else the whole file is
+    sent, which RFC 9110 allows.
+
+    Args:
+        header: Range header value, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-500"
+        size: File size in bytes
+
+    Returns:
+        Tuple of (first byte, last byte), inclusive, or None to send the whole file
+
+    Raises:
+        HTTPException: 416 if the range lies beyond the end of the file
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    unsatisfiable = HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix == 0:
+                raise unsatisfiable
+            start, end = max(0, size - suffix), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise unsatisfiable
+    return start, min(end, size - 1)
+
+class FileRangeResponse(Response):
+    """
+    Send a file, or one byte range of it, without loading it into memory
+
+    Where the ASGI server offers the zerocopysend extension the kernel copies
+    the file to the socket (sendfile); otherwise it is streamed in chunks read
+    on the thread executor.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: Path,
+        offset: int,
+        length: int,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+        media_type: Optional[str] = None
+    ):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        handle = await thread_executor.run(open, self.path, "rb")
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": handle,
+                    "offset": self.offset,
+                    "count": self.length,
+                    "more_body": False
+                })
+                return
+            await thread_executor.run(handle.seek, self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await thread_executor.run(handle.read, min(self.chunk_size, remaining))
+                if not chunk:
+                    break  # Truncated underneath us; the client sees a short body
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            handle.close()
+
+def _read_head(path: Path) -> Tuple[int, bytes]:
+    """Size and leading bytes of a file"""
+    with open(path, "rb") as handle:
+        return os.fstat(handle.fileno()).st_size, handle.read(MEDIA_SNIFF_BYTES)
+
+def not_modified(request: Request, etag: str, headers: Dict[str, str]) -> Optional[Response]:
+    """
+    304 response if the client already holds this version
+
+    Args:
+        request: Incoming request
+        etag: Quoted entity tag of the file
+        headers: Caching headers to repeat on the 304
+
+    Returns:
+        304 Response, or None to send the file
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return None
+
+async def file_response(
+    request: Request,
+    path: Optional[Path] = None,
+    content: Optional[bytes] = None,
+    media_type: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Response for a file on disk or in memory, honouring Range requests
+
+    A Range header is ignored when an If-Range validator doesn't match the
+    file's ETag, so a client never splices parts of two different files.
+
+    Args:
+        request: Incoming request
+        path: File on local disk, streamed (or sent with sendfile)
+        content: File content, when the file isn't on local disk
+        media_type: MIME type (default detected from the leading bytes)
+        headers: Extra headers, e.g. ETag and Cache-Control
+
+    Returns:
+        200 or 206 response
+
+    Raises:
+        FileNotFoundError: If path does not exist
+        HTTPException: 416 if the requested range lies beyond the end of the file
+    """
+    headers = {"Accept-Ranges": "bytes", **(headers or {})}
+    if path is not None:
+        size, head = await thread_executor.run(_read_head, path)
+    else:
+        size, head = len(content), content[:MEDIA_SNIFF_BYTES]
+    media_type = media_type or detect_media_type(head)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == headers.get("ETag")):
+        byte_range = parse_range(range_header, size)
+
+    status_code, start, end = 200, 0, size - 1
+    if byte_range is not None:
+        status_code, (start, end) = 206, byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    if path is not None:
+        return FileRangeResponse(path, start, end - start + 1, status_code, headers, media_type)
+    return Response(content=content[start:end + 1], status_code=status_code, headers=headers, media_type=media_type)
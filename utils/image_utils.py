@@ -1,18 +1,46 @@
+import asyncio
 import base64
+import hashlib
 import io
-import tempfile
-import os
-from typing import List
-from PIL import Image
-import pdf2image
+import math
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageOps, features
 from fastapi import HTTPException
+from config import config
+from utils.executors import render_executor, thread_executor
+from utils.pdf_render import render_pdf_page, render_pdf_pages
 
-def process_pdf_to_images(pdf_content: bytes) -> List[Image.Image]:
+# Vision model image-token cost: the provider fits the image in 2048x2048, scales
+# the shortest side down to 768px, then charges per 512px tile plus a base cost
+IMAGE_MAX_SIDE = 2048
+IMAGE_SHORT_SIDE = 768
+IMAGE_TILE = 512
+IMAGE_BASE_TOKENS = 85
+IMAGE_TILE_TOKENS = 170
+
+EXIF_ORIENTATION = 0x0112
+
+# A PDF page whose darkest and lightest pixels differ by less than this is blank
+BLANK_PAGE_CONTRAST = 24
+
+# Leading base64 characters of common image formats
+BASE64_SIGNATURES = {
+    "/9j/": "image/jpeg",
+    "iVBORw0KGgo": "image/png",
+    "R0lGOD": "image/gif",
+    "UklGR": "image/webp"
+}
+
+def process_pdf_to_images(pdf_content: bytes, last_page: Optional[int] = None) -> List[Image.Image]:
     """
-    Convert PDF to images using pdf2image
+    Convert PDF to images
+    
+    Prefer render_pdf_pages or render_pdf_page, which render only the pages consumed.
     
     Args:
         pdf_content: PDF file content as bytes
+        last_page: Last page to render (default all pages)
         
     Returns:
         List of PIL Image objects
@@ -20,33 +48,7 @@ def process_pdf_to_images(pdf_content: bytes) -> List[Image.Image]:
     Raises:
         HTTPException: If PDF processing fails
     """
-    try:
-        import pdf2image
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            tmp_file.write(pdf_content)
-            tmp_file.flush()
-            
-            try:
-                images = pdf2image.convert_from_path(tmp_file.name)
-                return images
-            finally:
-                os.unlink(tmp_file.name)
-    except ImportError:
-        raise HTTPException(
-            status_code=500,
-            detail="PDF support not available. Please install pdf2image and poppler."
-        )
-    except Exception as e:
-        if "poppler" in str(e).lower():
-            raise HTTPException(
-                status_code=500,
-                detail="Poppler is not installed. Please install poppler to process PDF files."
-            )
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error processing PDF: {str(e)}"
-        )
+    return list(render_pdf_pages(pdf_content, last_page=last_page))
 
 def image_to_base64(image: Image.Image) -> str:
     """
@@ -59,9 +61,617 @@ def image_to_base64(image: Image.Image) -> str:
         Base64 encoded string
     """
     buffered = io.BytesIO()
-    image.save(buffered, format="JPEG")
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(buffered, format="JPEG", quality=config.LLM_IMAGE_QUALITY)
     return base64.b64encode(buffered.getvalue()).decode()
 
+def box_mean(image: np.ndarray, radius: int) -> np.ndarray:
+    """Mean over a (2r+1)^2 window using an integral image"""
+    size = 2 * radius + 1
+    padded = np.pad(image, radius + 1, mode="edge")
+    integral = padded.cumsum(0).cumsum(1)
+    # In place, so only one window-sized temporary is allocated
+    total = integral[size:, size:] - integral[:-size, size:]
+    total -= integral[size:, :-size]
+    total += integral[:-size, :-size]
+    total = total[:image.shape[0], :image.shape[1]]
+    total /= size * size
+    return total
+
+def _provider_scale(width: int, height: int) -> float:
+    """Scale factor the provider applies before tiling a high-detail image"""
+    scale = min(1.0, IMAGE_MAX_SIDE / max(width, height))
+    return scale * min(1.0, IMAGE_SHORT_SIDE / (min(width, height) * scale))
+
+def image_token_cost(width: int, height: int, detail: str = "high") -> int:
+    """
+    Estimate the input tokens a vision model charges for an image
+    
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        detail: "low" or "high"
+        
+    Returns:
+        Number of image tokens
+    """
+    if detail == "low":
+        return IMAGE_BASE_TOKENS
+    scale = _provider_scale(width, height)
+    tiles = math.ceil(width * scale / IMAGE_TILE) * math.ceil(height * scale / IMAGE_TILE)
+    return IMAGE_BASE_TOKENS + IMAGE_TILE_TOKENS * tiles
+
+def fit_token_budget(width: int, height: int, max_tokens: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Largest size, keeping the aspect ratio, whose high-detail cost fits the budget
+    
+    Never larger than what the provider would downscale to anyway.
+    
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        max_tokens: Token budget (default config.LLM_IMAGE_MAX_TOKENS)
+        
+    Returns:
+        Tuple of (width, height)
+    """
+    max_tokens = max_tokens or config.LLM_IMAGE_MAX_TOKENS
+    max_tiles = max(1, (max_tokens - IMAGE_BASE_TOKENS) // IMAGE_TILE_TOKENS)
+    scale = _provider_scale(width, height)
+    
+    if math.ceil(width * scale / IMAGE_TILE) * math.ceil(height * scale / IMAGE_TILE) > max_tiles:
+        # Best tile grid (columns x rows) within the budget
+        scale = max(
+            min(scale, columns * IMAGE_TILE / width, (max_tiles // columns) * IMAGE_TILE / height)
+            for columns in range(1, max_tiles + 1)
+        )
+    
+    return max(1, math.floor(width * scale)), max(1, math.floor(height * scale))
+
+def fit_image(image: Image.Image, max_tokens: Optional[int] = None) -> Image.Image:
+    """
+    Downscale an image to the token budget
+    
+    Args:
+        image: PIL Image object
+        max_tokens: Token budget (default config.LLM_IMAGE_MAX_TOKENS)
+        
+    Returns:
+        Resized image, or the same image if it already fits
+    """
+    size = fit_token_budget(image.width, image.height, max_tokens)
+    if size == image.size:
+        return image
+    return image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+def crop_document(image: Image.Image) -> Image.Image:
+    """
+    Crop and deskew to the document region when one is found
+    
+    Args:
+        image: PIL Image object
+        
+    Returns:
+        Cropped image, or the same image if cropping is disabled or nothing was found
+    """
+    if not config.DOCUMENT_CROP_ENABLED:
+        return image
+    from utils.document_crop import crop_to_document
+    return crop_to_document(image) or image
+
+def _flatten(image: Image.Image) -> Image.Image:
+    """RGB or grayscale image, with any transparency flattened onto white (JPEG has no alpha channel)"""
+    if image.mode in ("RGB", "L"):
+        return image
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+    return background
+
+def _upright(content: bytes, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Decode an image, in draft mode near size when given, rotated upright and flattened"""
+    image = Image.open(io.BytesIO(content))
+    if size is not None:
+        # Let the JPEG decoder downscale by a power of two while decoding
+        image.draft("RGB", size)
+    return _flatten(ImageOps.exif_transpose(image))
+
+def _fit_for_llm(content: bytes, max_tokens: Optional[int] = None) -> Optional[Image.Image]:
+    """
+    Decoded, cropped and resized LLM image, or None if the original bytes can be sent as-is
+    
+    The document is looked for on a decode reduced to the budget of the whole
+    frame. When one is found it is cropped from a second decode, reduced only
+    as far as the crop's own budget allows, so the document keeps its detail.
+    """
+    header = Image.open(io.BytesIO(content))
+    source_format, source_size = header.format, header.size
+    rotated = header.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8)
+    size = fit_token_budget(*source_size, max_tokens)
+    image = _upright(content, size)
+    if rotated:
+        size = (size[1], size[0])  # Rotated by 90 degrees once transposed
+    
+    quad = None
+    if config.DOCUMENT_CROP_ENABLED:
+        from utils.document_crop import find_document_quad
+        quad = find_document_quad(image)
+    
+    if quad is not None:
+        from utils.document_crop import quad_size, rectify_quad
+        # Scale of the full-size upright image relative to the reduced one
+        full_width = source_size[1] if rotated else source_size[0]
+        scale = full_width / image.width
+        crop_size = quad_size([(x * scale, y * scale) for x, y in quad])
+        reduction = fit_token_budget(*crop_size, max_tokens)[0] / crop_size[0]
+        full = _upright(content, (math.ceil(source_size[0] * reduction), math.ceil(source_size[1] * reduction)))
+        scale_x, scale_y = full.width / image.width, full.height / image.height
+        image = rectify_quad(full, [(x * scale_x, y * scale_y) for x, y in quad])
+        size = fit_token_budget(image.width, image.height, max_tokens)
+    elif size == source_size and source_format == "JPEG":
+        return None
+    
+    if image.size != size:
+        image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    return image
+
+def _jpeg_base64(image: Image.Image) -> str:
+    """Base64 encoded JPEG at the LLM image quality"""
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=config.LLM_IMAGE_QUALITY, optimize=True)
+    return base64.b64encode(buffered.getbuffer()).decode()
+
+def _source_base64(image: Image.Image) -> str:
+    """Base64 encoded JPEG at the source image quality"""
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=config.SOURCE_IMAGE_QUALITY)
+    return base64.b64encode(buffered.getbuffer()).decode()
+
+def encode_for_llm(content: bytes, max_tokens: Optional[int] = None) -> str:
+    """
+    Crop, downscale and re-encode an uploaded image for LLM submission
+    
+    JPEGs are decoded in draft mode straight at (close to) the target size.
+    Images that already fit, need no crop and are JPEG are passed through untouched.
+    
+    Args:
+        content: Image file content as bytes
+        max_tokens: Token budget (default config.LLM_IMAGE_MAX_TOKENS)
+        
+    Returns:
+        Base64 encoded image
+    """
+    image = _fit_for_llm(content, max_tokens)
+    if image is None:
+        return base64.b64encode(content).decode()
+    return _jpeg_base64(image)
+
+def image_mime_type(image_base64: str) -> str:
+    """
+    Detect the MIME type of a base64 encoded image from its leading bytes
+    
+    Args:
+        image_base64: Base64 encoded image
+        
+    Returns:
+        MIME type, image/jpeg when unrecognized
+    """
+    for signature, mime_type in BASE64_SIGNATURES.items():
+        if image_base64.startswith(signature):
+            return mime_type
+    return "image/jpeg"
+
+def render_llm_image(content: bytes, content_type: str, content_hash: Optional[str] = None) -> Optional[str]:
+    """
+    Render, crop and downscale an upload into the LLM image
+    
+    Module-level so it can run on a process pool.
+    
+    Args:
+        content: Uploaded file content as bytes
+        content_type: MIME type of the upload
+        content_hash: SHA-256 hex digest of a PDF, keying the page cache
+        
+    Returns:
+        Base64 encoded JPEG, or None if the original image can be sent unchanged
+        
+    Raises:
+        HTTPException: If the PDF cannot be rendered
+    """
+    if content_type == "application/pdf":
+        # Only the first page is rendered
+        return _jpeg_base64(fit_image(crop_document(render_pdf_page(content, 1, content_hash=content_hash))))
+    
+    image = _fit_for_llm(content)  # Fails early on undecodable images
+    return None if image is None else _jpeg_base64(image)
+
+def render_source_image(content: bytes, content_type: str, content_hash: Optional[str] = None) -> Optional[str]:
+    """
+    Render the full-resolution image read by barcode/MRZ decoding and the local classifier
+    
+    Unlike the LLM image it is not downscaled to the token budget: PDF417
+    modules and MRZ characters need every pixel. It is cropped like the LLM
+    image so both see the same document.
+    
+    Module-level so it can run on a process pool.
+    
+    Args:
+        content: Uploaded file content as bytes
+        content_type: MIME type of the upload
+        content_hash: SHA-256 hex digest of a PDF, keying the page cache
+        
+    Returns:
+        Base64 encoded JPEG, or None if the original image can be read unchanged
+        
+    Raises:
+        HTTPException: If the PDF cannot be rendered
+    """
+    if content_type == "application/pdf":
+        return _source_base64(crop_document(render_pdf_page(content, 1, content_hash=content_hash)))
+    
+    rotated = Image.open(io.BytesIO(content)).getexif().get(EXIF_ORIENTATION, 1) != 1
+    upright = _upright(content)
+    cropped = crop_document(upright)
+    if cropped is upright and not rotated:
+        return None  # The original is already upright and uncropped
+    return _source_base64(cropped)
+
+def is_blank_page(image: Image.Image) -> bool:
+    """
+    Check whether a rendered page has no visible content
+    
+    Args:
+        image: PIL image
+        
+    Returns:
+        True if the page is a single flat tone
+    """
+    width = min(256, image.width)
+    height = max(1, round(image.height * width / image.width))
+    low, high = image.convert("L").resize((width, height), Image.BOX).getextrema()
+    return high - low < BLANK_PAGE_CONTRAST
+
+def render_llm_pages(
+    content: bytes,
+    first_page: int,
+    last_page: int,
+    source: bool = False,
+    content_hash: Optional[str] = None
+) -> List[Optional[Tuple[str, Optional[str]]]]:
+    """
+    Render a run of PDF pages into LLM images
+    
+    Module-level so it can run on a process pool. The PDF is sent and opened
+    once for the whole run rather than once per page.
+    
+    Args:
+        content: PDF file content as bytes
+        first_page: First page to render (1-based)
+        last_page: Last page to render
+        source: Also encode each page's full-resolution source image
+        content_hash: SHA-256 hex digest of the PDF, keying the page cache
+        
+    Returns:
+        Per page, None if it is blank, otherwise a tuple of (base64 encoded LLM
+        JPEG, base64 encoded source JPEG or None if not asked for)
+        
+    Raises:
+        HTTPException: If the PDF cannot be rendered
+    """
+    pages = []
+    for image in render_pdf_pages(content, first_page=first_page, last_page=last_page, content_hash=content_hash):
+        if is_blank_page(image):
+            pages.append(None)
+            continue
+        cropped = crop_document(image)
+        pages.append((_jpeg_base64(fit_image(cropped)), _source_base64(cropped) if source else None))
+    return pages
+
+def preview_format() -> Tuple[str, str]:
+    """
+    Image format the preview renditions are encoded in
+    
+    Returns:
+        Tuple of (PIL format name, MIME type); JPEG when Pillow was built without WebP
+    """
+    if config.PREVIEW_FORMAT.upper() == "WEBP" and features.check("webp"):
+        return "WEBP", "image/webp"
+    return "JPEG", "image/jpeg"
+
+def _encode_previews(image: Image.Image) -> Dict[str, Tuple[bytes, str]]:
+    """Encode the preview renditions of a decoded image, downscaling it in place"""
+    image_format, mime_type = preview_format()
+    renditions = {}
+    for name, size in sorted(config.PREVIEW_SIZES.items(), key=lambda item: item[1], reverse=True):
+        image.thumbnail((size, size), Image.LANCZOS, reducing_gap=3.0)
+        buffered = io.BytesIO()
+        image.save(buffered, format=image_format, quality=config.PREVIEW_QUALITY)
+        renditions[name] = (buffered.getvalue(), mime_type)
+    return renditions
+
+def render_previews(content: bytes) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Encode the preview renditions (config.PREVIEW_SIZES) of an image
+    
+    The image is decoded once, in draft mode near the largest size, and each
+    smaller rendition is downscaled from the previous one. Images are never
+    enlarged.
+    
+    Args:
+        content: Image file content as bytes
+    
+    Returns:
+        Dictionary of rendition name to (encoded bytes, MIME type)
+    """
+    largest = max(config.PREVIEW_SIZES.values())
+    return _encode_previews(_upright(content, (largest, largest)))
+
+def render_page_previews(content: bytes, page: int, content_hash: Optional[str] = None) -> Dict[str, Tuple[bytes, str]]:
+    """
+    Encode the preview renditions of a PDF page
+    
+    They are downscaled from the full page render (usually still in the page
+    cache), not from the cropped, lossy LLM image, so the preview shows the
+    whole page.
+    
+    Module-level so it can run on a process pool.
+    
+    Args:
+        content: PDF file content as bytes
+        page: Page number (1-based)
+        content_hash: SHA-256 hex digest of the PDF, keying the page cache
+    
+    Returns:
+        Dictionary of rendition name to (encoded bytes, MIME type)
+        
+    Raises:
+        HTTPException: If the PDF cannot be rendered
+    """
+    # The cached render is shared, so downscale a copy
+    return _encode_previews(_flatten(render_pdf_page(content, page, content_hash=content_hash)).copy())
+
+def render_upload(
+    content: bytes,
+    content_type: str,
+    content_hash: Optional[str] = None,
+    source: bool = False,
+    previews: bool = False
+) -> Tuple[Optional[str], Optional[str], Optional[Dict[str, Tuple[bytes, str]]]]:
+    """
+    Render an upload's LLM image and, when asked, its source image and previews
+    
+    Module-level so it can run on a process pool: the upload is pickled to the
+    worker once for all of them rather than once per rendition.
+    
+    Args:
+        content: Uploaded file content as bytes
+        content_type: MIME type of the upload
+        content_hash: SHA-256 hex digest of a PDF, keying the page cache
+        source: Also render the source image (see render_source_image)
+        previews: Also encode the preview renditions
+        
+    Returns:
+        Tuple of (LLM image as render_llm_image returns it, source image as
+        render_source_image returns it, renditions or None if not asked for)
+        
+    Raises:
+        HTTPException: If the PDF cannot be rendered
+    """
+    llm_image = render_llm_image(content, content_type, content_hash)
+    source_image = render_source_image(content, content_type, content_hash) if source else None
+    renditions = None
+    if previews:
+        if content_type == "application/pdf":
+            renditions = render_page_previews(content, 1, content_hash)
+        else:
+            renditions = render_previews(content)
+    return llm_image, source_image, renditions
+
+def _base64(content: bytes) -> str:
+    """Base64 encode bytes to a string"""
+    return base64.b64encode(content).decode()
+
+def _sha256(content: bytes) -> str:
+    """SHA-256 hex digest of bytes"""
+    return hashlib.sha256(content).hexdigest()
+
+class UploadBuffer:
+    """
+    An upload held once, with its derived encodings built lazily and shared
+    
+    The raw bytes are the only copy of the upload. The content hash, the LLM
+    image and the full-resolution source image (for barcode/MRZ decoding and
+    the local classifier) are computed on first use and cached. PDFs are
+    previewed from their first page render, other uploads from the original file.
+    
+    prepare() and previews() do the same work as their synchronous counterparts
+    on the executors, so the event loop keeps serving other requests. prepare()
+    can build the source image and previews in the same render executor call,
+    so a process pool receives the upload once per request.
+    """
+    
+    def __init__(self, content: bytes, content_type: str, content_hash: Optional[str] = None):
+        self.content = content
+        self.content_type = content_type
+        self._content_hash = content_hash  # Known already when the upload was hashed while ingested
+        self._llm_image: Optional[str] = None
+        self._source_image: Optional[str] = None
+        self._renditions: Optional[Dict[str, Tuple[bytes, str]]] = None  # Held until stored
+        self._original_base64: Optional[str] = None  # Kept when an encoding is the original bytes
+    
+    @property
+    def is_pdf(self) -> bool:
+        return self.content_type == "application/pdf"
+    
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 hex digest of the uploaded bytes"""
+        if self._content_hash is None:
+            self._content_hash = _sha256(self.content)
+        return self._content_hash
+    
+    async def prepare_hash(self) -> str:
+        """SHA-256 hex digest of the uploaded bytes, computed on the thread executor"""
+        if self._content_hash is None:
+            self._content_hash = await thread_executor.run(_sha256, self.content)
+        return self._content_hash
+    
+    def _render_hash(self) -> Optional[str]:
+        """Digest keying a PDF's rendered pages in the page cache; other uploads aren't cached"""
+        return self.content_hash if self.is_pdf else None
+    
+    def _original(self, original_base64: Optional[str] = None) -> str:
+        """Base64 encoded original bytes, shared by the encodings that send them unchanged"""
+        if self._original_base64 is None:
+            self._original_base64 = original_base64 or _base64(self.content)
+        return self._original_base64
+    
+    def _set_llm_image(self, rendered: Optional[str], original_base64: Optional[str] = None):
+        """Cache the rendered LLM image, or the original when it is sent unchanged"""
+        self._llm_image = rendered if rendered is not None else self._original(original_base64)
+    
+    def _set_source_image(self, rendered: Optional[str], original_base64: Optional[str] = None):
+        """Cache the rendered source image, or the original when it is read unchanged"""
+        self._source_image = rendered if rendered is not None else self._original(original_base64)
+    
+    def llm_image(self) -> str:
+        """
+        Cropped, token-budgeted LLM image, built on first call
+        
+        Returns:
+            Base64 encoded image
+            
+        Raises:
+            HTTPException: If the PDF cannot be rendered
+        """
+        if self._llm_image is None:
+            self._set_llm_image(render_llm_image(self.content, self.content_type, self._render_hash()))
+        return self._llm_image
+    
+    async def prepare(self, source: bool = False, previews: bool = False) -> str:
+        """
+        Build the LLM image on the render executor and the hash on the thread executor
+        
+        Args:
+            source: Build the source image in the same render call (see prepare_source)
+            previews: Render the preview renditions in the same render call (see previews)
+        
+        Returns:
+            Base64 encoded LLM image
+            
+        Raises:
+            HTTPException: If the PDF cannot be rendered
+        """
+        if self._llm_image is None:
+            source = source and self._source_image is None
+            previews = previews and self._renditions is None
+            if self.is_pdf:
+                # The digest keys the page cache, so it is needed before rendering
+                rendered, source_rendered, renditions = await render_executor.run(
+                    render_upload, self.content, self.content_type, await self.prepare_hash(), source, previews
+                )
+            elif self._content_hash is None:
+                (rendered, source_rendered, renditions), self._content_hash = await asyncio.gather(
+                    render_executor.run(render_upload, self.content, self.content_type, None, source, previews),
+                    thread_executor.run(_sha256, self.content)
+                )
+            else:
+                rendered, source_rendered, renditions = await render_executor.run(
+                    render_upload, self.content, self.content_type, None, source, previews
+                )
+            original_base64 = None
+            if (rendered is None or (source and source_rendered is None)) and self._original_base64 is None:
+                original_base64 = await thread_executor.run(_base64, self.content)
+            self._set_llm_image(rendered, original_base64)
+            if source:
+                self._set_source_image(source_rendered, original_base64)
+            if previews:
+                self._renditions = renditions
+        return self._llm_image
+    
+    def source_image(self) -> str:
+        """
+        Full-resolution, cropped image for barcode/MRZ decoding and the local classifier, built on first call
+        
+        Returns:
+            Base64 encoded image
+            
+        Raises:
+            HTTPException: If the PDF cannot be rendered
+        """
+        if self._source_image is None:
+            self._set_source_image(render_source_image(self.content, self.content_type, self._render_hash()))
+        return self._source_image
+    
+    async def prepare_source(self) -> str:
+        """
+        Build the source image on the render executor
+        
+        Returns:
+            Base64 encoded source image
+            
+        Raises:
+            HTTPException: If the PDF cannot be rendered
+        """
+        if self._source_image is None:
+            content_hash = await self.prepare_hash() if self.is_pdf else None
+            rendered = await render_executor.run(render_source_image, self.content, self.content_type, content_hash)
+            original_base64 = None
+            if rendered is None and self._original_base64 is None:
+                original_base64 = await thread_executor.run(_base64, self.content)
+            self._set_source_image(rendered, original_base64)
+        return self._source_image
+    
+    def _take_renditions(self) -> Dict[str, Tuple[bytes, str]]:
+        """Hand over the renditions prepare() rendered; they are stored once"""
+        renditions, self._renditions = self._renditions, None
+        return renditions
+    
+    def render_previews(self) -> Dict[str, Tuple[bytes, str]]:
+        """
+        Preview renditions of the upload
+        
+        Built on demand unless prepare() already rendered them, so callers
+        should ask for them only when storing them.
+        
+        Returns:
+            Dictionary of rendition name to (encoded bytes, MIME type)
+        """
+        if self._renditions is not None:
+            return self._take_renditions()
+        if self.is_pdf:
+            return render_page_previews(self.content, 1, self.content_hash)
+        return render_previews(self.content)
+    
+    async def previews(self) -> Dict[str, Tuple[bytes, str]]:
+        """
+        Preview renditions of the upload, rendered on the render executor unless prepare() already did
+        
+        Returns:
+            Dictionary of rendition name to (encoded bytes, MIME type)
+        """
+        if self._renditions is not None:
+            return self._take_renditions()
+        if self.is_pdf:
+            return await render_executor.run(render_page_previews, self.content, 1, await self.prepare_hash())
+        return await render_executor.run(render_previews, self.content)
+
+def prepare_llm_image(content: bytes, content_type: str) -> str:
+    """
+    Build the cropped, token-budgeted LLM image for an upload
+    
+    Args:
+        content: Uploaded file content as bytes
+        content_type: MIME type of the upload
+        
+    Returns:
+        Base64 encoded image
+        
+    Raises:
+        HTTPException: If the PDF cannot be rendered
+    """
+    return UploadBuffer(content, content_type).llm_image()
+
 def validate_file_type(content_type: str, supported_types: List[str]) -> bool:
     """
     Validate if file type is supported
@@ -0,0 +1,96 @@
+"""Incremental JSON parsing for streamed LLM responses"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+
+class IncrementalJSONParser:
+    """
+    Parse a flat JSON object from text chunks as they arrive
+
+    Each top-level member is emitted as soon as its value is complete, so
+    callers can act on the first fields before the response has finished.
+    Leading prose or a ```json fence before the object is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = 0
+        self.fields: Dict[str, Any] = {}
+
+    @property
+    def finished(self) -> bool:
+        """Whether the closing brace of the object has been seen"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of response text
+
+        Args:
+            chunk: Next piece of streamed content
+
+        Returns:
+            List of (key, value) pairs completed by this chunk
+        """
+        if self._finished:
+            return []
+
+        self._buffer += chunk
+        completed = []
+
+        while self._position < len(self._buffer):
+            char = self._buffer[self._position]
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = self._position + 1
+                self._position += 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.extend(self._emit_member(self._position))
+                    self._finished = True
+                    self._position += 1
+                    break
+            elif char == "," and self._depth == 1:
+                completed.extend(self._emit_member(self._position))
+                self._member_start = self._position + 1
+
+            self._position += 1
+
+        return completed
+
+    def _emit_member(self, end: int) -> List[Tuple[str, Any]]:
+        """Decode the member text between the last separator and end"""
+        member = self._buffer[self._member_start:end].strip()
+        if not member:
+            return []
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            print(f"Failed to parse streamed JSON member: {member[:100]}...")
+            return []
+        self.fields.update(parsed)
+        return list(parsed.items())
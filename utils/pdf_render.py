@@ -0,0 +1,290 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Any, Hashable, Iterator, Optional, Tuple
+from PIL import Image
+from fastapi import HTTPException
+from config import config
+
+POINTS_PER_INCH = 72
+
+class _FitzDocument:
+    """PDF opened from memory with PyMuPDF"""
+
+    def __init__(self, content: bytes):
+        import fitz
+        self._fitz = fitz
+        self._document = fitz.open(stream=content, filetype="pdf")
+        self.page_count = self._document.page_count
+
+    def page_size(self, number: int) -> Tuple[float, float]:
+        rect = self._document[number - 1].rect
+        return rect.width, rect.height
+
+    def render(self, number: int, dpi: float) -> Image.Image:
+        zoom = dpi / POINTS_PER_INCH
+        pixmap = self._document[number - 1].get_pixmap(matrix=self._fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+    def close(self):
+        self._document.close()
+
+class _PopplerDocument:
+    """
+    PDF rendered one page at a time with pdf2image/poppler from a temporary file
+
+    Page count and sizes are read in memory with PyPDF2, falling back to pdfinfo.
+    """
+
+    def __init__(self, content: bytes):
+        import pdf2image
+        self._pdf2image = pdf2image
+        try:
+            from PyPDF2 import PdfReader
+            pages = PdfReader(io.BytesIO(content)).pages
+            self._sizes = [(float(page.mediabox.width), float(page.mediabox.height)) for page in pages]
+        except ImportError:
+            self._sizes = None
+
+        handle, self._path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(handle, "wb") as tmp_file:
+            tmp_file.write(content)
+        if self._sizes is None:
+            try:
+                info = pdf2image.pdfinfo_from_path(self._path)
+            except Exception:
+                self.close()
+                raise
+            # pdfinfo reports the first page's size, e.g. "612 x 792 pts (letter)"
+            width, _, height = info.get("Page size", "612 x 792").split()[:3]
+            self._sizes = [(float(width), float(height))] * int(info["Pages"])
+        self.page_count = len(self._sizes)
+
+    def page_size(self, number: int) -> Tuple[float, float]:
+        return self._sizes[number - 1]
+
+    def render(self, number: int, dpi: float) -> Image.Image:
+        pages = self._pdf2image.convert_from_path(self._path, dpi=dpi, first_page=number, last_page=number)
+        return pages[0]
+
+    def close(self):
+        os.unlink(self._path)
+
+@contextmanager
+def _open_pdf(content: bytes):
+    """
+    Open a PDF for rendering, mapping failures to HTTP errors
+
+    PyMuPDF renders straight from memory when installed; otherwise poppler
+    renders from a temporary file.
+    """
+    try:
+        try:
+            document = _FitzDocument(content)
+        except ImportError:
+            document = _PopplerDocument(content)
+    except ImportError:
+        raise HTTPException(
+            status_code=500,
+            detail="PDF support not available. Please install pdf2image and poppler."
+        )
+    except Exception as e:
+        if "poppler" in str(e).lower():
+            raise HTTPException(
+                status_code=500,
+                detail="Poppler is not installed. Please install poppler to process PDF files."
+            )
+        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+
+    try:
+        yield document
+    finally:
+        document.close()
+
+class PageCache:
+    """
+    LRU cache of rendered pages bounded by decoded size
+
+    Keyed by content hash, page number and render settings. Cached images are
+    shared between callers and must be treated as read-only. With the process
+    render executor each worker process keeps its own cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0
+        }
+
+    @staticmethod
+    def _size(value: Any) -> int:
+        """Decoded size of an image; page counts and other small values count 64 bytes"""
+        if isinstance(value, Image.Image):
+            return value.width * value.height * len(value.getbands())
+        return 64
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Look up an entry, marking it recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        """Store an entry, evicting the least recently used beyond the byte budget"""
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.counters["evictions"] += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Get entry count, size and hit/miss counters"""
+        return {"entries": len(self._entries), "bytes": self._bytes, **self.counters}
+
+# Process-scoped cache of rendered pages
+page_cache = PageCache(config.PDF_PAGE_CACHE_BYTES)
+
+def render_dpi(page_size: Tuple[float, float], dpi: int, max_side: int) -> float:
+    """
+    DPI to render a page at: the target DPI, lowered so the longer side fits max_side
+
+    Args:
+        page_size: Page width and height in points
+        dpi: Target DPI
+        max_side: Maximum rendered side in pixels
+
+    Returns:
+        Effective DPI
+    """
+    return min(dpi, max_side * POINTS_PER_INCH / max(page_size))
+
+def render_pdf_pages(
+    content: bytes,
+    dpi: Optional[int] = None,
+    max_side: Optional[int] = None,
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+    content_hash: Optional[str] = None
+) -> Iterator[Image.Image]:
+    """
+    Render PDF pages lazily, one per iteration
+
+    Pages are rendered only when the consumer asks for them and come from the
+    page cache when the same PDF was rendered with the same settings before.
+    Close the generator (or exhaust it) to release the open document.
+
+    Args:
+        content: PDF file content as bytes
+        dpi: Target DPI (default config.PDF_RENDER_DPI)
+        max_side: Maximum rendered side in pixels (default config.PDF_RENDER_MAX_SIDE)
+        first_page: First page to render (1-based)
+        last_page: Last page to render (default the last page of the PDF)
+        content_hash: SHA-256 hex digest of the content keying the page cache;
+            pass it when known so the PDF isn't hashed again on every call
+
+    Yields:
+        PIL images, one per page; treat them as read-only
+
+    Raises:
+        HTTPException: If the PDF cannot be opened or rendered
+    """
+    dpi = dpi or config.PDF_RENDER_DPI
+    max_side = max_side or config.PDF_RENDER_MAX_SIDE
+    content_hash = content_hash or hashlib.sha256(content).hexdigest()
+
+    with ExitStack() as stack:
+        document = None
+        page_count = page_cache.get((content_hash, "pages"))
+        if page_count is None:
+            document = stack.enter_context(_open_pdf(content))
+            page_count = document.page_count
+            page_cache.set((content_hash, "pages"), page_count)
+
+        for number in range(first_page, min(last_page or page_count, page_count) + 1):
+            key = (content_hash, number, dpi, max_side)
+            image = page_cache.get(key)
+            if image is None:
+                if document is None:
+                    document = stack.enter_context(_open_pdf(content))
+                try:
+                    image = document.render(number, render_dpi(document.page_size(number), dpi, max_side))
+                except Exception as e:
+                    raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+                page_cache.set(key, image)
+            yield image
+
+def render_pdf_page(
+    content: bytes,
+    page: int = 1,
+    dpi: Optional[int] = None,
+    max_side: Optional[int] = None,
+    content_hash: Optional[str] = None
+) -> Image.Image:
+    """
+    Render a single PDF page
+
+    Args:
+        content: PDF file content as bytes
+        page: Page number (1-based)
+        dpi: Target DPI (default config.PDF_RENDER_DPI)
+        max_side: Maximum rendered side in pixels (default config.PDF_RENDER_MAX_SIDE)
+        content_hash: SHA-256 hex digest of the content, if already known
+
+    Returns:
+        PIL image; treat it as read-only
+
+    Raises:
+        HTTPException: If the PDF cannot be rendered or has no such page
+    """
+    for image in render_pdf_pages(content, dpi, max_side, first_page=page, last_page=page, content_hash=content_hash):
+        return image
+    raise HTTPException(status_code=400, detail="Could not extract images from PDF")
+
+def pdf_page_count(content: bytes, content_hash: Optional[str] = None) -> int:
+    """
+    Number of pages in a PDF, without rendering any
+
+    Args:
+        content: PDF file content as bytes
+        content_hash: SHA-256 hex digest of the content, if already known
+
+    Returns:
+        Page count
+
+    Raises:
+        HTTPException: If the PDF cannot be opened
+    """
+    content_hash = content_hash or hashlib.sha256(content).hexdigest()
+    page_count = page_cache.get((content_hash, "pages"))
+    if page_count is None:
+        with _open_pdf(content) as document:
+            page_count = document.page_count
+        page_cache.set((content_hash, "pages"), page_count)
+    return page_count
@@ -0,0 +1,74 @@
+import base64
+from typing import Dict, Optional, Tuple
+from utils.executors import render_executor, thread_executor
+from utils.image_utils import render_previews
+from utils.storage import store_bytes, release_file
+
+def preview_url(document_id: str, name: str, file_path: Optional[str]) -> Optional[str]:
+    """URL a stored preview rendition of a document is served from, or None if it has none"""
+    return f"/documents/{document_id}/previews/{name}" if file_path else None
+
+async def store_previews(renditions: Dict[str, Tuple[bytes, str]], db_service) -> Dict[str, str]:
+    """
+    Store preview renditions, holding one reference to each for the caller
+
+    Args:
+        renditions: Dictionary of rendition name to (encoded bytes, MIME type)
+        db_service: DatabaseService holding the reference counts
+
+    Returns:
+        Dictionary of rendition name to stored file reference
+    """
+    return {
+        name: await store_bytes(content, mime_type, db_service)
+        for name, (content, mime_type) in renditions.items()
+    }
+
+async def release_previews(previews: Dict[str, str], db_service):
+    """Drop the caller's references taken by store_previews"""
+    for file_path in previews.values():
+        await release_file(file_path, db_service)
+
+def _decode_data_url(data_url: str) -> bytes:
+    """Bytes of a base64 data URL"""
+    return base64.b64decode(data_url.split(",", 1)[1], validate=True)
+
+async def migrate_data_url_previews(db_service, batch_size: int = 20) -> Tuple[int, int]:
+    """
+    Move images stored inline as data URLs (Document.file_data_url) into preview renditions
+
+    Documents are processed in batches, each committed on its own, so the
+    migration can be interrupted and rerun. A data URL that isn't a readable
+    image is cleared without renditions.
+
+    Args:
+        db_service: DatabaseService of the database to migrate
+        batch_size: Documents loaded at once
+
+    Returns:
+        Tuple of (documents migrated, unreadable data URLs cleared)
+    """
+    migrated = cleared = 0
+    after = ""
+    while True:
+        batch = await db_service.documents.get_data_urls(after, batch_size)
+        if not batch:
+            return migrated, cleared
+        for document_id, data_url in batch:
+            after = document_id
+            try:
+                content = await thread_executor.run(_decode_data_url, data_url)
+                renditions = await render_executor.run(render_previews, content)
+            except (IndexError, ValueError, OSError) as e:  # Not a data URL, bad base64, not an image
+                print(f"Document {document_id}: unreadable data URL cleared ({e})")
+                await db_service.documents.set_previews(document_id, {})
+                cleared += 1
+                continue
+            # The document keeps the references taken here
+            previews = await store_previews(renditions, db_service)
+            try:
+                await db_service.documents.set_previews(document_id, previews)
+            except Exception:
+                await release_previews(previews, db_service)
+                raise
+            migrated += 1
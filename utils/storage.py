@@ -0,0 +1,292 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+from config import config
+from utils.executors import thread_executor
+
+# Stored file references ("sha256:<hex>") kept in Document.file_path and Job.file_path;
+# anything else there is a path written before content-addressed storage
+KEY_PREFIX = "sha256:"
+
+def storage_key(content_hash: str) -> str:
+    """Reference to a stored file by its SHA-256 hex digest"""
+    return KEY_PREFIX + content_hash
+
+def key_hash(file_path: Optional[str]) -> Optional[str]:
+    """SHA-256 hex digest of a stored file reference, or None for legacy paths"""
+    if file_path and file_path.startswith(KEY_PREFIX):
+        return file_path[len(KEY_PREFIX):]
+    return None
+
+def _fsync_directory(path: Path):
+    """Persist a rename or unlink in a directory (no-op where directories can't be opened)"""
+    try:
+        handle = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(handle)
+    finally:
+        os.close(handle)
+
+class LocalFileStorage:
+    """
+    Content-addressed files on the local filesystem
+
+    Files live at root/ab/cd/abcd... (two levels of fan-out by SHA-256 digest).
+    Writes land in root/.staging first and are renamed into place, so a file
+    either exists whole or not at all; with fsync on, the data and the rename
+    are flushed before put returns. Storing bytes that are already present
+    only drops the staged copy.
+    """
+
+    def __init__(self, root: str, fsync: bool = True):
+        self.root = Path(root)
+        self.fsync = fsync
+        self.staging_dir = self.root / ".staging"
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, content_hash: str) -> Path:
+        """Path of a stored file"""
+        return self.root / content_hash[:2] / content_hash[2:4] / content_hash
+
+    def local_path(self, content_hash: str) -> Optional[Path]:
+        """Path to serve a stored file from directly, if it is on local disk"""
+        path = self.path_for(content_hash)
+        return path if path.exists() else None
+
+    def _put_file(self, source: Path, content_hash: str):
+        target = self.path_for(content_hash)
+        if target.exists():
+            source.unlink()
+            return
+        if self.fsync:
+            with open(source, "rb") as handle:
+                os.fsync(handle.fileno())
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, target)
+        if self.fsync:
+            _fsync_directory(target.parent)
+
+    def _put_bytes(self, content: bytes, content_hash: str):
+        if self.path_for(content_hash).exists():
+            return
+        handle, staged = tempfile.mkstemp(dir=self.staging_dir)
+        with os.fdopen(handle, "wb") as staged_file:
+            staged_file.write(content)
+        self._put_file(Path(staged), content_hash)
+
+    def _delete(self, content_hash: str):
+        path = self.path_for(content_hash)
+        path.unlink(missing_ok=True)
+        if self.fsync:
+            _fsync_directory(path.parent)
+
+    async def put_file(self, source: Path, content_hash: str):
+        """
+        Move a staged file into storage
+
+        Args:
+            source: File in staging_dir (or elsewhere on the same filesystem)
+            content_hash: Its SHA-256 hex digest
+        """
+        await thread_executor.run(self._put_file, source, content_hash)
+
+    async def put_bytes(self, content: bytes) -> str:
+        """
+        Store bytes
+
+        Args:
+            content: File content
+
+        Returns:
+            SHA-256 hex digest the content is stored under
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        await thread_executor.run(self._put_bytes, content, content_hash)
+        return content_hash
+
+    async def get(self, content_hash: str) -> bytes:
+        """Read a stored file (FileNotFoundError if missing)"""
+        return await thread_executor.run(self.path_for(content_hash).read_bytes)
+
+    async def exists(self, content_hash: str) -> bool:
+        """Check whether a file is stored"""
+        return await thread_executor.run(self.path_for(content_hash).exists)
+
+    async def delete(self, content_hash: str):
+        """Delete a stored file if present"""
+        await thread_executor.run(self._delete, content_hash)
+
+class S3FileStorage:
+    """
+    Content-addressed objects in an S3-compatible bucket (AWS S3, MinIO, ...)
+
+    Objects are keyed prefix/ab/cd/abcd...; PUTs are atomic, so nothing is
+    staged remotely. Uploads are staged in a local directory first. boto3 calls
+    run on the thread executor. Credentials come from the usual AWS
+    environment variables or config files.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None, staging_dir: Optional[str] = None):
+        import boto3
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.staging_dir = Path(staging_dir or tempfile.gettempdir()) / "document-staging"
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def object_key(self, content_hash: str) -> str:
+        """Object key of a stored file"""
+        key = f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def local_path(self, content_hash: str) -> Optional[Path]:
+        """Objects are never on local disk"""
+        return None
+
+    def _exists(self, content_hash: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self.object_key(content_hash))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def _put_file(self, source: Path, content_hash: str):
+        try:
+            if not self._exists(content_hash):
+                self._client.upload_file(str(source), self.bucket, self.object_key(content_hash))
+        finally:
+            source.unlink(missing_ok=True)
+
+    def _put_bytes(self, content: bytes, content_hash: str):
+        if not self._exists(content_hash):
+            self._client.put_object(Bucket=self.bucket, Key=self.object_key(content_hash), Body=content)
+
+    def _get(self, content_hash: str) -> bytes:
+        from botocore.exceptions import ClientError
+        try:
+            response = self._client.get_object(Bucket=self.bucket, Key=self.object_key(content_hash))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(self.object_key(content_hash))
+            raise
+        return response["Body"].read()
+
+    async def put_file(self, source: Path, content_hash: str):
+        """Upload a staged file and remove the staged copy"""
+        await thread_executor.run(self._put_file, source, content_hash)
+
+    async def put_bytes(self, content: bytes) -> str:
+        """Store bytes, returning the SHA-256 hex digest they are stored under"""
+        content_hash = hashlib.sha256(content).hexdigest()
+        await thread_executor.run(self._put_bytes, content, content_hash)
+        return content_hash
+
+    async def get(self, content_hash: str) -> bytes:
+        """Read a stored object (FileNotFoundError if missing)"""
+        return await thread_executor.run(self._get, content_hash)
+
+    async def exists(self, content_hash: str) -> bool:
+        """Check whether an object is stored"""
+        return await thread_executor.run(self._exists, content_hash)
+
+    async def delete(self, content_hash: str):
+        """Delete a stored object if present"""
+        await thread_executor.run(
+            lambda: self._client.delete_object(Bucket=self.bucket, Key=self.object_key(content_hash))
+        )
+
+def create_storage():
+    """Storage backend selected by config.STORAGE_BACKEND"""
+    if config.STORAGE_BACKEND == "s3":
+        return S3FileStorage(
+            bucket=config.S3_BUCKET,
+            prefix=config.S3_PREFIX,
+            endpoint_url=config.S3_ENDPOINT_URL,
+            staging_dir=config.STORAGE_STAGING_DIR
+        )
+    return LocalFileStorage(config.STORAGE_ROOT, fsync=config.STORAGE_FSYNC)
+
+# Application-scoped file storage
+storage = create_storage()
+
+async def read_stored(file_path: str) -> bytes:
+    """
+    Read a file referenced from Document.file_path or Job.file_path
+
+    Args:
+        file_path: Stored file reference, or a path written before content-addressed storage
+
+    Returns:
+        File content
+    """
+    content_hash = key_hash(file_path)
+    if content_hash is not None:
+        return await storage.get(content_hash)
+    return await thread_executor.run(Path(file_path).read_bytes)
+
+async def store_upload(spooled, db_service) -> str:
+    """
+    Store a spooled upload, holding one reference to it for the caller
+
+    The reference is committed before the file is stored. A release of the
+    same content that races this call either still sees the reference, or
+    deletes the file before its commit lets the reference in (see
+    StoredFileRepository.release_reference), so the file is stored again
+    rather than deleted from under the caller. Release it with
+    release_file when the upload is no longer needed; documents created from
+    it take references of their own.
+
+    Args:
+        spooled: SpooledUpload staged in storage.staging_dir
+        db_service: DatabaseService holding the reference counts
+
+    Returns:
+        Stored file reference for Document.file_path / Job.file_path
+    """
+    await db_service.files.add_reference(spooled.content_hash, spooled.size, spooled.content_type)
+    await storage.put_file(spooled.path, spooled.content_hash)
+    return storage_key(spooled.content_hash)
+
+async def store_bytes(content: bytes, content_type: str, db_service) -> str:
+    """
+    Store generated bytes (e.g. a preview rendition), holding one reference for the caller
+
+    Like store_upload, for content built in memory rather than spooled to disk.
+
+    Args:
+        content: File content
+        content_type: MIME type to serve it with
+        db_service: DatabaseService holding the reference counts
+
+    Returns:
+        Stored file reference
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    await db_service.files.add_reference(content_hash, len(content), content_type)
+    await storage.put_bytes(content)
+    return storage_key(content_hash)
+
+async def release_file(file_path: Optional[str], db_service):
+    """
+    Drop one reference to a stored file, deleting the file with the last one
+
+    Legacy paths (written before content-addressed storage) are deleted directly.
+
+    Args:
+        file_path: Stored file reference or legacy path
+        db_service: DatabaseService holding the reference counts
+    """
+    if not file_path:
+        return
+    content_hash = key_hash(file_path)
+    if content_hash is None:
+        await thread_executor.run(Path(file_path).unlink, True)
+    else:
+        await db_service.files.release_reference(content_hash, storage.delete)
@@ -0,0 +1,252 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Callable, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from config import config
+from utils.executors import thread_executor
+
+# Leading bytes of the file types the API accepts
+MAGIC_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"%PDF-", "application/pdf")
+)
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """
+    Detect the file type from its leading bytes
+    
+    Args:
+        head: First bytes of the file
+        
+    Returns:
+        MIME type, or None if the file is not a supported type
+    """
+    for signature, content_type in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+def _write_chunk(handle: BinaryIO, hasher: "hashlib._Hash", chunk: bytes):
+    """Hash and write one chunk (both release the GIL)"""
+    hasher.update(chunk)
+    handle.write(chunk)
+
+def _open_at(path: Path, offset: int) -> BinaryIO:
+    """Open a partial upload for writing at offset, discarding anything past it"""
+    handle = open(path, "r+b")
+    try:
+        handle.truncate(offset)
+        handle.seek(offset)
+    except BaseException:
+        handle.close()
+        raise
+    return handle
+
+def _finish_spool(handle: BinaryIO, partial: Path, path: Path):
+    """Close a fully written upload and move it into place"""
+    handle.close()
+    os.replace(partial, path)
+
+def _abort_spool(handle: BinaryIO, partial: Path):
+    """Close and delete an upload that was rejected or broke off"""
+    handle.close()
+    partial.unlink(missing_ok=True)
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware rejecting POST bodies over a per-path limit with 413
+    
+    A declared Content-Length over the limit is refused before the body is
+    read. The body is also counted as the application receives it, so chunked
+    requests (or a short Content-Length) are cut off at the limit instead of
+    being spooled whole by the multipart parser.
+    """
+    
+    def __init__(self, app, max_size: Callable[[str], int]):
+        self.app = app
+        self.max_size = max_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        
+        limit = self.max_size(scope["path"])
+        detail = f"Request too large. Maximum size: {limit} bytes"
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit() and int(length) > limit:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside the request handler, so it becomes a 413 response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+class SpooledUpload:
+    """
+    An upload stored on disk, with the facts learned while reading it
+    
+    Only the file path is kept; the bytes are read back when the pipeline needs them.
+    """
+    
+    def __init__(self, path: Path, file_name: str, content_type: str, size: int, content_hash: str):
+        self.path = path
+        self.file_name = file_name
+        self.content_type = content_type
+        self.size = size
+        self.content_hash = content_hash
+    
+    async def read(self) -> bytes:
+        """Read the stored upload on the thread executor"""
+        return await thread_executor.run(self.path.read_bytes)
+    
+    def discard(self):
+        """Delete the stored upload"""
+        if self.path.exists():
+            self.path.unlink()
+
+async def ingest_upload(file: UploadFile, upload_dir: Path, max_size: Optional[int] = None) -> SpooledUpload:
+    """
+    Read an upload in chunks, enforcing the size limit and spooling it to disk
+    
+    The file type is sniffed from the first chunk rather than taken from the
+    declared content type, and the SHA-256 digest is computed while the chunks
+    are written, so the upload is never held in memory whole.
+    
+    Args:
+        file: Uploaded file
+        upload_dir: Directory the upload is stored in
+        max_size: Size limit in bytes (default config.MAX_FILE_SIZE)
+        
+    Returns:
+        The stored upload
+        
+    Raises:
+        HTTPException: If the file type is not supported or the file is too large
+    """
+    max_size = max_size or config.MAX_FILE_SIZE
+    file_name = file.filename or "upload"
+    path = upload_dir / f"{os.urandom(16).hex()}_{Path(file_name).name}"
+    partial = path.with_name(path.name + ".part")
+    hasher = hashlib.sha256()
+    content_type = None
+    size = 0
+    
+    handle = await thread_executor.run(open, partial, "wb")
+    try:
+        while True:
+            chunk = await file.read(config.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if content_type is None:
+                content_type = sniff_content_type(chunk)
+                if content_type not in config.SUPPORTED_FILE_TYPES:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Invalid file type. Supported types: {config.SUPPORTED_FILE_TYPES}"
+                    )
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"File too large. Maximum size: {max_size} bytes"
+                )
+            await thread_executor.run(_write_chunk, handle, hasher, chunk)
+        
+        if content_type is None:
+            raise HTTPException(status_code=400, detail="Empty file")
+        await thread_executor.run(_finish_spool, handle, partial, path)
+    except BaseException:
+        await thread_executor.run(_abort_spool, handle, partial)
+        raise
+    
+    return SpooledUpload(path, file_name, content_type, size, hasher.hexdigest())
+
+async def append_chunks(path: Path, offset: int, chunks: AsyncIterator[bytes], max_size: int) -> int:
+    """
+    Write a stream of chunks to a partial upload starting at offset
+    
+    Anything past offset (e.g. left by an append that died mid-write) is
+    discarded first. When the stream breaks off the bytes written so far are
+    kept, so the file size is always the offset to resume from.
+    
+    Args:
+        path: Partial upload file
+        offset: Byte offset the chunks start at
+        chunks: Request body chunks
+        max_size: Declared total size of the upload
+        
+    Returns:
+        The new offset
+        
+    Raises:
+        HTTPException: If the chunks run past the declared size
+    """
+    handle = await thread_executor.run(_open_at, path, offset)
+    try:
+        async for chunk in chunks:
+            if offset + len(chunk) > max_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Chunk exceeds the declared upload length of {max_size} bytes"
+                )
+            await thread_executor.run(handle.write, chunk)
+            offset += len(chunk)
+    finally:
+        await thread_executor.run(handle.close)
+    return offset
+
+def _hash_file(path: Path) -> Tuple[str, bytes]:
+    """SHA-256 digest and leading bytes of a file, read in chunks"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        head = handle.read(config.UPLOAD_CHUNK_SIZE)
+        chunk = head
+        while chunk:
+            hasher.update(chunk)
+            chunk = handle.read(config.UPLOAD_CHUNK_SIZE)
+    return hasher.hexdigest(), head
+
+async def spool_partial(partial: Path, upload_dir: Path, file_name: str) -> SpooledUpload:
+    """
+    Turn a completed partial upload into a stored upload
+    
+    Args:
+        partial: Partial upload file holding every byte
+        upload_dir: Directory the upload is stored in
+        file_name: Original file name
+        
+    Returns:
+        The stored upload; the partial file is moved (copied only across filesystems)
+        
+    Raises:
+        HTTPException: If the file type is not supported
+    """
+    content_hash, head = await thread_executor.run(_hash_file, partial)
+    content_type = sniff_content_type(head)
+    if content_type not in config.SUPPORTED_FILE_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid file type. Supported types: {config.SUPPORTED_FILE_TYPES}"
+        )
+    
+    path = upload_dir / f"{os.urandom(16).hex()}_{Path(file_name).name}"
+    size = (await thread_executor.run(partial.stat)).st_size
+    # The staging directory may be on another filesystem (S3 staging, NFS), where a rename fails
+    await thread_executor.run(shutil.move, partial, path)
+    return SpooledUpload(path, file_name, content_type, size, content_hash)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Standalone extraction worker
+
+Claims jobs from the durable job table with a lease, runs the extraction
+pipeline and stores the result. Run as many worker processes as needed:
+
+    python worker.py --concurrency 4
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+
+from config import config
+from database.models import init_db, get_async_session
+from database.operations import DatabaseService
+from processors import DocumentPipeline, llm_client, result_cache
+from utils import key_hash, read_stored, release_file
+
+
+async def renew_lease_periodically(job_id: str, worker_id: str, work: asyncio.Task):
+    """
+    Keep the lease alive while a job is being processed
+
+    A failed renewal is retried on the next tick, so one database hiccup doesn't
+    cost the lease. Once another worker owns the job the work is cancelled,
+    so it never persists a second document for the same upload.
+    """
+    AsyncSessionLocal = get_async_session()
+    while True:
+        await asyncio.sleep(config.JOB_LEASE_SECONDS / 3)
+        try:
+            async with AsyncSessionLocal() as session:
+                renewed = await DatabaseService(session).jobs.renew_lease(job_id, worker_id, config.JOB_LEASE_SECONDS)
+        except Exception as e:
+            print(f"[{worker_id}] Lease renewal for job {job_id} failed: {e}")
+            continue
+        if not renewed:
+            print(f"[{worker_id}] Lost lease on job {job_id}, abandoning it")
+            work.cancel()
+            return
+
+
+async def run_job(pipeline: DocumentPipeline, job, worker_id: str):
+    """Run the extraction pipeline for one claimed job and record the outcome"""
+    AsyncSessionLocal = get_async_session()
+
+    try:
+        content = await read_stored(job.file_path)
+
+        async with AsyncSessionLocal() as session:
+            document_type, fields, document = await pipeline.process_upload(
+                file_name=job.file_name,
+                content_type=job.content_type,
+                content=content,
+                db_service=DatabaseService(session),
+                file_path=job.file_path,
+                content_hash=key_hash(job.file_path)
+            )
+
+        async with AsyncSessionLocal() as session:
+            db_service = DatabaseService(session)
+            if await db_service.jobs.complete_job(
+                job.id,
+                worker_id,
+                document_id=document.id,
+                result={
+                    "document_type": document_type.value,
+                    "document_content": fields
+                }
+            ):
+                # The document now holds its own reference to the upload
+                await release_file(job.file_path, db_service)
+        print(f"[{worker_id}] Job {job.id} succeeded ({document_type.value})")
+
+    except Exception as e:
+        error = getattr(e, "detail", None) or str(e)
+        async with AsyncSessionLocal() as session:
+            db_service = DatabaseService(session)
+            if await db_service.jobs.fail_job(job.id, worker_id, error):
+                failed = await db_service.jobs.get_job(job.id)
+                if failed.status == "failed":
+                    # No attempts left; the upload is no longer needed
+                    await release_file(job.file_path, db_service)
+        print(f"[{worker_id}] Job {job.id} failed: {error}")
+
+
+async def process_job(pipeline: DocumentPipeline, job, worker_id: str):
+    """Run one claimed job while holding its lease, abandoning it if the lease is lost"""
+    work = asyncio.ensure_future(run_job(pipeline, job, worker_id))
+    renewer = asyncio.ensure_future(renew_lease_periodically(job.id, worker_id, work))
+
+    try:
+        await work
+    except asyncio.CancelledError:
+        # The renewer only finishes after cancelling the work for a lost lease;
+        # anything else is this worker shutting down
+        if not renewer.done():
+            raise
+    finally:
+        renewer.cancel()
+
+
+async def worker_loop(pipeline: DocumentPipeline, worker_id: str):
+    """Claim and process jobs until cancelled"""
+    AsyncSessionLocal = get_async_session()
+    while True:
+        async with AsyncSessionLocal() as session:
+            db_service = DatabaseService(session)
+            await db_service.jobs.fail_expired_jobs(lambda file_path: release_file(file_path, db_service))
+            job = await db_service.jobs.claim_job(worker_id, config.JOB_LEASE_SECONDS)
+
+        if job is None:
+            await asyncio.sleep(config.JOB_POLL_INTERVAL)
+            continue
+
+        await process_job(pipeline, job, worker_id)
+
+
+async def main(concurrency: int):
+    """Run several claim loops sharing one LLM connection pool"""
+    init_db()
+    config.validate()
+
+    pipeline = DocumentPipeline(cache=result_cache)
+    base_id = f"{socket.gethostname()}-{os.getpid()}"
+    await llm_client.start()
+    print(f"Worker {base_id} started with concurrency {concurrency}")
+
+    try:
+        await asyncio.gather(*[
+            worker_loop(pipeline, f"{base_id}-{index}")
+            for index in range(concurrency)
+        ])
+    finally:
+        await llm_client.aclose()
+        result_cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Document extraction worker")
+    parser.add_argument("--concurrency", type=int, default=1, help="Jobs processed concurrently by this process")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(main(args.concurrency))
+    except KeyboardInterrupt:
+        print("Worker stopped")